@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import json
-from dataclasses import dataclass
-from typing import Any
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable
 
-from app.agent.prompts import REASONING_PROMPT, SYSTEM_PROMPT, TOOLS_PROMPT
+from app.agent.prompt_builder import Prompt, PromptBuilder
+from app.agent.response_cache import CacheLookup, ResponseCache
+from app.agent.router import RetrievalRouter
 from app.core.config import settings
-from app.core.llm import LLMClient, LLMResponse
+from app.core.llm import AsyncLLMClient, LLMClient, LLMResponse
 from app.core.logging import get_logger
 from app.memory.service import MemoryService
+from app.rag import embedding_memo
+from app.rag.metadata import MetadataFilter
 from app.rag.service import RagService
+from app.rag.vector_store import SearchHit
 from app.tools.registry import ToolRegistry
 
 
@@ -17,6 +28,35 @@ from app.tools.registry import ToolRegistry
 class AgentResult:
     reply: str
     steps: int
+    prompt_tokens: dict[str, int] | None = None
+    llm_usage: dict[str, int] | None = None
+    cached: bool = False
+    timings_ms: dict[str, float] | None = None
+
+
+@dataclass
+class _Turn:
+    """Estado de uma interação: contexto coletado, prompt, uso do LLM e tempos."""
+
+    user_id: str
+    message: str
+    collection: str = ""
+    started: float = field(default_factory=time.perf_counter)
+    hits: list[SearchHit] = field(default_factory=list)
+    memories: list[str] = field(default_factory=list)
+    history: list[dict[str, str]] = field(default_factory=list)
+    lookup: CacheLookup | None = None
+    prompt: Prompt | None = None
+    llm_usage: dict[str, int] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def cached_reply(self) -> str | None:
+        return self.lookup.reply if self.lookup is not None else None
+
+    def add_timing(self, stage: str, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
 
 
 class Agent:
@@ -27,84 +67,339 @@ class Agent:
         memory_service: MemoryService,
         rag_service: RagService,
         max_steps: int = 5,
+        async_llm: AsyncLLMClient | None = None,
+        prompt_builder: PromptBuilder | None = None,
+        response_cache: ResponseCache | None = None,
+        rag_timeout: float = 10.0,
+        memory_timeout: float = 5.0,
+        router: RetrievalRouter | None = None,
+        context_workers: int = 48,
     ) -> None:
         self._llm = llm
+        self._async_llm = async_llm
         self._tool_registry = tool_registry
         self._memory = memory_service
         self._rag = rag_service
         self._max_steps = max_steps
+        self._prompt_builder = prompt_builder or PromptBuilder()
+        self._response_cache = response_cache
+        self._router = router or RetrievalRouter()
+        self._timeouts = {"history": memory_timeout, "memory": memory_timeout, "rag": rag_timeout}
+        self._context_executor = ThreadPoolExecutor(
+            max_workers=max(1, context_workers), thread_name_prefix="context"
+        )
+        self._usage_totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self._usage_lock = threading.Lock()
         self._logger = get_logger(self.__class__.__name__)
 
-    def chat(self, user_id: str, message: str) -> AgentResult:
-        self._logger.info("Nova mensagem: user_id=%s", user_id)
+    def chat(
+        self,
+        user_id: str,
+        message: str,
+        collection: str | None = None,
+        filters: MetadataFilter | None = None,
+    ) -> AgentResult:
+        turn = self._begin_turn(user_id, message, collection, filters)
+        self._gather_context(turn)
+        if turn.cached_reply is not None:
+            return self._finish_cached(turn)
+        messages = self._prepare_messages(turn)
+        tools = self._tool_registry.as_openai_tools()
+        steps = 0
+        while steps < self._max_steps:
+            steps += 1
+            self._logger.info("Passo do agente: %s", steps)
+            started = time.perf_counter()
+            response = self._llm.chat(messages=messages, tools=tools)
+            turn.add_timing("llm", started)
+            self._record_usage(turn, response)
+            if response.tool_calls:
+                started = time.perf_counter()
+                self._run_tool_calls(response, messages)
+                turn.add_timing("tools", started)
+                continue
+            return self._finish(turn, response, steps)
+        return self._fallback(turn, steps)
 
-        self._memory.add_short_term(user_id, role="user", content=message)
-        long_term = self._memory.get_long_term(user_id, limit=5)
-        short_term = self._memory.get_short_term(user_id)
-        if settings.rag_enabled:
-            try:
-                rag_context = self._rag.search(message, k=3)
-            except Exception as exc:
-                self._logger.warning("RAG indisponível: %s", exc)
-                rag_context = []
-        else:
-            rag_context = []
-
-        system_context = self._build_system_context(long_term, rag_context)
-        history = short_term[:-1] if short_term else []
-        messages: list[dict[str, Any]] = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "system", "content": REASONING_PROMPT},
-            {"role": "system", "content": TOOLS_PROMPT},
-            {"role": "system", "content": system_context},
-        ]
-        messages.extend(history)
-        messages.append({"role": "user", "content": message})
+    async def achat(
+        self,
+        user_id: str,
+        message: str,
+        collection: str | None = None,
+        filters: MetadataFilter | None = None,
+    ) -> AgentResult:
+        turn = self._begin_turn(user_id, message, collection, filters)
+        await asyncio.to_thread(self._gather_context, turn)
+        if turn.cached_reply is not None:
+            return await asyncio.to_thread(self._finish_cached, turn)
+        messages = await asyncio.to_thread(self._prepare_messages, turn)
+        tools = self._tool_registry.as_openai_tools()
+        steps = 0
+        while steps < self._max_steps:
+            steps += 1
+            self._logger.info("Passo do agente: %s", steps)
+            started = time.perf_counter()
+            if self._async_llm is not None:
+                response = await self._async_llm.chat(messages=messages, tools=tools)
+            else:
+                response = await asyncio.to_thread(self._llm.chat, messages, tools)
+            turn.add_timing("llm", started)
+            self._record_usage(turn, response)
+            if response.tool_calls:
+                started = time.perf_counter()
+                await self._arun_tool_calls(response, messages)
+                turn.add_timing("tools", started)
+                continue
+            return await asyncio.to_thread(self._finish, turn, response, steps)
+        return self._fallback(turn, steps)
 
+    async def astream(
+        self,
+        user_id: str,
+        message: str,
+        collection: str | None = None,
+        filters: MetadataFilter | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        first_token_ms: float | None = None
+        turn = self._begin_turn(user_id, message, collection, filters)
+        await asyncio.to_thread(self._gather_context, turn)
+        if turn.cached_reply is not None:
+            result = await asyncio.to_thread(self._finish_cached, turn)
+            first_token_ms = (time.perf_counter() - turn.started) * 1000
+            yield {"type": "token", "content": result.reply}
+            yield self._done_event(result, first_token_ms)
+            return
+        messages = await asyncio.to_thread(self._prepare_messages, turn)
         tools = self._tool_registry.as_openai_tools()
         steps = 0
         while steps < self._max_steps:
             steps += 1
             self._logger.info("Passo do agente: %s", steps)
-            response = self._llm.chat(messages=messages, tools=tools)
+            yield {"type": "step", "step": steps}
+            response = LLMResponse(content=None, tool_calls=[])
+            started = time.perf_counter()
+            if self._async_llm is not None:
+                async for chunk in self._async_llm.stream(messages=messages, tools=tools):
+                    if chunk.delta:
+                        if first_token_ms is None:
+                            first_token_ms = (time.perf_counter() - turn.started) * 1000
+                        yield {"type": "token", "content": chunk.delta}
+                    if chunk.response is not None:
+                        response = chunk.response
+            else:
+                response = await asyncio.to_thread(self._llm.chat, messages, tools)
+                if response.content and not response.tool_calls:
+                    first_token_ms = (time.perf_counter() - turn.started) * 1000
+                    yield {"type": "token", "content": response.content}
+            turn.add_timing("llm", started)
+            self._record_usage(turn, response)
             if response.tool_calls:
-                self._logger.info("Chamadas de tool: %s", len(response.tool_calls))
-                tool_message = self._format_tool_message(response)
-                messages.append(tool_message)
                 for call in response.tool_calls:
-                    result = self._tool_registry.run(call.name, call.arguments)
-                    messages.append(
-                        {
-                            "role": "tool",
-                            "tool_call_id": call.id,
-                            "content": result,
-                        }
-                    )
+                    yield {"type": "tool_call", "name": call.name, "arguments": call.arguments}
+                started = time.perf_counter()
+                results = await self._arun_tool_calls(response, messages)
+                turn.add_timing("tools", started)
+                for call, result in zip(response.tool_calls, results):
+                    yield {"type": "tool_result", "name": call.name, "content": result}
                 continue
-            final_text = response.content or "Sem resposta no momento."
-            self._memory.add_short_term(user_id, role="assistant", content=final_text)
-            self._memory.add_long_term(user_id, content=message)
-            self._memory.add_long_term(user_id, content=final_text)
-            return AgentResult(reply=final_text, steps=steps)
+            result = await asyncio.to_thread(self._finish, turn, response, steps)
+            if first_token_ms is not None:
+                self._logger.info("Tempo até o primeiro token: %.1f ms", first_token_ms)
+            yield self._done_event(result, first_token_ms)
+            return
+        yield self._done_event(self._fallback(turn, steps), None)
 
+    def close(self) -> None:
+        self._context_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _begin_turn(
+        self,
+        user_id: str,
+        message: str,
+        collection: str | None,
+        filters: MetadataFilter | None,
+    ) -> _Turn:
+        """Prepara o contexto do turno: memo de embeddings e escopo do RAG."""
+        embedding_memo.begin_turn()
+        collection = self._rag.set_scope(collection, filters)
+        return _Turn(user_id=user_id, message=message, collection=collection)
+
+    def _gather_context(self, turn: _Turn) -> None:
+        """Busca histórico, memória longa e RAG em paralelo, cada um com seu timeout."""
+        user_id, message = turn.user_id, turn.message
+        self._logger.info("Nova mensagem: user_id=%s", user_id)
+        sources: dict[str, Callable[[], Any]] = {
+            "history": lambda: self._memory.get_short_term(user_id),
+            "memory": lambda: self._memory.recall(
+                user_id, message, limit=settings.memory_recall_k
+            ),
+        }
+        if settings.rag_enabled and self._router.should_prefetch(message):
+            sources["rag"] = lambda: self._rag.search_many([message], k=3)[0]
+        tasks = {name: _ContextTask(source) for name, source in sources.items()}
+        futures: dict[str, Future[tuple[Any, float]]] = {
+            name: self._context_executor.submit(contextvars.copy_context().run, task)
+            for name, task in tasks.items()
+        }
+        results: dict[str, Any] = {}
+        for name, future in futures.items():
+            timeout = self._timeouts[name]
+            try:
+                # O prazo conta do início da busca, não do tempo na fila do pool; se o
+                # pool estiver tomado por fontes travadas, a espera na fila também é limitada.
+                if not tasks[name].running.wait(timeout):
+                    raise FutureTimeoutError
+                remaining = max(0.0, tasks[name].started + timeout - time.perf_counter())
+                results[name], turn.timings[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                turn.timings[name] = timeout * 1000
+                self._logger.warning(
+                    "Contexto '%s' excedeu %.1fs; seguindo sem ele.", name, timeout
+                )
+            except Exception as exc:
+                self._logger.warning("Contexto '%s' indisponível: %s", name, exc)
+        turn.history = results.get("history", [])
+        turn.memories = results.get("memory", [])
+        turn.hits = results.get("rag", [])
+        turn.add_timing("context", turn.started)
+
+        if self._response_cache is not None:
+            started = time.perf_counter()
+            turn.lookup = self._response_cache.lookup(
+                user_id,
+                message,
+                [hit.id for hit in turn.hits],
+                version=self._rag.version,
+                namespace=turn.collection,
+                # Respostas dependem da conversa e das memórias do usuário, não só da pergunta.
+                context=[
+                    *(f"{entry['role']}: {entry['content']}" for entry in turn.history),
+                    *(f"memory: {memory}" for memory in turn.memories),
+                ],
+            )
+            turn.add_timing("cache", started)
+            if turn.cached_reply is not None:
+                self._logger.info("Resposta servida do cache (%s)", turn.lookup.kind)
+
+    def _prepare_messages(self, turn: _Turn) -> list[dict[str, Any]]:
+        self._memory.add_short_term(turn.user_id, role="user", content=turn.message)
+        documents = [hit.document for hit in turn.hits]
+        turn.prompt = self._prompt_builder.build(
+            turn.user_id, turn.message, turn.history, turn.memories, documents
+        )
+        self._logger.info("Tokens do prompt: %s", turn.prompt.usage.as_dict())
+        return turn.prompt.messages
+
+    def _run_tool_calls(
+        self, response: LLMResponse, messages: list[dict[str, Any]]
+    ) -> list[str]:
+        self._logger.info("Chamadas de tool: %s", len(response.tool_calls))
+        results = self._tool_registry.run_many(
+            [(call.name, call.arguments) for call in response.tool_calls]
+        )
+        self._append_tool_results(response, results, messages)
+        return results
+
+    async def _arun_tool_calls(
+        self, response: LLMResponse, messages: list[dict[str, Any]]
+    ) -> list[str]:
+        self._logger.info("Chamadas de tool: %s", len(response.tool_calls))
+        results = await self._tool_registry.arun_many(
+            [(call.name, call.arguments) for call in response.tool_calls]
+        )
+        self._append_tool_results(response, results, messages)
+        return results
+
+    def _append_tool_results(
+        self,
+        response: LLMResponse,
+        results: list[str],
+        messages: list[dict[str, Any]],
+    ) -> None:
+        messages.append(self._format_tool_message(response))
+        for call, result in zip(response.tool_calls, results):
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "content": result,
+                }
+            )
+
+    def _finish(self, turn: _Turn, response: LLMResponse, steps: int) -> AgentResult:
+        final_text = response.content or "Sem resposta no momento."
+        self._memory.add_short_term(turn.user_id, role="assistant", content=final_text)
+        self._memory.add_long_term_many(turn.user_id, [turn.message, final_text])
+        # Só respostas diretas vão para o cache; passos com tools podem ter efeitos colaterais.
+        if self._response_cache is not None and turn.lookup is not None:
+            if response.content and steps == 1:
+                self._response_cache.store(turn.lookup, turn.message, final_text)
+        return self._result(turn, final_text, steps)
+
+    def _finish_cached(self, turn: _Turn) -> AgentResult:
+        reply = turn.cached_reply or ""
+        self._memory.add_short_term(turn.user_id, role="user", content=turn.message)
+        self._memory.add_short_term(turn.user_id, role="assistant", content=reply)
+        self._memory.add_long_term_many(turn.user_id, [turn.message, reply])
+        return self._result(turn, reply, steps=0, cached=True)
+
+    def _fallback(self, turn: _Turn, steps: int) -> AgentResult:
         fallback = "Desculpe, não consegui concluir a resposta a tempo."
         self._logger.warning("Limite de passos atingido.")
-        return AgentResult(reply=fallback, steps=steps)
+        return self._result(turn, fallback, steps)
 
-    def _build_system_context(
-        self,
-        long_term: list[str],
-        rag_context: list[str],
-    ) -> str:
-        memory_block = "\n".join(f"- {item}" for item in long_term) or "Sem memórias."
-        rag_block = "\n".join(f"- {doc}" for doc in rag_context) or "Sem contexto RAG."
-
-        return (
-            "Contexto de memória longa:\n"
-            f"{memory_block}\n\n"
-            "Contexto RAG:\n"
-            f"{rag_block}"
+    def _result(self, turn: _Turn, reply: str, steps: int, cached: bool = False) -> AgentResult:
+        turn.add_timing("total", turn.started)
+        timings = {stage: round(value, 1) for stage, value in turn.timings.items()}
+        self._logger.info("Tempos por etapa (ms): %s", timings)
+        return AgentResult(
+            reply=reply,
+            steps=steps,
+            prompt_tokens=turn.prompt.usage.as_dict() if turn.prompt is not None else None,
+            llm_usage=turn.llm_usage or None,
+            cached=cached,
+            timings_ms=timings,
+        )
+
+    def _done_event(self, result: AgentResult, first_token_ms: float | None) -> dict[str, Any]:
+        return {
+            "type": "done",
+            "reply": result.reply,
+            "steps": result.steps,
+            "ttft_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+            "cached": result.cached,
+            "prompt_tokens": result.prompt_tokens,
+            "llm_usage": result.llm_usage,
+            "timings_ms": result.timings_ms,
+        }
+
+    def usage_stats(self) -> dict[str, Any]:
+        """Totais de uso do LLM; ``cached_ratio`` mede o acerto do cache de prompt."""
+        with self._usage_lock:
+            totals = dict(self._usage_totals)
+        prompt_tokens = totals["prompt_tokens"]
+        totals["cached_ratio"] = totals["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        return totals
+
+    def retrieval_stats(self) -> dict[str, Any]:
+        """Decisões do roteador, memo do turno e atalho léxico: embeddings evitados."""
+        stats = {**self._router.stats(), **embedding_memo.stats()}
+        stats["lexical_only"] = self._rag.lexical_only
+        stats["embeddings_avoided"] = (
+            stats["skipped"] + stats["memo_hits"] + stats["lexical_only"]
         )
+        return stats
+
+    def _record_usage(self, turn: _Turn, response: LLMResponse) -> None:
+        if response.usage is None:
+            return
+        for key, value in response.usage.items():
+            turn.llm_usage[key] = turn.llm_usage.get(key, 0) + value
+        with self._usage_lock:
+            self._usage_totals["requests"] += 1
+            self._usage_totals["prompt_tokens"] += response.usage.get("prompt_tokens", 0)
+            self._usage_totals["cached_tokens"] += response.usage.get("cached_tokens", 0)
 
     def _format_tool_message(self, response: LLMResponse) -> dict[str, Any]:
         tool_calls = [
@@ -119,3 +414,18 @@ class Agent:
             for call in response.tool_calls
         ]
         return {"role": "assistant", "content": None, "tool_calls": tool_calls}
+
+
+class _ContextTask:
+    """Fonte de contexto que registra quando um worker do pool começou a executá-la."""
+
+    def __init__(self, source: Callable[[], Any]) -> None:
+        self._source = source
+        self.running = threading.Event()
+        self.started = 0.0
+
+    def __call__(self) -> tuple[Any, float]:
+        self.started = time.perf_counter()
+        self.running.set()
+        value = self._source()
+        return value, (time.perf_counter() - self.started) * 1000
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from app.agent.prompts import REASONING_PROMPT, SYSTEM_PROMPT, TOOLS_PROMPT
+from app.core.tokens import Tokenizer, get_tokenizer
+
+# Custo aproximado de cada mensagem no formato de chat (papel e separadores).
+MESSAGE_OVERHEAD_TOKENS = 4
+_MIN_TRUNCATED_TOKENS = 32
+_ROLE_LABELS = {"user": "usuário", "assistant": "assistente"}
+LAYOUTS = ("classic", "cache_friendly")
+
+
+@dataclass
+class PromptUsage:
+    system: int = 0
+    history: int = 0
+    summary: int = 0
+    memory: int = 0
+    rag: int = 0
+    message: int = 0
+    total: int = 0
+    budget: int = 0
+    dropped_turns: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class Prompt:
+    messages: list[dict[str, Any]]
+    usage: PromptUsage
+
+
+class PromptBuilder:
+    """Monta o prompt do agente dentro de um orçamento de tokens do modelo alvo.
+
+    O orçamento restante após as instruções fixas e a mensagem atual é dividido
+    entre histórico, memória longa e RAG; a sobra de uma parte vai para as outras.
+    Turnos antigos que não cabem podem virar um resumo, guardado por usuário.
+
+    No layout ``cache_friendly`` as instruções fixas formam um prefixo idêntico entre
+    requisições, o histórico vem em seguida e o contexto do turno (resumo, memória e
+    RAG) fica por último, para aproveitar o cache de prompt do provedor.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        history_share: float = 0.4,
+        memory_share: float = 0.2,
+        rag_share: float = 0.4,
+        summarize_history: bool = True,
+        summary_max_tokens: int = 256,
+        summary_turn_tokens: int = 48,
+        tokenizer: Tokenizer | None = None,
+        max_cached_summaries: int = 1000,
+        layout: str = "classic",
+    ) -> None:
+        if layout not in LAYOUTS:
+            raise ValueError(f"Layout de prompt inválido: {layout}")
+        self._layout = layout
+        total_share = history_share + memory_share + rag_share
+        self._shares = {
+            "history": history_share / total_share,
+            "memory": memory_share / total_share,
+            "rag": rag_share / total_share,
+        }
+        self._max_tokens = max_tokens
+        self._summarize = summarize_history
+        self._summary_max_tokens = summary_max_tokens
+        self._summary_turn_tokens = summary_turn_tokens
+        self._tokenizer = tokenizer or get_tokenizer()
+        self._summaries: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        self._max_cached_summaries = max_cached_summaries
+        self._lock = threading.Lock()
+        self._instructions = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": REASONING_PROMPT},
+            {"role": "system", "content": TOOLS_PROMPT},
+        ]
+        self._instruction_tokens = sum(self._message_tokens(m) for m in self._instructions)
+
+    def build(
+        self,
+        user_id: str,
+        message: str,
+        history: list[dict[str, str]],
+        memories: list[str],
+        documents: list[str],
+    ) -> Prompt:
+        usage = PromptUsage(budget=self._max_tokens)
+        usage.message = self._message_tokens({"role": "user", "content": message})
+        # Cabeçalhos fixos do bloco de contexto.
+        context_overhead = self._count(_format_context([], [])) + MESSAGE_OVERHEAD_TOKENS
+        usage.system = self._instruction_tokens + context_overhead
+        available = max(0, self._max_tokens - usage.system - usage.message)
+
+        history_costs = [self._message_tokens(turn) for turn in history]
+        memory_costs = [self._count(f"- {item}") + 1 for item in memories]
+        rag_costs = [self._count(f"- {doc}") + 1 for doc in documents]
+        budgets = self._allocate(
+            available,
+            {
+                "history": sum(history_costs),
+                "memory": sum(memory_costs),
+                "rag": sum(rag_costs),
+            },
+        )
+
+        kept_history, dropped = self._fit_history(history, history_costs, budgets["history"])
+        usage.history = sum(self._message_tokens(turn) for turn in kept_history)
+        usage.dropped_turns = len(dropped)
+        summary_message: dict[str, str] | None = None
+        if dropped and self._summarize:
+            room = budgets["history"] - usage.history
+            summary = self._summary(user_id, dropped, min(room, self._summary_max_tokens))
+            if summary:
+                summary_message = {"role": "system", "content": summary}
+                usage.summary = self._message_tokens(summary_message)
+
+        in_history = {turn["content"] for turn in kept_history} | {message}
+        memories = [item for item in memories if item not in in_history]
+        kept_memories = self._fit_items(memories, budgets["memory"])
+        kept_documents = self._fit_items(documents, budgets["rag"])
+        usage.memory = sum(self._count(f"- {item}") + 1 for item in kept_memories)
+        usage.rag = sum(self._count(f"- {doc}") + 1 for doc in kept_documents)
+
+        context = {"role": "system", "content": _format_context(kept_memories, kept_documents)}
+        summaries = [summary_message] if summary_message is not None else []
+        messages: list[dict[str, Any]] = list(self._instructions)
+        if self._layout == "cache_friendly":
+            messages.extend(kept_history)
+            messages.append({"role": "user", "content": message})
+            messages.extend([*summaries, context])
+        else:
+            messages.extend([context, *summaries])
+            messages.extend(kept_history)
+            messages.append({"role": "user", "content": message})
+        usage.total = (
+            usage.system + usage.summary + usage.history + usage.memory + usage.rag + usage.message
+        )
+        return Prompt(messages=messages, usage=usage)
+
+    def _allocate(self, available: int, needs: dict[str, int]) -> dict[str, int]:
+        budgets = {
+            name: min(needs[name], int(available * share))
+            for name, share in self._shares.items()
+        }
+        spare = available - sum(budgets.values())
+        for name in ("rag", "history", "memory"):
+            extra = min(spare, needs[name] - budgets[name])
+            budgets[name] += extra
+            spare -= extra
+        return budgets
+
+    def _fit_history(
+        self,
+        history: list[dict[str, str]],
+        costs: list[int],
+        budget: int,
+    ) -> tuple[list[dict[str, str]], list[dict[str, str]]]:
+        if self._summarize and sum(costs) > budget:
+            budget -= min(budget // 4, self._summary_max_tokens)
+        used = 0
+        start = len(history)
+        while start > 0 and used + costs[start - 1] <= budget:
+            start -= 1
+            used += costs[start]
+        return history[start:], history[:start]
+
+    def _fit_items(self, items: list[str], budget: int) -> list[str]:
+        kept: list[str] = []
+        used = 0
+        for item in items:
+            cost = self._count(f"- {item}") + 1
+            if used + cost <= budget:
+                kept.append(item)
+                used += cost
+                continue
+            remaining = budget - used - 2
+            if remaining >= _MIN_TRUNCATED_TOKENS:
+                kept.append(self._tokenizer.truncate(item, remaining))
+            break
+        return kept
+
+    def _summary(self, user_id: str, dropped: list[dict[str, str]], budget: int) -> str:
+        if budget < _MIN_TRUNCATED_TOKENS:
+            return ""
+        digest = hashlib.sha256(
+            "\x1e".join(f"{turn['role']}\x1f{turn['content']}" for turn in dropped).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            cached = self._summaries.get(user_id)
+            if cached is not None and cached[0] == digest:
+                self._summaries.move_to_end(user_id)
+                summary = cached[1]
+            else:
+                summary = None
+        if summary is None:
+            lines = ["Resumo da conversa anterior:"]
+            for turn in dropped:
+                label = _ROLE_LABELS.get(turn["role"], turn["role"])
+                excerpt = self._tokenizer.truncate(turn["content"], self._summary_turn_tokens)
+                if len(excerpt) < len(turn["content"]):
+                    excerpt += "…"
+                lines.append(f"- {label}: {excerpt}")
+            summary = "\n".join(lines)
+            with self._lock:
+                self._summaries[user_id] = (digest, summary)
+                self._summaries.move_to_end(user_id)
+                while len(self._summaries) > self._max_cached_summaries:
+                    self._summaries.popitem(last=False)
+        return self._tokenizer.truncate(summary, budget - MESSAGE_OVERHEAD_TOKENS)
+
+    def _message_tokens(self, message: dict[str, Any]) -> int:
+        return self._count(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+    def _count(self, text: str) -> int:
+        return self._tokenizer.count(text)
+
+
+def _format_context(long_term: list[str], rag_context: list[str]) -> str:
+    memory_block = "\n".join(f"- {item}" for item in long_term) or "Sem memórias."
+    rag_block = "\n".join(f"- {doc}" for doc in rag_context) or "Sem contexto RAG."
+    return (
+        "Contexto de memória longa:\n"
+        f"{memory_block}\n\n"
+        "Contexto RAG:\n"
+        f"{rag_block}"
+    )
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+import numpy as np
+
+from app.core.logging import get_logger
+from app.rag import embedding_memo
+from app.rag.service import EmbeddingClient
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,;:!?¿¡\"'"
+
+Bucket = tuple[str, tuple[int, ...], str]
+CacheKey = tuple[str, str, tuple[int, ...], str, str]
+
+
+@dataclass
+class _Entry:
+    reply: str
+    embedding: np.ndarray | None
+    expires_at: float
+
+
+@dataclass
+class CacheLookup:
+    """Resultado de uma consulta; guarde-o para armazenar a resposta depois de um miss."""
+
+    key: CacheKey
+    version: int
+    reply: str | None = None
+    kind: str | None = None
+    embedding: np.ndarray | None = field(default=None, repr=False)
+
+
+class ResponseCache:
+    """Cache de respostas do /chat por (modelo, coleção, ids dos documentos RAG, contexto,
+    mensagem).
+
+    O contexto é um hash do histórico e das memórias usados no prompt: respostas
+    montadas com a conversa ou as memórias de um usuário só servem a turnos com o
+    mesmo contexto. Além da busca exata, compara o embedding da mensagem com as
+    entradas que recuperaram os mesmos documentos e contexto e aceita a mais
+    próxima acima do limiar.
+    Entradas expiram por TTL, saem por LRU e são descartadas quando a versão da
+    base de conhecimento muda.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        embedding_client: EmbeddingClient | None = None,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.95,
+        bypass_users: Iterable[str] = (),
+    ) -> None:
+        self._model = model
+        self._embeddings = embedding_client
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._threshold = similarity_threshold
+        self._bypass_users = frozenset(bypass_users)
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._buckets: dict[Bucket, set[CacheKey]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        self._logger = get_logger(self.__class__.__name__)
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def lookup(
+        self,
+        user_id: str,
+        message: str,
+        document_ids: Iterable[int],
+        version: int = 0,
+        namespace: str = "",
+        context: Iterable[str] = (),
+    ) -> CacheLookup | None:
+        """Retorna ``None`` quando o usuário ignora o cache.
+
+        ``namespace`` separa coleções, cujos ids de documento se repetem.
+        ``context`` traz os textos do histórico e das memórias do turno.
+        """
+        if user_id in self._bypass_users:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        bucket = (namespace, tuple(sorted(document_ids)), context_digest(context))
+        key = (self._model, *bucket, normalize_message(message))
+        lookup = CacheLookup(key=key, version=version)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_version(version)
+            entry = self._live_entry(lookup.key, now)
+            if entry is not None:
+                self.exact_hits += 1
+                lookup.reply, lookup.kind = entry.reply, "exact"
+                return lookup
+            candidates = list(self._buckets.get(bucket, ()))
+        if self._semantic_enabled and candidates:
+            lookup.embedding = self._embed(message)
+        with self._lock:
+            if lookup.embedding is not None:
+                best = self._closest(lookup.embedding, candidates, now)
+                if best is not None:
+                    self.semantic_hits += 1
+                    lookup.reply, lookup.kind = best.reply, "semantic"
+                    return lookup
+            self.misses += 1
+        return lookup
+
+    def store(self, lookup: CacheLookup, message: str, reply: str) -> None:
+        if lookup.embedding is None and self._semantic_enabled:
+            lookup.embedding = self._embed(message)
+        with self._lock:
+            if lookup.version != self._version:
+                return
+            self._drop(lookup.key)
+            self._entries[lookup.key] = _Entry(
+                reply=reply,
+                embedding=lookup.embedding,
+                expires_at=time.monotonic() + self._ttl,
+            )
+            self._buckets.setdefault(_bucket(lookup.key), set()).add(lookup.key)
+            while len(self._entries) > self._max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    @property
+    def _semantic_enabled(self) -> bool:
+        return self._embeddings is not None and self._threshold < 1.0
+
+    def _sync_version(self, version: int) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._buckets.clear()
+            self._version = version
+
+    def _live_entry(self, key: CacheKey, now: float) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _closest(
+        self, embedding: np.ndarray, candidates: list[CacheKey], now: float
+    ) -> _Entry | None:
+        best: _Entry | None = None
+        best_key: CacheKey | None = None
+        best_score = self._threshold
+        for key in candidates:
+            entry = self._live_entry(key, now)
+            if entry is None or entry.embedding is None:
+                continue
+            score = float(np.dot(embedding, entry.embedding))
+            if score >= best_score:
+                best, best_key, best_score = entry, key, score
+        if best_key is not None:
+            self._entries.move_to_end(best_key)
+        return best
+
+    def _drop(self, key: CacheKey) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        bucket = self._buckets.get(_bucket(key))
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[_bucket(key)]
+
+    def _embed(self, message: str) -> np.ndarray | None:
+        if self._embeddings is None:
+            return None
+        try:
+            vector = np.asarray(embedding_memo.embed(self._embeddings, [message])[0], "float32")
+        except Exception as exc:
+            self._logger.warning("Embedding indisponível para o cache de respostas: %s", exc)
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+def _bucket(key: CacheKey) -> Bucket:
+    return key[1], key[2], key[3]
+
+
+def context_digest(context: Iterable[str]) -> str:
+    """Hash dos textos de contexto; vazio quando o turno não tem histórico nem memórias."""
+    digest = hashlib.blake2b(digest_size=16)
+    empty = True
+    for text in context:
+        empty = False
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    return "" if empty else digest.hexdigest()
+
+
+def normalize_message(message: str) -> str:
+    text = unicodedata.normalize("NFKC", message).casefold()
+    return _WHITESPACE.sub(" ", text).strip(_EDGE_PUNCTUATION)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any
+
+from app.agent.response_cache import normalize_message
+
+ROUTER_MODES = ("auto", "always", "never")
+
+_WORD = re.compile(r"\w+")
+# Palavras de saudação, agradecimento e confirmação que não pedem busca na base.
+_SMALL_TALK = frozenset(
+    "oi olá ola opa eai e aí ai hey hi hello bom boa dia tarde noite tudo bem beleza blz "
+    "obrigado obrigada brigado valeu thanks vlw agradeço ok okay certo entendi legal show "
+    "perfeito ótimo sim não nao tchau até mais logo agente você vc".split()
+)
+
+
+class RetrievalRouter:
+    """Decide localmente, sem embeddings, se vale buscar no RAG antes do LLM.
+
+    No modo ``auto`` saudações, agradecimentos e mensagens sem conteúdo não
+    disparam a busca antecipada; o modelo ainda pode chamar ``vector_search``.
+    """
+
+    def __init__(self, mode: str = "auto", min_chars: int = 3) -> None:
+        if mode not in ROUTER_MODES:
+            raise ValueError(f"Modo de roteamento inválido: {mode}")
+        self._mode = mode
+        self._min_chars = min_chars
+        self._lock = threading.Lock()
+        self.prefetched = 0
+        self.skipped = 0
+
+    def should_prefetch(self, message: str) -> bool:
+        decision = self._decide(message)
+        with self._lock:
+            if decision:
+                self.prefetched += 1
+            else:
+                self.skipped += 1
+        return decision
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"prefetched": self.prefetched, "skipped": self.skipped}
+
+    def _decide(self, message: str) -> bool:
+        if self._mode != "auto":
+            return self._mode == "always"
+        words = _WORD.findall(normalize_message(message))
+        if sum(len(word) for word in words) < self._min_chars:
+            return False
+        return not all(word in _SMALL_TALK for word in words)
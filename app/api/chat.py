@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import json
+from typing import Any, AsyncIterator
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
+from app.core.logging import get_logger
 from app.models.schemas import ChatRequest, ChatResponse
 from app.services.chat_service import get_agent
 
@@ -9,7 +14,48 @@ router = APIRouter()
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest) -> ChatResponse:
+async def chat(request: ChatRequest) -> ChatResponse:
+    agent = get_agent()
+    result = await agent.achat(
+        user_id=request.user_id,
+        message=request.message,
+        collection=request.collection,
+        filters=request.filters,
+    )
+    return ChatResponse(
+        reply=result.reply,
+        steps=result.steps,
+        prompt_tokens=result.prompt_tokens,
+        llm_usage=result.llm_usage,
+        cached=result.cached,
+        timings_ms=result.timings_ms,
+    )
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
     agent = get_agent()
-    result = agent.chat(user_id=request.user_id, message=request.message)
-    return ChatResponse(reply=result.reply, steps=result.steps)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in agent.astream(
+                user_id=request.user_id,
+                message=request.message,
+                collection=request.collection,
+                filters=request.filters,
+            ):
+                yield _sse(event)
+        except Exception as exc:
+            get_logger(__name__).exception("Falha no streaming do chat")
+            yield _sse({"type": "error", "detail": str(exc)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: dict[str, Any]) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n"
@@ -1,17 +1,134 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+import os
+import shutil
+import tempfile
 
-from app.models.schemas import DocumentRequest
-from app.services.chat_service import get_rag_service
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.models.schemas import (
+    COLLECTION_PATTERN,
+    DocumentItem,
+    DocumentRequest,
+    DocumentUpsertRequest,
+    IngestionJobResponse,
+)
+from app.rag.ingestion import Document
+from app.services.chat_service import get_ingestion_jobs, get_rag_service
 from app.services.document_service import DocumentService
+from app.services.ingestion_jobs import IngestionJob, IngestionQueueFull
 
 router = APIRouter()
 
+_UPLOAD_READ_SIZE = 64 * 1024
+
+
+@router.post("/documents", status_code=202, response_model=IngestionJobResponse)
+def add_documents(request: DocumentRequest) -> IngestionJobResponse:
+    try:
+        job = get_ingestion_jobs().submit(
+            [_document(item) for item in request.documents], collection=request.collection
+        )
+    except IngestionQueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    return _job_response(job)
+
+
+@router.put("/documents", status_code=202, response_model=IngestionJobResponse)
+def upsert_documents(request: DocumentUpsertRequest) -> IngestionJobResponse:
+    if any(not item.id for item in request.documents):
+        raise HTTPException(status_code=422, detail="Upsert exige 'id' em todos os documentos.")
+    try:
+        job = get_ingestion_jobs().submit(
+            [_document(item) for item in request.documents],
+            collection=request.collection,
+            replace=True,
+        )
+    except IngestionQueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    return _job_response(job)
+
+
+@router.delete("/documents/{doc_id}")
+def delete_document(
+    doc_id: str,
+    collection: str | None = Query(default=None, pattern=COLLECTION_PATTERN),
+) -> dict[str, int | str]:
+    removed = DocumentService(get_rag_service()).delete_documents([doc_id], collection)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Documento não encontrado.")
+    return {"status": "ok", "chunks": removed}
+
+
+@router.get("/documents/jobs/{job_id}", response_model=IngestionJobResponse)
+def get_ingestion_job(job_id: str) -> IngestionJobResponse:
+    job = get_ingestion_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return _job_response(job)
+
+
+@router.post("/documents/ndjson", status_code=202, response_model=IngestionJobResponse)
+async def add_documents_ndjson(
+    request: Request,
+    collection: str | None = Query(default=None, pattern=COLLECTION_PATTERN),
+) -> IngestionJobResponse:
+    # O corpo vai para disco sem ser interpretado; o worker valida e ingere linha a linha.
+    handle, path = tempfile.mkstemp(prefix="ndjson-", suffix=".ndjson")
+    try:
+        with os.fdopen(handle, "wb") as target:
+            async for chunk in request.stream():
+                await run_in_threadpool(target.write, chunk)
+        job = get_ingestion_jobs().submit_ndjson(path, collection=collection)
+    except IngestionQueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    except BaseException:
+        os.unlink(path)
+        raise
+    return _job_response(job)
+
+
+@router.post("/documents/upload", status_code=202, response_model=IngestionJobResponse)
+def upload_documents(
+    files: list[UploadFile] = File(...),
+    collection: str | None = Query(default=None, pattern=COLLECTION_PATTERN),
+) -> IngestionJobResponse:
+    # O multipart é fechado ao fim da requisição: o job lê cópias em disco e as apaga.
+    spooled: list[tuple[str, Document]] = []
+    try:
+        for upload in files:
+            handle, path = tempfile.mkstemp(prefix="upload-", suffix=".txt")
+            metadata = {"source": upload.filename} if upload.filename else {}
+            spooled.append((path, Document(text="", metadata=metadata)))
+            with os.fdopen(handle, "wb") as target:
+                shutil.copyfileobj(upload.file, target, _UPLOAD_READ_SIZE)
+        job = get_ingestion_jobs().submit_files(spooled, collection=collection)
+    except IngestionQueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    except BaseException:
+        for path, _ in spooled:
+            os.unlink(path)
+        raise
+    return _job_response(job)
+
+
+def _document(item: str | DocumentItem) -> str | Document:
+    if isinstance(item, str):
+        return item
+    return Document(text=item.text, metadata=item.metadata, id=item.id)
+
+
+def _job_response(job: IngestionJob) -> IngestionJobResponse:
+    return IngestionJobResponse(
+        job_id=job.id,
+        status=job.status,
+        submitted=job.submitted,
+        documents=job.progress.documents,
+        chunks=job.progress.chunks,
+        batches=job.progress.batches,
+        unchanged=job.progress.unchanged,
+        chunks_per_second=round(job.throughput, 2),
+        error=job.error,
+    )
 
-@router.post("/documents")
-def add_documents(request: DocumentRequest) -> dict[str, int | str]:
-    rag_service = get_rag_service()
-    service = DocumentService(rag_service)
-    service.add_documents(request.documents)
-    return {"status": "ok", "count": len(request.documents)}
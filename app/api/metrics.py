@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter
+
+from app.services.chat_service import (
+    get_agent,
+    get_memory_service,
+    get_rag_service,
+    get_response_cache,
+)
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics() -> dict[str, Any]:
+    agent = get_agent()
+    metrics: dict[str, Any] = {
+        "rag": get_rag_service().stats(),
+        "memory": get_memory_service().stats(),
+        "llm": agent.usage_stats(),
+        "retrieval": agent.retrieval_stats(),
+    }
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        metrics["response_cache"] = response_cache.stats()
+    return metrics
@@ -0,0 +1 @@
+"""Benchmarks offline do RAG."""
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import asdict, replace
+
+import faiss
+import numpy as np
+
+from app.rag.faiss_index import IndexConfig, build_index, search_parameters
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0, clusters: int = 64) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(row[row >= 0]) & set(ref)) for row, ref in zip(found, truth))
+    return hits / (truth.shape[0] * k)
+
+
+def evaluate(
+    config: IndexConfig,
+    base: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+) -> dict[str, float | int | str]:
+    started = time.perf_counter()
+    index = build_index(config, base)
+    index.add(base)
+    build_seconds = time.perf_counter() - started
+
+    params = search_parameters(config, index)
+    latencies: list[float] = []
+    found = np.empty((queries.shape[0], k), dtype="int64")
+    for row, query in enumerate(queries):
+        started = time.perf_counter()
+        _, indices = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found[row] = indices[0]
+    return {
+        **asdict(config),
+        "recall": round(recall_at_k(found, truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "build_s": round(build_seconds, 3),
+    }
+
+
+def run_report(
+    n: int,
+    dim: int,
+    k: int,
+    num_queries: int,
+    configs: list[IndexConfig],
+    seed: int = 0,
+) -> list[dict[str, float | int | str]]:
+    base = synthetic_vectors(n, dim, seed=seed)
+    queries = synthetic_vectors(num_queries, dim, seed=seed + 1)
+    exact = faiss.IndexFlatIP(dim)
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+    return [evaluate(config, base, queries, truth, k) for config in configs]
+
+
+def default_configs(nprobes: list[int], ef_values: list[int]) -> list[IndexConfig]:
+    base = IndexConfig()
+    configs = [base]
+    for index_type in ("ivf_flat", "ivf_pq"):
+        configs.extend(replace(base, index_type=index_type, nprobe=n) for n in nprobes)
+    configs.extend(replace(base, index_type="hnsw", ef_search=ef) for ef in ef_values)
+    return configs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Relatório recall@k x latência dos índices FAISS.")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", default="1,8,32,128")
+    parser.add_argument("--ef", default="16,64,256")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    configs = default_configs(
+        [int(value) for value in args.nprobe.split(",")],
+        [int(value) for value in args.ef.split(",")],
+    )
+    rows = run_report(args.n, args.dim, args.k, args.queries, configs)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'index':<10}{'nprobe':>8}{'ef':>6}{'recall':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for row in rows:
+        print(
+            f"{row['index_type']:<10}{row['nprobe']:>8}{row['ef_search']:>6}"
+            f"{row['recall']:>9}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable
+
+import faiss
+import numpy as np
+
+from app.benchmarks.ann_recall import recall_at_k, synthetic_vectors
+from app.rag.faiss_index import STORAGE_TYPES, IndexConfig
+from app.rag.vector_store import FaissVectorStore, InMemoryVectorStore, VectorStore
+
+STORES: dict[str, Callable[[str, int | None, int], VectorStore]] = {
+    "memory": lambda storage, dims, n: InMemoryVectorStore(storage=storage, dims=dims),
+    "faiss": lambda storage, dims, n: FaissVectorStore(
+        index_config=IndexConfig(storage=storage, dims=dims, train_threshold=n)
+    ),
+}
+
+
+def evaluate(
+    store_name: str,
+    storage: str,
+    dims: int | None,
+    base: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+) -> dict[str, float | int | str | None]:
+    store = STORES[store_name](storage, dims, base.shape[0])
+    store.add([str(position) for position in range(base.shape[0])], base)
+    latencies: list[float] = []
+    found = np.full((queries.shape[0], k), -1, dtype="int64")
+    for row, query in enumerate(queries):
+        started = time.perf_counter()
+        hits = store.search_many([query], k)[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        found[row, : len(hits)] = [hit.id for hit in hits]
+    return {
+        "store": store_name,
+        "storage": storage,
+        "dims": dims or base.shape[1],
+        "bytes_per_vector": round(store.vector_bytes() / base.shape[0], 1),
+        "recall": round(recall_at_k(found, truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+    }
+
+
+def run_report(
+    n: int,
+    dim: int,
+    k: int,
+    num_queries: int,
+    storages: list[str],
+    dims: list[int | None],
+    stores: list[str],
+    seed: int = 0,
+) -> list[dict[str, float | int | str | None]]:
+    """Memória, latência e recall@k de cada formato contra a busca exata em float32."""
+    base = synthetic_vectors(n, dim, seed=seed)
+    queries = synthetic_vectors(num_queries, dim, seed=seed + 1)
+    exact = faiss.IndexFlatIP(dim)
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+    return [
+        evaluate(store, storage, truncate, base, queries, truth, k)
+        for store in stores
+        for truncate in dims
+        for storage in storages
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Memória por vetor x latência x recall dos formatos de armazenamento."
+    )
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--storage", default=",".join(STORAGE_TYPES))
+    parser.add_argument("--dims", default="0", help="Truncamentos; 0 = dimensão completa.")
+    parser.add_argument("--stores", default=",".join(STORES))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rows = run_report(
+        args.n,
+        args.dim,
+        args.k,
+        args.queries,
+        args.storage.split(","),
+        [int(value) or None for value in args.dims.split(",")],
+        args.stores.split(","),
+    )
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(
+        f"{'store':<8}{'storage':<9}{'dims':>6}{'bytes/vec':>11}"
+        f"{'recall':>9}{'p50 ms':>10}{'p99 ms':>10}"
+    )
+    for row in rows:
+        print(
+            f"{row['store']:<8}{row['storage']:<9}{row['dims']:>6}{row['bytes_per_vector']:>11}"
+            f"{row['recall']:>9}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+from app.benchmarks.ann_recall import synthetic_vectors
+from app.rag.faiss_index import IndexConfig
+from app.rag.service import RagService
+from app.rag.vector_store import FaissVectorStore, InMemoryVectorStore, VectorStore
+
+DEFAULT_THRESHOLDS = Path(__file__).with_name("thresholds.json")
+
+# Recebem o formato e o tamanho do corpus; o FAISS treina o sq8 com o corpus inteiro.
+STORES: dict[str, Callable[[str, int], VectorStore]] = {
+    "memory": lambda storage, n: InMemoryVectorStore(storage=storage),
+    "faiss": lambda storage, n: FaissVectorStore(
+        index_config=IndexConfig(storage=storage, train_threshold=n)
+    ),
+}
+
+Result = dict[str, Any]
+_RULE_FIELDS = ("store", "n", "dim", "storage")
+
+
+class CorpusEmbeddingClient:
+    """Devolve vetores sintéticos pré-gerados para os textos do corpus, sem modelo."""
+
+    def __init__(self, texts: list[str], vectors: np.ndarray) -> None:
+        self._rows = {text: row for row, text in enumerate(texts)}
+        self._vectors = vectors
+
+    def embed(self, texts: Iterable[str]) -> list[list[float]]:
+        return list(self._vectors[[self._rows[text] for text in texts]])
+
+
+def rss_bytes() -> int | None:
+    """Memória residente do processo (Linux); ``None`` onde ``/proc`` não existe."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def corpus_texts(n: int) -> list[str]:
+    return [f"documento {row} sobre o tópico {row % 97} da seção {row % 13}" for row in range(n)]
+
+
+def run_case(
+    store_name: str,
+    n: int,
+    dim: int,
+    k: int = 10,
+    num_queries: int = 200,
+    batch_size: int = 1000,
+    storage: str = "float32",
+    seed: int = 0,
+) -> Result:
+    """Ingere ``n`` chunks via ``RagService.add_documents`` e mede busca e memória do store."""
+    texts = corpus_texts(n)
+    vectors = synthetic_vectors(n, dim, seed=seed)
+    queries = synthetic_vectors(num_queries, dim, seed=seed + 1)
+    rss_before = rss_bytes()
+    store = STORES[store_name](storage, n)
+    service = RagService(
+        vector_store=store,
+        embedding_client=CorpusEmbeddingClient(texts, vectors),
+        retrieval="dense",
+    )
+
+    started = time.perf_counter()
+    for start in range(0, n, batch_size):
+        service.add_documents(texts[start : start + batch_size])
+    add_seconds = time.perf_counter() - started
+    rss_after = rss_bytes()
+
+    latencies: list[float] = []
+    for query in queries:
+        started = time.perf_counter()
+        store.similarity_search(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    bytes_per_vector = store.vector_bytes() / n
+    service.close()
+    return {
+        "case": f"{store_name}/{n}/{dim}",
+        "store": store_name,
+        "n": n,
+        "dim": dim,
+        "storage": storage,
+        "add_docs_per_s": round(n / add_seconds, 1),
+        "search_p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "search_p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "bytes_per_vector": round(bytes_per_vector, 1),
+        "bytes_per_dim": round(bytes_per_vector / dim, 3),
+        # Aproximado: inclui textos, metadados e índice léxico, e o alocador pode reaproveitar
+        # memória liberada por casos anteriores.
+        "rss_bytes_per_vector": (
+            round((rss_after - rss_before) / n, 1)
+            if rss_before is not None and rss_after is not None
+            else None
+        ),
+    }
+
+
+def run_suite(
+    stores: list[str],
+    sizes: list[int],
+    dims: list[int],
+    **options: Any,
+) -> list[Result]:
+    return [
+        run_case(store, n, dim, **options) for store in stores for n in sizes for dim in dims
+    ]
+
+
+def check_thresholds(results: list[Result], rules: list[dict[str, Any]]) -> list[str]:
+    """Compara os resultados com as regras; retorna as violações encontradas.
+
+    Cada regra vale para os casos que casam com seus campos ``store``, ``n``,
+    ``dim`` e ``storage`` (ausentes = todos) e define limites ``min_<métrica>`` ou
+    ``max_<métrica>``, por exemplo ``{"store": "faiss", "max_search_p99_ms": 20}``.
+    """
+    violations: list[str] = []
+    for result in results:
+        for rule in rules:
+            if any(rule.get(field, result[field]) != result[field] for field in _RULE_FIELDS):
+                continue
+            for key, limit in rule.items():
+                bound, _, metric = key.partition("_")
+                if bound not in ("min", "max") or metric not in result:
+                    continue
+                value = result[metric]
+                if value is None:
+                    continue
+                if (bound == "min" and value < limit) or (bound == "max" and value > limit):
+                    violations.append(f"{result['case']}: {metric}={value} (limite {key}={limit})")
+    return violations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de ingestão e busca do RAG.")
+    parser.add_argument("--stores", default=",".join(STORES))
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dims", default="128,384,768")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--storage", default="float32")
+    parser.add_argument("--thresholds", default=str(DEFAULT_THRESHOLDS))
+    parser.add_argument("--no-check", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = run_suite(
+        args.stores.split(","),
+        [int(value) for value in args.sizes.split(",")],
+        [int(value) for value in args.dims.split(",")],
+        k=args.k,
+        num_queries=args.queries,
+        batch_size=args.batch_size,
+        storage=args.storage,
+    )
+    violations = []
+    if not args.no_check:
+        violations = check_thresholds(results, json.loads(Path(args.thresholds).read_text()))
+    if args.json:
+        print(json.dumps({"results": results, "violations": violations}, indent=2))
+    else:
+        print(
+            f"{'case':<22}{'add docs/s':>12}{'p50 ms':>10}{'p99 ms':>10}"
+            f"{'bytes/vec':>11}{'rss/vec':>10}"
+        )
+        for row in results:
+            print(
+                f"{row['case']:<22}{row['add_docs_per_s']:>12}{row['search_p50_ms']:>10}"
+                f"{row['search_p99_ms']:>10}{row['bytes_per_vector']:>11}"
+                f"{str(row['rss_bytes_per_vector']):>10}"
+            )
+        for violation in violations:
+            print(f"REGRESSÃO {violation}")
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,11 +22,79 @@ class Settings(BaseSettings):
     )
 
     memory_db_url: str = Field(default="sqlite:///./data/memory.db", alias="MEMORY_DB_URL")
-    rag_persist_dir: str = Field(default="./data/chroma", alias="RAG_PERSIST_DIR")
+    rag_persist_dir: str = Field(default="./data/faiss", alias="RAG_PERSIST_DIR")
     rag_collection: str = Field(default="knowledge_base", alias="RAG_COLLECTION")
+    rag_read_only: bool = Field(default=False, alias="RAG_READ_ONLY")
+    rag_checkpoint_every: int = Field(default=10_000, alias="RAG_CHECKPOINT_EVERY")
+    rag_index_type: str = Field(default="flat", alias="RAG_INDEX_TYPE")
+    rag_ivf_nlist: int = Field(default=1024, alias="RAG_IVF_NLIST")
+    rag_pq_m: int = Field(default=16, alias="RAG_PQ_M")
+    rag_hnsw_m: int = Field(default=32, alias="RAG_HNSW_M")
+    rag_nprobe: int = Field(default=16, alias="RAG_NPROBE")
+    rag_ef_search: int = Field(default=64, alias="RAG_EF_SEARCH")
+    rag_train_threshold: int = Field(default=50_000, alias="RAG_TRAIN_THRESHOLD")
+    rag_storage: str = Field(default="float32", alias="RAG_STORAGE")
+    rag_embedding_dims: int = Field(default=0, alias="RAG_EMBEDDING_DIMS")
+    rag_chunk_size: int = Field(default=512, alias="RAG_CHUNK_SIZE")
+    rag_chunk_overlap: int = Field(default=64, alias="RAG_CHUNK_OVERLAP")
+    rag_ingest_batch_size: int = Field(default=64, alias="RAG_INGEST_BATCH_SIZE")
+    rag_compaction_interval_seconds: float = Field(
+        default=60.0, alias="RAG_COMPACTION_INTERVAL_SECONDS"
+    )
+    rag_compaction_ratio: float = Field(default=0.2, alias="RAG_COMPACTION_RATIO")
+    rag_retrieval: str = Field(default="dense", alias="RAG_RETRIEVAL")
+    rag_lexical_fast_path: bool = Field(default=True, alias="RAG_LEXICAL_FAST_PATH")
+    rag_rrf_k: int = Field(default=60, alias="RAG_RRF_K")
+    rag_fusion_candidates: int = Field(default=20, alias="RAG_FUSION_CANDIDATES")
+    ingest_workers: int = Field(default=1, alias="INGEST_WORKERS")
+    ingest_queue_size: int = Field(default=32, alias="INGEST_QUEUE_SIZE")
+    embedding_cache_enabled: bool = Field(default=True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024, alias="EMBEDDING_CACHE_MAX_BYTES"
+    )
+    embedding_cache_path: str = Field(
+        default="./data/embeddings.db", alias="EMBEDDING_CACHE_PATH"
+    )
+    memory_write_behind: bool = Field(default=False, alias="MEMORY_WRITE_BEHIND")
+    memory_write_batch_size: int = Field(default=256, alias="MEMORY_WRITE_BATCH_SIZE")
+    memory_write_flush_ms: int = Field(default=50, alias="MEMORY_WRITE_FLUSH_MS")
+    memory_write_max_pending: int = Field(default=10_000, alias="MEMORY_WRITE_MAX_PENDING")
+    memory_write_put_timeout_ms: int = Field(default=1000, alias="MEMORY_WRITE_PUT_TIMEOUT_MS")
+    memory_write_overflow: str = Field(default="drop", alias="MEMORY_WRITE_OVERFLOW")
+    memory_write_max_retries: int = Field(default=5, alias="MEMORY_WRITE_MAX_RETRIES")
+    memory_semantic_enabled: bool = Field(default=False, alias="MEMORY_SEMANTIC_ENABLED")
+    memory_recall_k: int = Field(default=5, alias="MEMORY_RECALL_K")
+    memory_recent_k: int = Field(default=2, alias="MEMORY_RECENT_K")
+    memory_recency_weight: float = Field(default=0.2, alias="MEMORY_RECENCY_WEIGHT")
     short_term_max_messages: int = Field(default=20, alias="SHORT_TERM_MAX_MESSAGES")
+    short_term_backend: str = Field(default="memory", alias="SHORT_TERM_BACKEND")
+    short_term_ttl_seconds: float = Field(default=3600.0, alias="SHORT_TERM_TTL_SECONDS")
+    short_term_max_bytes: int = Field(default=64 * 1024 * 1024, alias="SHORT_TERM_MAX_BYTES")
+    short_term_db_url: str = Field(
+        default="sqlite:///./data/short_term.db", alias="SHORT_TERM_DB_URL"
+    )
     agent_max_steps: int = Field(default=5, alias="AGENT_MAX_STEPS")
+    response_cache_enabled: bool = Field(default=False, alias="RESPONSE_CACHE_ENABLED")
+    response_cache_max_entries: int = Field(default=1000, alias="RESPONSE_CACHE_MAX_ENTRIES")
+    response_cache_ttl_seconds: float = Field(default=3600.0, alias="RESPONSE_CACHE_TTL_SECONDS")
+    response_cache_similarity: float = Field(default=0.95, alias="RESPONSE_CACHE_SIMILARITY")
+    response_cache_bypass_users: str = Field(default="", alias="RESPONSE_CACHE_BYPASS_USERS")
+    prompt_layout: str = Field(default="classic", alias="PROMPT_LAYOUT")
+    prompt_max_tokens: int = Field(default=6000, alias="PROMPT_MAX_TOKENS")
+    prompt_history_share: float = Field(default=0.4, alias="PROMPT_HISTORY_SHARE")
+    prompt_memory_share: float = Field(default=0.2, alias="PROMPT_MEMORY_SHARE")
+    prompt_rag_share: float = Field(default=0.4, alias="PROMPT_RAG_SHARE")
+    prompt_summarize_history: bool = Field(default=True, alias="PROMPT_SUMMARIZE_HISTORY")
+    prompt_summary_max_tokens: int = Field(default=256, alias="PROMPT_SUMMARY_MAX_TOKENS")
+    tool_max_workers: int = Field(default=8, alias="TOOL_MAX_WORKERS")
+    tool_timeout_seconds: float = Field(default=30.0, alias="TOOL_TIMEOUT_SECONDS")
     rag_enabled: bool = Field(default=True, alias="RAG_ENABLED")
+    rag_prefetch: str = Field(default="auto", alias="RAG_PREFETCH")
+    context_rag_timeout_seconds: float = Field(default=10.0, alias="CONTEXT_RAG_TIMEOUT_SECONDS")
+    context_memory_timeout_seconds: float = Field(
+        default=5.0, alias="CONTEXT_MEMORY_TIMEOUT_SECONDS"
+    )
+    context_max_workers: int = Field(default=48, alias="CONTEXT_MAX_WORKERS")
     use_fake_llm: bool = Field(default=False, alias="USE_FAKE_LLM")
     use_fake_rag: bool = Field(default=False, alias="USE_FAKE_RAG")
     use_ollama: bool = Field(default=False, alias="USE_OLLAMA")
@@ -35,6 +103,9 @@ class Settings(BaseSettings):
     ollama_embed_model: str = Field(
         default="nomic-embed-text", alias="OLLAMA_EMBED_MODEL"
     )
+    ollama_embed_batch_size: int = Field(default=64, alias="OLLAMA_EMBED_BATCH_SIZE")
+    ollama_embed_concurrency: int = Field(default=4, alias="OLLAMA_EMBED_CONCURRENCY")
+    ollama_embed_max_retries: int = Field(default=3, alias="OLLAMA_EMBED_MAX_RETRIES")
 
 
 settings = Settings()
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 import json
+import re
 from dataclasses import dataclass
-from typing import Any, Protocol
+from typing import Any, AsyncIterator, Protocol
 
 import httpx
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 
 @dataclass
@@ -19,6 +20,13 @@ class ToolCall:
 class LLMResponse:
     content: str | None
     tool_calls: list[ToolCall]
+    usage: dict[str, int] | None = None
+
+
+@dataclass
+class StreamChunk:
+    delta: str = ""
+    response: LLMResponse | None = None
 
 
 class LLMClient(Protocol):
@@ -26,6 +34,19 @@ class LLMClient(Protocol):
         ...
 
 
+class AsyncLLMClient(Protocol):
+    async def chat(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> LLMResponse:
+        ...
+
+    def stream(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> AsyncIterator[StreamChunk]:
+        """Emite deltas de texto e, por último, um chunk com a resposta completa."""
+        ...
+
+
 class OpenAIChatClient:
     def __init__(self, api_key: str, model: str) -> None:
         self._client = OpenAI(api_key=api_key)
@@ -33,22 +54,65 @@ class OpenAIChatClient:
 
     def chat(self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]) -> LLMResponse:
         response = self._client.chat.completions.create(
-            model=self._model,
-            messages=messages,
-            tools=tools if tools else None,
-            tool_choice="auto" if tools else None,
+            **_openai_request(self._model, messages, tools)
+        )
+        return _parse_openai_response(response)
+
+
+class AsyncOpenAIChatClient:
+    def __init__(self, api_key: str, model: str) -> None:
+        self._client = AsyncOpenAI(api_key=api_key)
+        self._model = model
+
+    async def chat(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> LLMResponse:
+        response = await self._client.chat.completions.create(
+            **_openai_request(self._model, messages, tools)
         )
-        message = response.choices[0].message
-        tool_calls: list[ToolCall] = []
-        for call in message.tool_calls or []:
-            tool_calls.append(
-                ToolCall(
-                    id=call.id,
-                    name=call.function.name,
-                    arguments=json.loads(call.function.arguments or "{}"),
-                )
+        return _parse_openai_response(response)
+
+    async def stream(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> AsyncIterator[StreamChunk]:
+        stream = await self._client.chat.completions.create(
+            **_openai_request(self._model, messages, tools),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        content: list[str] = []
+        calls: dict[int, dict[str, str]] = {}
+        usage: dict[str, int] | None = None
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = _openai_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                yield StreamChunk(delta=delta.content)
+            for call in delta.tool_calls or []:
+                current = calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+                if call.id:
+                    current["id"] = call.id
+                if call.function and call.function.name:
+                    current["name"] += call.function.name
+                if call.function and call.function.arguments:
+                    current["arguments"] += call.function.arguments
+        tool_calls = [
+            ToolCall(
+                id=call["id"],
+                name=call["name"],
+                arguments=json.loads(call["arguments"] or "{}"),
+            )
+            for _, call in sorted(calls.items())
+        ]
+        yield StreamChunk(
+            response=LLMResponse(
+                content="".join(content) or None, tool_calls=tool_calls, usage=usage
             )
-        return LLMResponse(content=message.content, tool_calls=tool_calls)
+        )
 
 
 class OllamaChatClient:
@@ -60,9 +124,43 @@ class OllamaChatClient:
         payload = {"model": self._model, "messages": messages, "stream": False}
         response = self._client.post("/api/chat", json=payload)
         response.raise_for_status()
-        data = response.json()
-        content = data.get("message", {}).get("content", "")
-        return LLMResponse(content=content, tool_calls=[])
+        return _parse_ollama_response(response.json())
+
+
+class AsyncOllamaChatClient:
+    def __init__(self, host: str, model: str, timeout: float = 120.0) -> None:
+        self._client = httpx.AsyncClient(base_url=host, timeout=timeout)
+        self._model = model
+
+    async def chat(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> LLMResponse:
+        payload = {"model": self._model, "messages": messages, "stream": False}
+        response = await self._client.post("/api/chat", json=payload)
+        response.raise_for_status()
+        return _parse_ollama_response(response.json())
+
+    async def stream(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> AsyncIterator[StreamChunk]:
+        payload = {"model": self._model, "messages": messages, "stream": True}
+        content: list[str] = []
+        usage: dict[str, int] | None = None
+        async with self._client.stream("POST", "/api/chat", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                delta = data.get("message", {}).get("content", "")
+                if delta:
+                    content.append(delta)
+                    yield StreamChunk(delta=delta)
+                if data.get("done"):
+                    usage = _ollama_usage(data)
+        yield StreamChunk(
+            response=LLMResponse(content="".join(content), tool_calls=[], usage=usage)
+        )
 
 
 class FakeLLMClient:
@@ -105,3 +203,71 @@ class FakeLLMClient:
                 "Entendi sua solicitação. Posso resumir, responder e sugerir próximos passos."
             )
         return LLMResponse(content=reply, tool_calls=[])
+
+
+class AsyncFakeLLMClient:
+    def __init__(self) -> None:
+        self._fake = FakeLLMClient()
+
+    async def chat(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> LLMResponse:
+        return self._fake.chat(messages, tools)
+
+    async def stream(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> AsyncIterator[StreamChunk]:
+        response = self._fake.chat(messages, tools)
+        for word in re.findall(r"\S+\s*", response.content or ""):
+            yield StreamChunk(delta=word)
+        yield StreamChunk(response=response)
+
+
+def _openai_request(
+    model: str, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+) -> dict[str, Any]:
+    return {
+        "model": model,
+        "messages": messages,
+        "tools": tools if tools else None,
+        "tool_choice": "auto" if tools else None,
+    }
+
+
+def _parse_openai_response(response: Any) -> LLMResponse:
+    message = response.choices[0].message
+    tool_calls: list[ToolCall] = []
+    for call in message.tool_calls or []:
+        tool_calls.append(
+            ToolCall(
+                id=call.id,
+                name=call.function.name,
+                arguments=json.loads(call.function.arguments or "{}"),
+            )
+        )
+    usage = _openai_usage(response.usage) if response.usage is not None else None
+    return LLMResponse(content=message.content, tool_calls=tool_calls, usage=usage)
+
+
+def _openai_usage(usage: Any) -> dict[str, int]:
+    details = usage.prompt_tokens_details
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": (details.cached_tokens or 0) if details is not None else 0,
+    }
+
+
+def _parse_ollama_response(data: dict[str, Any]) -> LLMResponse:
+    content = data.get("message", {}).get("content", "")
+    return LLMResponse(content=content, tool_calls=[], usage=_ollama_usage(data))
+
+
+def _ollama_usage(data: dict[str, Any]) -> dict[str, int] | None:
+    if "prompt_eval_count" not in data and "eval_count" not in data:
+        return None
+    return {
+        "prompt_tokens": data.get("prompt_eval_count", 0),
+        "completion_tokens": data.get("eval_count", 0),
+        "cached_tokens": 0,
+    }
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any
+
+from app.core.logging import get_logger
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - ambiente sem requirements.txt completo
+    tiktoken = None
+
+_FALLBACK_PATTERN = re.compile(r"\w{1,8}|[^\w\s]")
+_fallback_warned = False
+
+
+class Tokenizer:
+    """Conta e delimita tokens com tiktoken; sem ele, cai numa heurística por regex."""
+
+    def __init__(self, model: str | None = None) -> None:
+        self._encoding: Any = None
+        if tiktoken is None:
+            _warn_fallback("tiktoken não está instalado")
+            return
+        try:
+            self._encoding = _encoding_for(model)
+        except Exception as exc:
+            _warn_fallback(f"encoding do tiktoken indisponível ({exc})")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return sum(1 for _ in _FALLBACK_PATTERN.finditer(text))
+
+    def spans(self, text: str) -> list[tuple[int, int]]:
+        """Retorna (início, fim) em caracteres de cada token do texto."""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            _, starts = self._encoding.decode_with_offsets(tokens)
+            ends = starts[1:] + [len(text)]
+            return list(zip(starts, ends))
+        return [match.span() for match in _FALLBACK_PATTERN.finditer(text)]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        spans = self.spans(text)
+        if len(spans) <= max_tokens:
+            return text
+        return text[: spans[max_tokens - 1][1]]
+
+
+def _warn_fallback(reason: str) -> None:
+    """Avisa uma única vez por processo que as contagens de tokens são aproximadas."""
+    global _fallback_warned
+    if _fallback_warned:
+        return
+    _fallback_warned = True
+    get_logger(__name__).warning(
+        "%s; contando tokens pela heurística de regex (orçamentos aproximados).", reason
+    )
+
+
+@lru_cache(maxsize=8)
+def _encoding_for(model: str | None) -> Any:
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(model: str | None = None) -> Tokenizer:
+    return Tokenizer(model)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
@@ -9,15 +11,25 @@ from fastapi.staticfiles import StaticFiles
 from app.api.chat import router as chat_router
 from app.api.documents import router as documents_router
 from app.api.memory import router as memory_router
+from app.api.metrics import router as metrics_router
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.services.chat_service import shutdown_services
 
 setup_logging()
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    shutdown_services()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 app.include_router(chat_router)
 app.include_router(documents_router)
 app.include_router(memory_router)
+app.include_router(metrics_router)
 
 web_dir = Path(__file__).resolve().parent / "web"
 app.mount("/static", StaticFiles(directory=web_dir), name="static")
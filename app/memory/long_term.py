@@ -2,34 +2,82 @@ from __future__ import annotations
 
 import sqlite3
 from datetime import datetime, timezone
-from pathlib import Path
+from typing import Iterable
+
+from app.memory.sqlite import SQLiteConnections
 
 
 class SQLiteMemoryStore:
     def __init__(self, db_url: str) -> None:
-        self._db_path = self._parse_sqlite_path(db_url)
-        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connections = SQLiteConnections(db_url)
         self._ensure_schema()
 
     def add(self, user_id: str, content: str) -> None:
-        with sqlite3.connect(self._db_path) as conn:
-            conn.execute(
-                "INSERT INTO memories (user_id, content, created_at) VALUES (?, ?, ?)",
-                (user_id, content, datetime.now(timezone.utc).isoformat()),
+        self.add_many([(user_id, content)])
+
+    def add_many(self, entries: Iterable[tuple[str, str]]) -> list[int]:
+        created_at = datetime.now(timezone.utc).isoformat()
+        rows = [(user_id, content, created_at) for user_id, content in entries]
+        if not rows:
+            return []
+        conn = self._connection()
+        ids: list[int] = []
+        with conn:
+            for row in rows:
+                cursor = conn.execute(
+                    "INSERT INTO memories (user_id, content, created_at) VALUES (?, ?, ?)",
+                    row,
+                )
+                ids.append(int(cursor.lastrowid))
+        return ids
+
+    def add_vectors(self, rows: Iterable[tuple[int, str, bytes]]) -> None:
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO memory_vectors (memory_id, user_id, vector) "
+                "VALUES (?, ?, ?)",
+                rows,
             )
-            conn.commit()
+
+    def get_vectors(self, user_id: str, limit: int) -> list[tuple[int, str, bytes]]:
+        cursor = self._connection().execute(
+            "SELECT m.id, m.content, v.vector FROM memory_vectors v "
+            "JOIN memories m ON m.id = v.memory_id "
+            "WHERE v.user_id = ? ORDER BY v.memory_id DESC LIMIT ?",
+            (user_id, limit),
+        )
+        return [(row[0], row[1], row[2]) for row in reversed(cursor.fetchall())]
 
     def get(self, user_id: str, limit: int = 10) -> list[str]:
-        with sqlite3.connect(self._db_path) as conn:
-            cursor = conn.execute(
-                "SELECT content FROM memories WHERE user_id = ? "
-                "ORDER BY id DESC LIMIT ?",
-                (user_id, limit),
-            )
-            return [row[0] for row in cursor.fetchall()]
+        cursor = self._connection().execute(
+            "SELECT content FROM memories WHERE user_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (user_id, limit),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_rows(self, user_id: str, limit: int = 10) -> list[tuple[int, str]]:
+        cursor = self._connection().execute(
+            "SELECT id, content FROM memories WHERE user_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (user_id, limit),
+        )
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def last_id(self) -> int:
+        row = self._connection().execute("SELECT MAX(id) FROM memories").fetchone()
+        return int(row[0] or 0)
+
+    def close(self) -> None:
+        self._connections.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
 
     def _ensure_schema(self) -> None:
-        with sqlite3.connect(self._db_path) as conn:
+        conn = self._connection()
+        with conn:
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS memories (
@@ -40,12 +88,20 @@ class SQLiteMemoryStore:
                 )
                 """
             )
-            conn.commit()
-
-    @staticmethod
-    def _parse_sqlite_path(db_url: str) -> Path:
-        if db_url.startswith("sqlite:///"):
-            return Path(db_url.replace("sqlite:///", "", 1))
-        if db_url.startswith("sqlite://"):
-            return Path(db_url.replace("sqlite://", "", 1))
-        return Path(db_url)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memories_user_id_id "
+                "ON memories (user_id, id DESC)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS memory_vectors (
+                    memory_id INTEGER PRIMARY KEY REFERENCES memories (id),
+                    user_id TEXT NOT NULL,
+                    vector BLOB NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memory_vectors_user_id "
+                "ON memory_vectors (user_id, memory_id DESC)"
+            )
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.logging import get_logger
+from app.memory.long_term import SQLiteMemoryStore
+from app.rag import embedding_memo
+from app.rag.service import EmbeddingClient
+from app.rag.vector_store import normalize_rows
+
+
+@dataclass
+class _UserIndex:
+    ids: list[int]
+    contents: list[str]
+    matrix: np.ndarray
+
+
+class SemanticMemoryIndex:
+    """Índice vetorial por usuário das memórias longas, persistido em `memory_vectors`."""
+
+    def __init__(
+        self,
+        store: SQLiteMemoryStore,
+        embedding_client: EmbeddingClient,
+        max_users: int = 1000,
+        max_per_user: int = 5000,
+        recency_weight: float = 0.2,
+        recency_half_life: int = 20,
+    ) -> None:
+        self._store = store
+        self._embeddings = embedding_client
+        self._max_users = max_users
+        self._max_per_user = max_per_user
+        self._recency_weight = recency_weight
+        self._half_life = max(1, recency_half_life)
+        self._users: OrderedDict[str, _UserIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        self._logger = get_logger(self.__class__.__name__)
+
+    def index(self, rows: list[tuple[int, str, str]]) -> None:
+        """Gera embeddings de (memory_id, user_id, conteúdo) e grava os vetores."""
+        if not rows:
+            return
+        try:
+            embedded = embedding_memo.embed(self._embeddings, [content for _, _, content in rows])
+            vectors = normalize_rows(np.array(embedded, "float32"))
+        except Exception as exc:
+            self._logger.warning("Embeddings de memória indisponíveis: %s", exc)
+            return
+        self._store.add_vectors(
+            (memory_id, user_id, vector.tobytes())
+            for (memory_id, user_id, _), vector in zip(rows, vectors)
+        )
+        with self._lock:
+            for (memory_id, user_id, content), vector in zip(rows, vectors):
+                user = self._users.get(user_id)
+                if user is None:
+                    continue
+                user.ids.append(memory_id)
+                user.contents.append(content)
+                user.matrix = np.vstack([user.matrix, vector[None, :]])[-self._max_per_user :]
+                user.ids = user.ids[-self._max_per_user :]
+                user.contents = user.contents[-self._max_per_user :]
+
+    def search(self, user_id: str, query: str, k: int) -> list[str]:
+        user = self._load(user_id)
+        if user is None or k <= 0:
+            return []
+        with self._lock:
+            matrix, contents = user.matrix, list(user.contents)
+        embedded = embedding_memo.embed(self._embeddings, [query])
+        vector = normalize_rows(np.array(embedded, dtype="float32"))[0]
+        similarity = matrix @ vector
+        age = np.arange(len(contents) - 1, -1, -1, dtype="float32")
+        recency = 0.5 ** (age / self._half_life)
+        scores = (1 - self._recency_weight) * similarity + self._recency_weight * recency
+        k = min(k, len(contents))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [contents[idx] for idx in top]
+
+    def _load(self, user_id: str) -> _UserIndex | None:
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None:
+                self._users.move_to_end(user_id)
+                return user
+        rows = self._store.get_vectors(user_id, limit=self._max_per_user)
+        if not rows:
+            return None
+        user = _UserIndex(
+            ids=[row[0] for row in rows],
+            contents=[row[1] for row in rows],
+            matrix=np.vstack([np.frombuffer(row[2], dtype="float32") for row in rows]),
+        )
+        with self._lock:
+            self._users[user_id] = user
+            while len(self._users) > self._max_users:
+                self._users.popitem(last=False)
+        return user
+
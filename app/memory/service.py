@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+from typing import Any
+
+from app.core.logging import get_logger
 from app.memory.long_term import SQLiteMemoryStore
-from app.memory.short_term import ShortTermMemory
+from app.memory.semantic import SemanticMemoryIndex
+from app.memory.short_term import ShortTermBackend
+from app.memory.write_behind import WriteBehindQueue
 
 
 class MemoryService:
-    def __init__(self, short_term: ShortTermMemory, long_term: SQLiteMemoryStore) -> None:
+    def __init__(
+        self,
+        short_term: ShortTermBackend,
+        long_term: SQLiteMemoryStore,
+        write_behind: WriteBehindQueue | None = None,
+        semantic: SemanticMemoryIndex | None = None,
+        recent_k: int = 2,
+    ) -> None:
         self._short_term = short_term
         self._long_term = long_term
+        self._write_behind = write_behind
+        self._semantic = semantic
+        self._recent_k = recent_k
+        self._logger = get_logger(self.__class__.__name__)
 
     def add_short_term(self, user_id: str, role: str, content: str) -> None:
         self._short_term.add(user_id, role=role, content=content)
@@ -16,7 +32,61 @@ class MemoryService:
         return self._short_term.get(user_id)
 
     def add_long_term(self, user_id: str, content: str) -> None:
-        self._long_term.add(user_id, content)
+        self.add_long_term_many(user_id, [content])
+
+    def add_long_term_many(self, user_id: str, contents: list[str]) -> None:
+        entries = [(user_id, content) for content in contents]
+        if self._write_behind is not None:
+            self._write_behind.put(entries)
+            return
+        ids = self._long_term.add_many(entries)
+        if self._semantic is not None:
+            self._semantic.index(
+                [(memory_id, uid, content) for memory_id, (uid, content) in zip(ids, entries)]
+            )
 
     def get_long_term(self, user_id: str, limit: int = 10) -> list[str]:
+        if self._write_behind is not None:
+            return self._write_behind.get(user_id, limit=limit)
         return self._long_term.get(user_id, limit=limit)
+
+    def recall(self, user_id: str, query: str, limit: int = 5) -> list[str]:
+        """Memórias mais recentes somadas às mais relevantes para a mensagem atual."""
+        if self._semantic is None:
+            return self.get_long_term(user_id, limit=limit)
+        recent = self.get_long_term(user_id, limit=min(self._recent_k, limit))
+        try:
+            relevant = self._semantic.search(user_id, query, k=limit)
+        except Exception as exc:
+            self._logger.warning("Busca semântica de memória indisponível: %s", exc)
+            return self.get_long_term(user_id, limit=limit)
+        merged = list(recent)
+        for content in relevant:
+            if len(merged) >= limit:
+                break
+            if content not in merged:
+                merged.append(content)
+        if len(merged) < limit:
+            for content in self.get_long_term(user_id, limit=limit):
+                if len(merged) >= limit:
+                    break
+                if content not in merged:
+                    merged.append(content)
+        return merged
+
+    def flush(self) -> None:
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {"short_term": self._short_term.stats()}
+        if self._write_behind is not None:
+            stats["write_behind_pending"] = self._write_behind.pending()
+            stats["write_behind_dropped"] = self._write_behind.dropped()
+        return stats
+
+    def close(self) -> None:
+        if self._write_behind is not None:
+            self._write_behind.close()
+        self._short_term.close()
+        self._long_term.close()
@@ -1,18 +1,199 @@
 from __future__ import annotations
 
-from collections import deque
-from typing import Deque
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Protocol
+
+from app.memory.sqlite import SQLiteConnections
+
+_MESSAGE_OVERHEAD = 64
+
+
+class ShortTermBackend(Protocol):
+    def add(self, user_id: str, role: str, content: str) -> None:
+        ...
+
+    def get(self, user_id: str) -> list[dict[str, str]]:
+        ...
+
+    def stats(self) -> dict[str, Any]:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+@dataclass
+class _UserHistory:
+    messages: Deque[dict[str, str]]
+    last_access: float = field(default_factory=time.monotonic)
+    bytes: int = 0
 
 
 class ShortTermMemory:
-    def __init__(self, max_messages: int = 20) -> None:
+    """Histórico em processo com despejo LRU/TTL de usuários ociosos e orçamento de bytes."""
+
+    def __init__(
+        self,
+        max_messages: int = 20,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        self._max_messages = max_messages
+        self._ttl = ttl_seconds
+        self._max_bytes = max_bytes
+        self._store: OrderedDict[str, _UserHistory] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, role: str, content: str) -> None:
+        message = {"role": role, "content": content}
+        with self._lock:
+            history = self._touch(user_id)
+            if history is None:
+                history = _UserHistory(messages=deque(maxlen=self._max_messages))
+                self._store[user_id] = history
+            if len(history.messages) == history.messages.maxlen:
+                self._account(history, -_size(history.messages[0]))
+            history.messages.append(message)
+            self._account(history, _size(message))
+            self._evict(keep=user_id)
+
+    def get(self, user_id: str) -> list[dict[str, str]]:
+        with self._lock:
+            history = self._touch(user_id)
+            return list(history.messages) if history is not None else []
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._evict()
+            return {"backend": "memory", "resident_users": len(self._store), "bytes": self._bytes}
+
+    def close(self) -> None:
+        return None
+
+    def _touch(self, user_id: str) -> _UserHistory | None:
+        history = self._store.get(user_id)
+        if history is None:
+            return None
+        if self._ttl is not None and time.monotonic() - history.last_access > self._ttl:
+            self._drop(user_id)
+            return None
+        history.last_access = time.monotonic()
+        self._store.move_to_end(user_id)
+        return history
+
+    def _evict(self, keep: str | None = None) -> None:
+        if self._ttl is not None:
+            deadline = time.monotonic() - self._ttl
+            while self._store:
+                user_id, history = next(iter(self._store.items()))
+                if history.last_access >= deadline or user_id == keep:
+                    break
+                self._drop(user_id)
+        if self._max_bytes is not None:
+            while self._bytes > self._max_bytes and len(self._store) > 1:
+                user_id = next(iter(self._store))
+                if user_id == keep:
+                    break
+                self._drop(user_id)
+
+    def _drop(self, user_id: str) -> None:
+        history = self._store.pop(user_id)
+        self._bytes -= history.bytes
+
+    def _account(self, history: _UserHistory, delta: int) -> None:
+        history.bytes += delta
+        self._bytes += delta
+
+
+class SQLiteShortTermMemory:
+    """Histórico compartilhado entre workers via SQLite (WAL), com expiração por TTL."""
+
+    def __init__(
+        self,
+        db_url: str,
+        max_messages: int = 20,
+        ttl_seconds: float | None = None,
+        sweep_interval: float = 60.0,
+    ) -> None:
+        self._connections = SQLiteConnections(db_url)
         self._max_messages = max_messages
-        self._store: dict[str, Deque[dict[str, str]]] = {}
+        self._ttl = ttl_seconds
+        self._sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._ensure_schema()
 
     def add(self, user_id: str, role: str, content: str) -> None:
-        if user_id not in self._store:
-            self._store[user_id] = deque(maxlen=self._max_messages)
-        self._store[user_id].append({"role": role, "content": content})
+        conn = self._connections.get()
+        with conn:
+            conn.execute(
+                "INSERT INTO short_term (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, role, content, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM short_term WHERE user_id = ? AND id NOT IN ("
+                "SELECT id FROM short_term WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                (user_id, user_id, self._max_messages),
+            )
+        self._maybe_sweep()
 
     def get(self, user_id: str) -> list[dict[str, str]]:
-        return list(self._store.get(user_id, []))
+        params: tuple[Any, ...] = (user_id, self._max_messages)
+        query = "SELECT role, content FROM short_term WHERE user_id = ? ORDER BY id DESC LIMIT ?"
+        if self._ttl is not None:
+            query = (
+                "SELECT role, content FROM short_term WHERE user_id = ? AND "
+                "(SELECT MAX(created_at) FROM short_term WHERE user_id = ?) >= ? "
+                "ORDER BY id DESC LIMIT ?"
+            )
+            params = (user_id, user_id, time.time() - self._ttl, self._max_messages)
+        rows = self._connections.get().execute(query, params).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def stats(self) -> dict[str, Any]:
+        users, size = self._connections.get().execute(
+            "SELECT COUNT(DISTINCT user_id), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) "
+            "FROM short_term"
+        ).fetchone()
+        return {"backend": "sqlite", "resident_users": users, "bytes": size}
+
+    def close(self) -> None:
+        self._connections.close()
+
+    def _maybe_sweep(self) -> None:
+        if self._ttl is None or time.monotonic() - self._last_sweep < self._sweep_interval:
+            return
+        self._last_sweep = time.monotonic()
+        conn = self._connections.get()
+        with conn:
+            conn.execute(
+                "DELETE FROM short_term WHERE user_id IN ("
+                "SELECT user_id FROM short_term GROUP BY user_id HAVING MAX(created_at) < ?)",
+                (time.time() - self._ttl,),
+            )
+
+    def _ensure_schema(self) -> None:
+        conn = self._connections.get()
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS short_term (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_short_term_user_id_id "
+                "ON short_term (user_id, id DESC)"
+            )
+
+
+def _size(message: dict[str, str]) -> int:
+    return len(message["content"].encode("utf-8")) + len(message["role"]) + _MESSAGE_OVERHEAD
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class SQLiteConnections:
+    """Uma conexão SQLite por thread, em modo WAL."""
+
+    def __init__(self, db_url: str) -> None:
+        self.path = parse_sqlite_path(db_url)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def parse_sqlite_path(db_url: str) -> Path:
+    if db_url.startswith("sqlite:///"):
+        return Path(db_url.replace("sqlite:///", "", 1))
+    if db_url.startswith("sqlite://"):
+        return Path(db_url.replace("sqlite://", "", 1))
+    return Path(db_url)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Iterable
+
+from app.core.logging import get_logger
+from app.memory.long_term import SQLiteMemoryStore
+
+WrittenCallback = Callable[[list[tuple[int, str, str]]], None]
+
+OVERFLOW_POLICIES = ("drop", "raise")
+
+
+class WriteQueueFull(RuntimeError):
+    """O buffer continuou cheio durante todo o tempo de espera de ``put``."""
+
+
+class WriteBehindQueue:
+    """Fila limitada que agrupa escritas de memória longa em commits por tamanho ou tempo.
+
+    O lote em gravação sai do buffer para uma vaga "em voo" e o commit roda fora
+    do lock, então ``put`` e as leituras não esperam o fsync do SQLite. Falhas são
+    repetidas com backoff exponencial até ``max_retries`` vezes; depois o lote é
+    descartado e registrado no log. Com o buffer cheio, ``put`` espera até
+    ``put_timeout`` segundos e então descarta as entradas (``overflow="drop"``) ou
+    levanta ``WriteQueueFull`` (``overflow="raise"``).
+    """
+
+    def __init__(
+        self,
+        store: SQLiteMemoryStore,
+        max_batch: int = 256,
+        flush_interval: float = 0.05,
+        max_pending: int = 10_000,
+        on_written: WrittenCallback | None = None,
+        put_timeout: float = 1.0,
+        overflow: str = "drop",
+        max_retries: int = 5,
+        max_backoff: float = 5.0,
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de fila cheia inválida: {overflow}")
+        self._store = store
+        self._on_written = on_written
+        self._max_batch = max(1, max_batch)
+        self._flush_interval = flush_interval
+        self._max_pending = max(1, max_pending)
+        self._put_timeout = put_timeout
+        self._overflow = overflow
+        self._max_retries = max(0, max_retries)
+        self._max_backoff = max_backoff
+        self._buffer: Deque[tuple[str, str]] = deque()
+        self._inflight: list[tuple[str, str]] = []
+        # Maior id já confirmado no SQLite; linhas acima dele podem ser do lote em voo.
+        self._last_id = store.last_id()
+        self._dropped = 0
+        self._cond = threading.Condition()
+        self._flush_requested = False
+        self._stopping = False
+        self._logger = get_logger(self.__class__.__name__)
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, entries: Iterable[tuple[str, str]]) -> None:
+        entries = list(entries)
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Fila de escrita encerrada.")
+            if not self._cond.wait_for(
+                lambda: len(self._buffer) < self._max_pending, timeout=self._put_timeout
+            ):
+                if self._overflow == "raise":
+                    raise WriteQueueFull("Fila de escrita de memórias cheia.")
+                self._dropped += len(entries)
+                self._logger.warning(
+                    "Fila de escrita cheia; %s memórias descartadas.", len(entries)
+                )
+                return
+            self._buffer.extend(entries)
+            self._cond.notify_all()
+
+    def get(self, user_id: str, limit: int) -> list[str]:
+        """Lê as memórias mais recentes do usuário somando o que ainda não foi gravado.
+
+        O SQLite é lido fora do lock, então um lote pode ser gravado no meio da
+        leitura. Linhas com id acima do último commit conhecido que repetem
+        memórias pendentes são descartadas para não aparecerem duas vezes.
+        """
+        with self._cond:
+            pending = self._pending_for(user_id)
+            last_id = self._last_id
+        if len(pending) >= limit:
+            return pending[:limit]
+        unconfirmed = Counter(pending)
+        stored: list[str] = []
+        for memory_id, content in self._store.get_rows(user_id, limit=limit):
+            if memory_id > last_id and unconfirmed[content] > 0:
+                unconfirmed[content] -= 1
+                continue
+            stored.append(content)
+        return (pending + stored)[:limit]
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._buffer) + len(self._inflight)
+
+    def dropped(self) -> int:
+        with self._cond:
+            return self._dropped
+
+    def flush(self) -> None:
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: (not self._buffer and not self._inflight) or not self._thread.is_alive()
+            )
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _pending_for(self, user_id: str) -> list[str]:
+        """Memórias ainda não gravadas do usuário, da mais nova para a mais antiga."""
+        queued = [content for uid, content in reversed(self._buffer) if uid == user_id]
+        writing = [content for uid, content in reversed(self._inflight) if uid == user_id]
+        return queued + writing
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._stopping)
+                if not self._buffer and self._stopping:
+                    return
+                self._cond.wait_for(
+                    lambda: len(self._buffer) >= self._max_batch
+                    or self._flush_requested
+                    or self._stopping,
+                    timeout=self._flush_interval,
+                )
+                count = min(self._max_batch, len(self._buffer))
+                batch = [self._buffer.popleft() for _ in range(count)]
+                self._inflight = batch
+                self._cond.notify_all()
+            ids = self._write(batch)
+            with self._cond:
+                self._inflight = []
+                if ids:
+                    self._last_id = max(self._last_id, *ids)
+                if not self._buffer:
+                    self._flush_requested = False
+                self._cond.notify_all()
+            if ids is not None and self._on_written is not None:
+                try:
+                    self._on_written(
+                        [(memory_id, uid, content) for memory_id, (uid, content) in zip(ids, batch)]
+                    )
+                except Exception:
+                    self._logger.exception("Falha no pós-processamento do lote de memórias.")
+
+    def _write(self, batch: list[tuple[str, str]]) -> list[int] | None:
+        delay = self._flush_interval
+        for attempt in range(1, self._max_retries + 2):
+            try:
+                return self._store.add_many(batch)
+            except Exception as exc:
+                if attempt > self._max_retries:
+                    self._logger.error(
+                        "Lote de %s memórias descartado após %s tentativas.",
+                        len(batch),
+                        attempt,
+                        exc_info=exc,
+                    )
+                    break
+                self._logger.warning(
+                    "Falha ao gravar lote de memórias (tentativa %s); nova tentativa em %.2fs.",
+                    attempt,
+                    delay,
+                    exc_info=exc,
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, self._max_backoff)
+        with self._cond:
+            self._dropped += len(batch)
+        return None
@@ -1,20 +1,54 @@
 from __future__ import annotations
 
+from typing import Any
+
 from pydantic import BaseModel, Field
 
+COLLECTION_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
 
 class ChatRequest(BaseModel):
     user_id: str = Field(..., min_length=1)
     message: str = Field(..., min_length=1)
+    collection: str | None = Field(default=None, pattern=COLLECTION_PATTERN)
+    filters: dict[str, Any] | None = None
 
 
 class ChatResponse(BaseModel):
     reply: str
     steps: int
+    prompt_tokens: dict[str, int] | None = None
+    llm_usage: dict[str, int] | None = None
+    cached: bool = False
+    timings_ms: dict[str, float] | None = None
+
+
+class DocumentItem(BaseModel):
+    text: str = Field(..., min_length=1)
+    id: str | None = None
+    metadata: dict[str, Any] = Field(default_factory=dict)
 
 
 class DocumentRequest(BaseModel):
-    documents: list[str] = Field(..., min_length=1)
+    documents: list[str | DocumentItem] = Field(..., min_length=1)
+    collection: str | None = Field(default=None, pattern=COLLECTION_PATTERN)
+
+
+class DocumentUpsertRequest(BaseModel):
+    documents: list[DocumentItem] = Field(..., min_length=1)
+    collection: str | None = Field(default=None, pattern=COLLECTION_PATTERN)
+
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    status: str
+    submitted: int
+    documents: int = 0
+    chunks: int = 0
+    batches: int = 0
+    unchanged: int = 0
+    chunks_per_second: float = 0.0
+    error: str | None = None
 
 
 class MemoryResponse(BaseModel):
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+from app.core.tokens import Tokenizer, get_tokenizer
+
+
+class TextChunker:
+    def __init__(
+        self,
+        chunk_size: int = 512,
+        chunk_overlap: int = 64,
+        tokenizer: Tokenizer | None = None,
+    ) -> None:
+        if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap deve ser menor que chunk_size.")
+        self._size = chunk_size
+        self._step = chunk_size - chunk_overlap
+        self._overlap = chunk_overlap
+        self._tokenizer = tokenizer or get_tokenizer()
+
+    def chunk(self, text: str) -> list[str]:
+        return list(self.chunk_stream([text]))
+
+    def chunk_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Divide um texto recebido em partes, mantendo só um chunk em memória."""
+        buffer = ""
+        emitted = False
+        for piece in pieces:
+            buffer += piece
+            spans = self._tokenizer.spans(buffer)
+            start = 0
+            while len(spans) - start > self._size:
+                end = spans[start + self._size - 1][1]
+                chunk = buffer[spans[start][0] : end].strip()
+                if chunk:
+                    yield chunk
+                    emitted = True
+                start += self._step
+            if start:
+                buffer = buffer[spans[start][0] :]
+        spans = self._tokenizer.spans(buffer)
+        if spans and (not emitted or len(spans) > self._overlap):
+            chunk = buffer[spans[0][0] :].strip()
+            if chunk:
+                yield chunk
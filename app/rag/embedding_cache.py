@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from app.rag.service import EmbeddingClient
+
+
+class CachedEmbeddingClient:
+    """Cache de embeddings por (modelo, sha256 do texto) com LRU em memória e SQLite."""
+
+    def __init__(
+        self,
+        client: EmbeddingClient,
+        model: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        db_path: str | None = None,
+    ) -> None:
+        self._client = client
+        self._model = model
+        self._max_bytes = max_bytes
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        if db_path:
+            path = Path(db_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def embed(self, texts: Iterable[str]) -> list[list[float]]:
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            for key, vector in self._disk_get(missing).items():
+                found[key] = vector
+                self._remember(key, vector)
+                self.disk_hits += 1
+
+        pending = {key: text for key, text in zip(keys, texts) if key not in found}
+        if pending:
+            vectors = self._client.embed(list(pending.values()))
+            fresh = {
+                key: np.asarray(vector, dtype="float32")
+                for key, vector in zip(pending, vectors)
+            }
+            with self._lock:
+                self.misses += len(fresh)
+                for key, vector in fresh.items():
+                    self._remember(key, vector)
+                self._disk_put(fresh)
+            found.update(fresh)
+        return [found[key].tolist() for key in keys]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+                "entries": len(self._lru),
+                "bytes": self._bytes,
+            }
+
+    def close(self) -> None:
+        """Fecha o SQLite e o cliente embrulhado (pool e conexões HTTP, quando houver)."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        close_client = getattr(self._client, "close", None)
+        if close_client is not None:
+            close_client()
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self._model}:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        previous = self._lru.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._lru[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self._max_bytes and self._lru:
+            _, evicted = self._lru.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _disk_get(self, keys: list[str]) -> dict[str, np.ndarray]:
+        if self._conn is None or not keys:
+            return {}
+        found: dict[str, np.ndarray] = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            cursor = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            )
+            for key, blob in cursor.fetchall():
+                found[key] = np.frombuffer(blob, dtype="float32").copy()
+        return found
+
+    def _disk_put(self, vectors: dict[str, np.ndarray]) -> None:
+        if self._conn is None or not vectors:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, vector.tobytes()) for key, vector in vectors.items()],
+        )
+        self._conn.commit()
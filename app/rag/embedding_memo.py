@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Iterable
+
+if TYPE_CHECKING:
+    from app.rag.service import EmbeddingClient
+
+# Embeddings calculados no turno atual, por (cliente, texto). O dicionário é
+# compartilhado com as cópias de contexto usadas pelas threads do turno.
+_turn_memo: ContextVar[dict[tuple[int, str], Future[list[float]]] | None] = ContextVar(
+    "turn_embedding_memo", default=None
+)
+_lock = threading.Lock()
+_counters = {"memo_hits": 0, "memo_misses": 0}
+
+
+def begin_turn() -> None:
+    """Inicia um memo vazio para o turno do contexto atual."""
+    _turn_memo.set({})
+
+
+def embed(client: EmbeddingClient, texts: Iterable[str]) -> list[list[float]]:
+    """Embeda reaproveitando vetores já calculados (ou em cálculo) no mesmo turno."""
+    texts = list(texts)
+    memo = _turn_memo.get()
+    if memo is None:
+        return client.embed(texts)
+    owned: dict[str, Future[list[float]]] = {}
+    futures: list[Future[list[float]]] = []
+    with _lock:
+        for text in texts:
+            key = (id(client), text)
+            future = memo.get(key)
+            if future is None:
+                future = owned[text] = memo[key] = Future()
+                _counters["memo_misses"] += 1
+            else:
+                _counters["memo_hits"] += 1
+            futures.append(future)
+    if owned:
+        try:
+            vectors = client.embed(list(owned))
+        except BaseException as exc:
+            with _lock:
+                for text, future in owned.items():
+                    memo.pop((id(client), text), None)
+                    future.set_exception(exc)
+            raise
+        for future, vector in zip(owned.values(), vectors):
+            future.set_result(vector)
+    return [future.result() for future in futures]
+
+
+def stats() -> dict[str, Any]:
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from app.rag.persistence import VectorLog
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGE_TYPES = ("float32", "float16", "sq8")
+
+_QUANTIZERS = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+@dataclass
+class IndexConfig:
+    """Tipo de índice, parâmetros de busca e formato dos vetores.
+
+    ``storage`` define como o índice guarda cada componente: ``float32``,
+    ``float16`` (metade da memória) ou ``sq8`` (um quarto, com faixa por
+    dimensão treinada ao atingir ``train_threshold``; ignorado em ``ivf_pq``).
+    ``dims`` trunca os embeddings nas primeiras dimensões antes de normalizar,
+    para modelos treinados no estilo Matryoshka.
+    """
+
+    index_type: str = "flat"
+    nlist: int = 1024
+    pq_m: int = 16
+    hnsw_m: int = 32
+    nprobe: int = 16
+    ef_search: int = 64
+    train_threshold: int = 50_000
+    storage: str = "float32"
+    dims: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Tipo de índice inválido: {self.index_type}")
+        if self.storage not in STORAGE_TYPES:
+            raise ValueError(f"Formato de armazenamento inválido: {self.storage}")
+
+    @property
+    def is_flat(self) -> bool:
+        return self.index_type == "flat"
+
+    @property
+    def needs_training(self) -> bool:
+        """Se o índice definitivo só é montado ao atingir ``train_threshold``."""
+        return not self.is_flat or self.storage == "sq8"
+
+
+def initial_index(config: IndexConfig, dim: int) -> faiss.Index:
+    """Índice de um store vazio: o definitivo ou, se precisar de treino, busca exata."""
+    if config.needs_training:
+        return faiss.IndexFlatIP(dim)
+    return build_index(config, np.zeros((0, dim), dtype="float32"))
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray) -> faiss.Index:
+    """Cria o índice configurado, treinando com os vetores quando necessário."""
+    dim = vectors.shape[1]
+    quantizer_type = _QUANTIZERS.get(config.storage)
+    if config.index_type == "flat":
+        if quantizer_type is None:
+            return faiss.IndexFlatIP(dim)
+        index = faiss.IndexScalarQuantizer(dim, quantizer_type, faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            index.train(vectors)
+        return index
+    if config.index_type == "hnsw":
+        if quantizer_type is None:
+            index = faiss.IndexHNSWFlat(dim, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWSQ(
+                dim, quantizer_type, config.hnsw_m, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+        index.hnsw.efSearch = config.ef_search
+        return index
+    nlist = max(1, min(config.nlist, vectors.shape[0] // 39))
+    quantizer = faiss.IndexFlatIP(dim)
+    if config.index_type == "ivf_flat" and quantizer_type is not None:
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dim, nlist, quantizer_type, faiss.METRIC_INNER_PRODUCT
+        )
+    elif config.index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexIVFPQ(
+            quantizer, dim, nlist, _pq_subquantizers(dim, config.pq_m), 8,
+            faiss.METRIC_INNER_PRODUCT,
+        )
+    index.train(vectors)
+    index.nprobe = config.nprobe
+    return index
+
+
+def search_parameters(
+    config: IndexConfig,
+    index: faiss.Index,
+    selector: faiss.IDSelector | None = None,
+) -> faiss.SearchParameters | None:
+    """Parâmetros de busca do índice; ``selector`` restringe as linhas visitadas."""
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(efSearch=config.ef_search)
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(nprobe=config.nprobe)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+class MappedFlatIndex:
+    """Busca exata por produto interno direto sobre o log de vetores mapeado.
+
+    O faiss 1.8 ignora ``IO_FLAG_MMAP`` em ``IndexFlat`` e copia o checkpoint
+    inteiro para a memória privada do processo. Aqui os vetores ficam no page
+    cache, compartilhados entre os workers que abrem o mesmo diretório, e o
+    próprio log é o índice: não há checkpoint a gravar.
+    """
+
+    # Teto de cada bloco de linhas copiado numa busca filtrada seletiva.
+    _BLOCK_BYTES = 16 << 20
+
+    def __init__(self, log: VectorLog, ntotal: int) -> None:
+        self.d = log.dim
+        self.ntotal = ntotal
+        self._log = log
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Os vetores já foram acrescentados ao log pelo store; só avança o total."""
+        self.ntotal += vectors.shape[0]
+
+    def search(
+        self, queries: np.ndarray, k: int, mask: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k com ``faiss.knn``; ``mask`` exclui linhas (filtros e remoções).
+
+        Com filtro, cada bloco é buscado direto no mapeamento pedindo ``k`` mais
+        as linhas excluídas; se sobram poucas linhas, só elas são copiadas.
+        """
+        matrix = self._log.mapped(self.ntotal)
+        metric = faiss.METRIC_INNER_PRODUCT
+        if mask is None:
+            return faiss.knn(queries, matrix, k, metric=metric)
+        block = max(1024, self._BLOCK_BYTES // (4 * self.d))
+        scores = np.zeros((queries.shape[0], 0), dtype="float32")
+        indices = np.zeros((queries.shape[0], 0), dtype="int64")
+        for start in range(0, self.ntotal, block):
+            end = min(start + block, self.ntotal)
+            allowed = np.flatnonzero(mask[start:end]) + start
+            if allowed.shape[0] == 0:
+                continue
+            if 2 * allowed.shape[0] < end - start:
+                found_scores, found = faiss.knn(
+                    queries, matrix[allowed], min(k, allowed.shape[0]), metric=metric
+                )
+                found = allowed[found]
+            else:
+                wanted = min(k + (end - start) - allowed.shape[0], end - start)
+                found_scores, found = faiss.knn(queries, matrix[start:end], wanted, metric=metric)
+                found += start
+                found_scores[~mask[found]] = -np.inf
+            scores, indices = _best(
+                np.hstack([scores, found_scores]), np.hstack([indices, found]), k
+            )
+        return scores, np.where(np.isfinite(scores), indices, -1)
+
+
+def is_flat_checkpoint(path: Path) -> bool:
+    """Se o arquivo é um ``IndexFlat`` gravado pelo faiss (fourcc ``IxFI``/``IxF2``)."""
+    with path.open("rb") as handle:
+        return handle.read(4) in (b"IxFI", b"IxF2")
+
+
+def code_bytes(index: faiss.Index | MappedFlatIndex) -> int:
+    """Bytes dos códigos de vetor guardados no índice (sem grafo nem listas de ids)."""
+    if isinstance(index, MappedFlatIndex):
+        return 4 * index.d * index.ntotal
+    try:
+        per_vector = index.sa_code_size()
+    except RuntimeError:
+        storage = getattr(index, "storage", None)
+        if storage is None:
+            per_vector = 4 * index.d
+        else:
+            per_vector = faiss.downcast_index(storage).sa_code_size()
+    return int(per_vector * index.ntotal)
+
+
+def _best(scores: np.ndarray, indices: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, top, axis=1)
+        indices = np.take_along_axis(indices, top, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+def _pq_subquantizers(dim: int, requested: int) -> int:
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
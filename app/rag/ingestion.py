@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
+
+from app.core.logging import get_logger
+from app.rag.chunking import TextChunker
+from app.rag.service import RagService
+
+
+@dataclass
+class Document:
+    """Documento com id estável e metadados herdados por todos os seus chunks."""
+
+    text: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+    id: str | None = None
+
+
+@dataclass
+class _Chunk:
+    text: str
+    doc_id: str
+    metadata: dict[str, Any]
+
+
+@dataclass
+class IngestionProgress:
+    documents: int = 0
+    chunks: int = 0
+    batches: int = 0
+    unchanged: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+ProgressCallback = Callable[[IngestionProgress], None]
+
+
+class IngestionPipeline:
+    def __init__(
+        self,
+        rag_service: RagService,
+        chunker: TextChunker | None = None,
+        batch_size: int = 64,
+    ) -> None:
+        self._rag = rag_service
+        self._chunker = chunker or TextChunker()
+        self._batch_size = max(1, batch_size)
+        self._logger = get_logger(self.__class__.__name__)
+
+    def ingest(
+        self,
+        documents: Iterable[str | Document],
+        on_progress: ProgressCallback | None = None,
+        progress: IngestionProgress | None = None,
+        collection: str | None = None,
+        replace: bool = False,
+    ) -> IngestionProgress:
+        """Ingere documentos; com ``replace``, cada id substitui a versão anterior."""
+        progress = progress or IngestionProgress()
+
+        def chunks() -> Iterator[_Chunk]:
+            for item in documents:
+                document = _as_document(item)
+                progress.documents += 1
+                for text in self._chunker.chunk(document.text):
+                    yield _Chunk(text, document.id or "", document.metadata)
+
+        return self._run(chunks(), progress, on_progress, collection, replace)
+
+    def ingest_stream(
+        self,
+        pieces: Iterable[str],
+        on_progress: ProgressCallback | None = None,
+        progress: IngestionProgress | None = None,
+        collection: str | None = None,
+        document: Document | None = None,
+    ) -> IngestionProgress:
+        """Ingere um único documento lido em pedaços; ``document.text`` é ignorado."""
+        progress = progress or IngestionProgress()
+        progress.documents += 1
+        document = _as_document(document or Document(text=""))
+        chunks = (
+            _Chunk(text, document.id or "", document.metadata)
+            for text in self._chunker.chunk_stream(pieces)
+        )
+        return self._run(chunks, progress, on_progress, collection, replace=False)
+
+    def _run(
+        self,
+        chunks: Iterator[_Chunk],
+        progress: IngestionProgress,
+        on_progress: ProgressCallback | None,
+        collection: str | None,
+        replace: bool,
+    ) -> IngestionProgress:
+        batch: list[_Chunk] = []
+        for chunk in chunks:
+            # No upsert um documento nunca é dividido entre lotes: o lote o substitui inteiro.
+            full = len(batch) >= self._batch_size
+            if full and (not replace or chunk.doc_id != batch[-1].doc_id):
+                self._flush(batch, progress, on_progress, collection, replace)
+                batch = []
+            batch.append(chunk)
+        if batch:
+            self._flush(batch, progress, on_progress, collection, replace)
+        return progress
+
+    def _flush(
+        self,
+        batch: list[_Chunk],
+        progress: IngestionProgress,
+        on_progress: ProgressCallback | None,
+        collection: str | None,
+        replace: bool,
+    ) -> None:
+        texts = [chunk.text for chunk in batch]
+        metadata = [chunk.metadata for chunk in batch]
+        ids = [chunk.doc_id for chunk in batch]
+        if replace:
+            progress.unchanged += self._rag.upsert_documents(
+                texts, metadata=metadata, ids=ids, collection=collection
+            )
+        else:
+            self._rag.add_documents(texts, metadata=metadata, ids=ids, collection=collection)
+        progress.chunks += len(batch)
+        progress.batches += 1
+        self._logger.info(
+            "Ingestão: %s documentos, %s chunks, %s lotes",
+            progress.documents,
+            progress.chunks,
+            progress.batches,
+        )
+        if on_progress is not None:
+            on_progress(progress)
+
+
+def parse_ndjson_line(line: str, line_number: int) -> Document | None:
+    """Converte uma linha NDJSON (string ou ``{"text", "id", "metadata"}``) em documento.
+
+    Linhas vazias viram ``None``; linhas malformadas levantam ``ValueError``.
+    """
+    if not line.strip():
+        return None
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Linha NDJSON inválida: {line_number}") from exc
+    metadata: object = {}
+    doc_id: object = None
+    if isinstance(item, dict):
+        metadata = item.get("metadata") or {}
+        doc_id = item.get("id")
+        item = item.get("text") or item.get("content") or ""
+    valid_id = doc_id is None or isinstance(doc_id, (str, int))
+    if not isinstance(item, str) or not isinstance(metadata, dict) or not valid_id:
+        raise ValueError(f"Linha NDJSON inválida: {line_number}")
+    if not item:
+        return None
+    return Document(text=item, metadata=metadata, id=str(doc_id) if doc_id is not None else None)
+
+
+def iter_ndjson(lines: Iterable[str]) -> Iterator[Document]:
+    """Documentos das linhas, lidos sob demanda; para na primeira linha malformada."""
+    for line_number, line in enumerate(lines, start=1):
+        document = parse_ndjson_line(line, line_number)
+        if document is not None:
+            yield document
+
+
+def _as_document(item: str | Document) -> Document:
+    if isinstance(item, str):
+        item = Document(text=item)
+    if not item.id:
+        item = Document(text=item.text, metadata=item.metadata, id=uuid.uuid4().hex)
+    return item
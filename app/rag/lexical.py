@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from typing import Iterable
+
+import numpy as np
+
+# Palavras, com compostos como "ERR-4021", "user_id" ou "v1.2.3" mantidos inteiros.
+_TOKEN = re.compile(r"\w+(?:[-_./:#]\w+)*")
+_SEPARATORS = re.compile(r"[-_./:#]")
+_CAMEL = re.compile(r"[a-z][A-Z]")
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokens em minúsculas; compostos geram o token inteiro e suas partes."""
+    tokens: list[str] = []
+    for match in _TOKEN.finditer(unicodedata.normalize("NFKC", text).casefold()):
+        token = match.group()
+        tokens.append(token)
+        if _SEPARATORS.search(token):
+            tokens.extend(part for part in _SEPARATORS.split(token) if part)
+    return tokens
+
+
+def looks_like_identifier(query: str, max_words: int = 3) -> bool:
+    """Consultas curtas com códigos, erros ou nomes técnicos (``SKU-123``, ``NullPointer``)."""
+    words = query.split()
+    if not words or len(words) > max_words:
+        return False
+    return any(_is_identifier(word.strip("\"'`()[]{},;")) for word in words)
+
+
+def _is_identifier(word: str) -> bool:
+    has_digit = any(ch.isdigit() for ch in word)
+    has_alpha = any(ch.isalpha() for ch in word)
+    if has_digit and (has_alpha or len(word) >= 4):
+        return True
+    if has_alpha and _SEPARATORS.search(word.strip("-_./:#")):
+        return True
+    return bool(_CAMEL.search(word)) or (len(word) >= 2 and word.isupper())
+
+
+class BM25Index:
+    """Índice invertido BM25 mantido incrementalmente, com as posições do vector store.
+
+    Linhas removidas continuam contando nas estatísticas até a compactação do
+    store; a busca só as ignora via ``mask``.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self._k1 = k1
+        self._b = b
+        self._postings: dict[str, list[int]] = {}
+        self._frequencies: dict[str, list[int]] = {}
+        self._lengths = np.zeros(0, dtype="float32")
+        self._size = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            position = self._size
+            tokens = tokenize(text)
+            counts: dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self._postings.setdefault(token, []).append(position)
+                self._frequencies.setdefault(token, []).append(count)
+            self._reserve(position + 1)
+            self._lengths[position] = len(tokens)
+            self._total_length += len(tokens)
+            self._size += 1
+
+    def search(
+        self, query: str, k: int, mask: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Retorna (posições, scores) dos ``k`` melhores, do maior para o menor score."""
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+        if not terms or k <= 0:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+        average = self._total_length / self._size if self._size else 1.0
+        positions: list[np.ndarray] = []
+        contributions: list[np.ndarray] = []
+        for term in terms:
+            rows = np.asarray(self._postings[term], dtype="int64")
+            frequencies = np.asarray(self._frequencies[term], dtype="float32")
+            idf = math.log(1 + (self._size - rows.shape[0] + 0.5) / (rows.shape[0] + 0.5))
+            norm = self._k1 * (1 - self._b + self._b * self._lengths[rows] / average)
+            positions.append(rows)
+            contributions.append(idf * frequencies * (self._k1 + 1) / (frequencies + norm))
+        rows, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions)).astype("float32")
+        if mask is not None:
+            visible = rows < mask.shape[0]
+            visible[visible] = mask[rows[visible]]
+            rows, scores = rows[visible], scores[visible]
+        if k < rows.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._lengths.shape[0]:
+            return
+        lengths = np.zeros(max(size, 2 * self._lengths.shape[0], 1024), dtype="float32")
+        lengths[: self._size] = self._lengths[: self._size]
+        self._lengths = lengths
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import operator
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+MetadataFilter = dict[str, Any]
+
+_RANGE_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+_SCALARS = (str, int, float, bool)
+
+
+class MetadataIndex:
+    """Listas invertidas de metadados (campo -> valor -> linhas) para filtrar buscas.
+
+    Filtros aceitam igualdade (``{"source": "faq"}``), pertinência
+    (``{"lang": ["pt", "en"]}``) e operadores (``{"date": {"gte": "2024-01-01"}}``:
+    ``eq``, ``ne``, ``in``, ``gt``, ``gte``, ``lt``, ``lte``). Campos com listas
+    casam quando qualquer item casa. O custo depende dos valores distintos e das
+    linhas que casam, não do tamanho da coleção.
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, dict[Any, list[int]]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def extend(self, rows: Iterable[dict[str, Any]]) -> None:
+        for row in rows:
+            position = self._size
+            self._size += 1
+            for field, value in row.items():
+                values = value if isinstance(value, list) else [value]
+                postings = self._postings.setdefault(field, {})
+                for item in values:
+                    if isinstance(item, _SCALARS):
+                        postings.setdefault(item, []).append(position)
+
+    def mask(self, where: MetadataFilter, size: int | None = None) -> np.ndarray:
+        size = self._size if size is None else size
+        mask = np.ones(size, dtype=bool)
+        for field, condition in where.items():
+            mask &= self._field_mask(field, condition, size)
+        return mask
+
+    def _field_mask(self, field: str, condition: Any, size: int) -> np.ndarray:
+        postings = self._postings.get(field, {})
+        if isinstance(condition, list):
+            condition = {"in": condition}
+        elif not isinstance(condition, dict):
+            condition = {"eq": condition}
+        mask = np.ones(size, dtype=bool)
+        for op, expected in condition.items():
+            if op == "eq":
+                selected = self._rows_for(postings, [expected], size)
+            elif op == "in":
+                selected = self._rows_for(postings, list(expected), size)
+            elif op == "ne":
+                selected = ~self._rows_for(postings, [expected], size)
+            elif op in _RANGE_OPERATORS:
+                compare = _RANGE_OPERATORS[op]
+                selected = self._rows_for(
+                    postings, [value for value in postings if _safe(compare, value, expected)], size
+                )
+            else:
+                raise ValueError(f"Operador de filtro inválido: {op}")
+            mask &= selected
+        return mask
+
+    def _rows_for(
+        self, postings: dict[Any, list[int]], values: list[Any], size: int
+    ) -> np.ndarray:
+        mask = np.zeros(size, dtype=bool)
+        for value in values:
+            rows = postings.get(value) if isinstance(value, _SCALARS) else None
+            if rows:
+                positions = np.asarray(rows, dtype="int64")
+                mask[positions[positions < size]] = True
+        return mask
+
+
+def _safe(compare: Callable[[Any, Any], bool], value: Any, expected: Any) -> bool:
+    if isinstance(value, bool) != isinstance(expected, bool):
+        return False
+    try:
+        return bool(compare(value, expected))
+    except TypeError:
+        return False
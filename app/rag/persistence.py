@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+
+class DocTable:
+    """Tabela de documentos append-only, lida via mmap."""
+
+    def __init__(self, directory: Path, read_only: bool = False, name: str = "docs") -> None:
+        self._data_path = directory / f"{name}.bin"
+        self._offsets_path = directory / f"{name}.offsets"
+        self._read_only = read_only
+        if not read_only:
+            self._data_path.touch(exist_ok=True)
+            self._offsets_path.touch(exist_ok=True)
+        self._offsets: np.ndarray = np.zeros(0, dtype="int64")
+        self._data: mmap.mmap | None = None
+        self._remap()
+
+    def __len__(self) -> int:
+        return int(self._offsets.shape[0])
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = int(self._offsets[index - 1]) if index > 0 else 0
+        end = int(self._offsets[index])
+        if self._data is None:
+            return ""
+        return self._data[start:end].decode("utf-8")
+
+    def extend(self, documents: Iterable[str]) -> None:
+        if self._read_only:
+            raise RuntimeError("Tabela de documentos aberta em modo somente leitura.")
+        encoded = [doc.encode("utf-8") for doc in documents]
+        if not encoded:
+            return
+        end = int(self._offsets[-1]) if len(self) else 0
+        offsets = np.cumsum([len(item) for item in encoded], dtype="int64") + end
+        with self._data_path.open("ab") as handle:
+            handle.write(b"".join(encoded))
+        with self._offsets_path.open("ab") as handle:
+            handle.write(offsets.tobytes())
+        self._remap()
+
+    def truncate(self, count: int) -> None:
+        if count >= len(self):
+            return
+        end = int(self._offsets[count - 1]) if count > 0 else 0
+        self.close()
+        with self._offsets_path.open("r+b") as handle:
+            handle.truncate(count * 8)
+        with self._data_path.open("r+b") as handle:
+            handle.truncate(end)
+        self._remap()
+
+    def sync(self) -> None:
+        if self._read_only:
+            return
+        for path in (self._data_path, self._offsets_path):
+            with path.open("rb") as handle:
+                os.fsync(handle.fileno())
+
+    def close(self) -> None:
+        self._close_data()
+        self._offsets = np.zeros(0, dtype="int64")
+
+    def _remap(self) -> None:
+        self._close_data()
+        if not self._offsets_path.exists():
+            self._offsets = np.zeros(0, dtype="int64")
+            return
+        count = self._offsets_path.stat().st_size // 8
+        if count:
+            self._offsets = np.memmap(self._offsets_path, dtype="int64", mode="r", shape=(count,))
+        else:
+            self._offsets = np.zeros(0, dtype="int64")
+        if self._data_path.exists() and self._data_path.stat().st_size > 0:
+            with self._data_path.open("rb") as handle:
+                self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_data(self) -> None:
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+
+class VectorLog:
+    """Log append-only de vetores float32, lido via mmap."""
+
+    def __init__(self, path: Path, dim: int, read_only: bool = False) -> None:
+        self._path = path
+        self._dim = dim
+        self._read_only = read_only
+        self._map: np.ndarray | None = None
+        if not read_only:
+            self._path.touch(exist_ok=True)
+
+    def __len__(self) -> int:
+        if not self._path.exists():
+            return 0
+        return self._path.stat().st_size // (4 * self._dim)
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def mapped(self, count: int) -> np.ndarray:
+        """Visão somente leitura das ``count`` primeiras linhas, sem copiá-las.
+
+        O mapeamento é refeito só quando o log cresce além dele; as páginas ficam
+        no page cache, compartilhadas com outros processos que leem o mesmo arquivo.
+        """
+        if count == 0:
+            return np.zeros((0, self._dim), dtype="float32")
+        if self._map is None or self._map.shape[0] < count:
+            self._map = np.memmap(
+                self._path, dtype="float32", mode="r", shape=(len(self), self._dim)
+            )
+        return self._map[:count]
+
+    def append(self, vectors: np.ndarray) -> None:
+        if self._read_only:
+            raise RuntimeError("Log de vetores aberto em modo somente leitura.")
+        with self._path.open("ab") as handle:
+            handle.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+
+    def read(self, start: int = 0, end: int | None = None) -> np.ndarray:
+        count = len(self)
+        end = count if end is None else min(end, count)
+        if start >= end:
+            return np.zeros((0, self._dim), dtype="float32")
+        matrix = np.memmap(self._path, dtype="float32", mode="r", shape=(count, self._dim))
+        return np.array(matrix[start:end])
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Lê linhas arbitrárias (ordenadas ou não) sem carregar o log inteiro."""
+        if positions.shape[0] == 0:
+            return np.zeros((0, self._dim), dtype="float32")
+        matrix = np.memmap(self._path, dtype="float32", mode="r", shape=(len(self), self._dim))
+        return np.array(matrix[positions])
+
+    def truncate(self, count: int) -> None:
+        self._map = None
+        with self._path.open("r+b") as handle:
+            handle.truncate(count * 4 * self._dim)
+
+    def sync(self) -> None:
+        if self._read_only:
+            return
+        with self._path.open("rb") as handle:
+            os.fsync(handle.fileno())
+
+
+class TombstoneLog:
+    """Log append-only das posições removidas (int64) desde a última compactação."""
+
+    def __init__(self, path: Path, read_only: bool = False) -> None:
+        self._path = path
+        self._read_only = read_only
+
+    def read(self) -> np.ndarray:
+        if not self._path.exists():
+            return np.zeros(0, dtype="int64")
+        return np.fromfile(self._path, dtype="int64")
+
+    def append(self, positions: Iterable[int]) -> None:
+        if self._read_only:
+            raise RuntimeError("Log de remoções aberto em modo somente leitura.")
+        data = np.fromiter(positions, dtype="int64")
+        if data.shape[0]:
+            with self._path.open("ab") as handle:
+                handle.write(data.tobytes())
+
+    def sync(self) -> None:
+        if self._read_only or not self._path.exists():
+            return
+        with self._path.open("rb") as handle:
+            os.fsync(handle.fileno())
+
+
+def read_meta(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_meta(path: Path, meta: dict[str, Any]) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp_path, path)
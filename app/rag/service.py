@@ -1,11 +1,28 @@
 from __future__ import annotations
 
-from typing import Iterable, Protocol
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import replace
+from typing import Any, Callable, Iterable, Protocol
 
 import httpx
 from openai import OpenAI
 
-from app.rag.vector_store import VectorStore
+from app.core.logging import get_logger
+from app.rag import embedding_memo
+from app.rag.lexical import looks_like_identifier
+from app.rag.metadata import MetadataFilter
+from app.rag.vector_store import SearchHit, VectorStore, content_hash
+
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+# Recebe o nome da coleção e se ela pode ser criada; retorna None se não existir.
+StoreFactory = Callable[[str, bool], "VectorStore | None"]
+
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 
 class EmbeddingClient(Protocol):
@@ -24,21 +41,83 @@ class OpenAIEmbeddingClient:
 
 
 class OllamaEmbeddingClient:
-    def __init__(self, host: str, model: str, timeout: float = 120.0) -> None:
-        self._client = httpx.Client(base_url=host, timeout=timeout)
+    def __init__(
+        self,
+        host: str,
+        model: str,
+        timeout: float = 120.0,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        self._client = httpx.Client(
+            base_url=host,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
         self._model = model
+        self._batch_size = max(1, batch_size)
+        self._concurrency = max(1, concurrency)
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._batch_supported: bool | None = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._concurrency, thread_name_prefix="ollama-embed"
+        )
 
     def embed(self, texts: Iterable[str]) -> list[list[float]]:
-        embeddings: list[list[float]] = []
-        for text in texts:
-            response = self._client.post(
-                "/api/embeddings", json={"model": self._model, "prompt": text}
-            )
-            response.raise_for_status()
-            data = response.json()
-            embeddings.append(data.get("embedding", []))
+        texts = list(texts)
+        if not texts:
+            return []
+        if self._batch_supported is not False:
+            batches = [
+                texts[start : start + self._batch_size]
+                for start in range(0, len(texts), self._batch_size)
+            ]
+            first = self._embed_batch(batches[0])
+            if first is not None:
+                rest = self._executor.map(self._embed_batch, batches[1:])
+                return first + [vector for batch in rest for vector in batch or []]
+        return list(self._executor.map(self._embed_one, texts))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._client.close()
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]] | None:
+        response = self._post("/api/embed", {"model": self._model, "input": texts})
+        if response.status_code == 404 and self._batch_supported is None:
+            self._batch_supported = False
+            return None
+        response.raise_for_status()
+        self._batch_supported = True
+        embeddings = response.json().get("embeddings", [])
+        if len(embeddings) != len(texts):
+            raise ValueError("Resposta de embeddings em lote com tamanho inesperado.")
         return embeddings
 
+    def _embed_one(self, text: str) -> list[float]:
+        response = self._post("/api/embeddings", {"model": self._model, "prompt": text})
+        response.raise_for_status()
+        return response.json().get("embedding", [])
+
+    def _post(self, path: str, payload: dict[str, Any]) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = self._client.post(path, json=payload)
+            except httpx.TransportError:
+                if attempt >= self._max_retries:
+                    raise
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    return response
+                if attempt >= self._max_retries:
+                    return response
+            time.sleep(self._retry_backoff * 2**attempt)
+            attempt += 1
+
 
 class FakeEmbeddingClient:
     def embed(self, texts: Iterable[str]) -> list[list[float]]:
@@ -50,16 +129,302 @@ class FakeEmbeddingClient:
 
 
 class RagService:
-    def __init__(self, vector_store: VectorStore, embedding_client: EmbeddingClient) -> None:
-        self._store = vector_store
+    """Busca semântica em coleções isoladas, cada uma com seu próprio índice.
+
+    ``vector_store`` atende a coleção padrão; as demais são criadas sob demanda
+    por ``store_factory``. Sem fábrica, só a coleção padrão existe. Com
+    ``compaction_interval``, uma thread compacta as coleções cuja fração de
+    linhas removidas passa de ``compaction_ratio``.
+
+    No modo ``hybrid`` a busca densa e a BM25 são fundidas por reciprocal rank
+    fusion, e consultas com cara de identificador (códigos, erros, nomes) são
+    respondidas só pelo índice léxico quando ele encontra algo, sem embedding.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedding_client: EmbeddingClient,
+        store_factory: StoreFactory | None = None,
+        default_collection: str = "default",
+        compaction_interval: float | None = None,
+        compaction_ratio: float = 0.2,
+        retrieval: str = "dense",
+        lexical_fast_path: bool = True,
+        rrf_k: int = 60,
+        fusion_candidates: int = 20,
+    ) -> None:
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de recuperação inválido: {retrieval}")
+        self._retrieval = retrieval
+        self._lexical_fast_path = lexical_fast_path
+        self._rrf_k = rrf_k
+        self._fusion_candidates = fusion_candidates
+        self._lexical_only = 0
+        self._default = validate_collection(default_collection)
+        self._stores: dict[str, VectorStore] = {self._default: vector_store}
+        self._store_factory = store_factory
         self._embeddings = embedding_client
+        self._lock = threading.Lock()
+        self._logger = get_logger(self.__class__.__name__)
+        self._version = 0
+        self._embeddings_reused = 0
+        self._compaction_ratio = compaction_ratio
+        self._stopping = threading.Event()
+        self._compactor: threading.Thread | None = None
+        if compaction_interval:
+            self._compactor = threading.Thread(
+                target=self._compact_periodically,
+                args=(compaction_interval,),
+                name="rag-compaction",
+                daemon=True,
+            )
+            self._compactor.start()
+        # Coleção e filtro da requisição atual; buscas sem escopo explícito (tools) os herdam.
+        self._scope: ContextVar[tuple[str | None, MetadataFilter | None]] = ContextVar(
+            f"rag_scope_{id(self)}", default=(None, None)
+        )
 
-    def add_documents(self, documents: list[str]) -> None:
-        vectors = self._embeddings.embed(documents)
-        self._store.add(documents=documents, embeddings=vectors)
+    @property
+    def version(self) -> int:
+        """Muda sempre que a base de conhecimento é alterada ou compactada."""
+        return self._version
 
-    def search(self, query: str, k: int = 3) -> list[str]:
-        if self._store.count() == 0:
-            return []
-        vector = self._embeddings.embed([query])[0]
-        return self._store.similarity_search(vector, k=k)
+    @property
+    def lexical_only(self) -> int:
+        """Consultas respondidas só pelo índice léxico, sem embedding."""
+        return self._lexical_only
+
+    @property
+    def default_collection(self) -> str:
+        return self._default
+
+    def collections(self) -> list[str]:
+        with self._lock:
+            return sorted(self._stores)
+
+    def set_scope(
+        self, collection: str | None = None, where: MetadataFilter | None = None
+    ) -> str:
+        """Define coleção e filtro das buscas sem escopo explícito no contexto atual.
+
+        Vale para as threads que copiam o contexto (tools do turno). Retorna a
+        coleção efetiva.
+        """
+        collection = validate_collection(collection) if collection else self._default
+        self._scope.set((collection, where or None))
+        return collection
+
+    def add_documents(
+        self,
+        documents: list[str],
+        metadata: list[dict[str, Any]] | None = None,
+        ids: list[str] | None = None,
+        collection: str | None = None,
+    ) -> None:
+        store = self._store(collection or self._default, create=True)
+        assert store is not None
+        vectors = self._embed_chunks(store, documents)
+        store.add(documents=documents, embeddings=vectors, metadata=metadata, ids=ids)
+        self._version += 1
+
+    def upsert_documents(
+        self,
+        documents: list[str],
+        metadata: list[dict[str, Any]] | None,
+        ids: list[str],
+        collection: str | None = None,
+    ) -> int:
+        """Substitui os chunks de cada id pelos recebidos; retorna os ids inalterados.
+
+        Todos os chunks de um id devem vir na mesma chamada. Ids cujo conteúdo e
+        metadados não mudaram não são regravados, e chunks com texto já indexado
+        reaproveitam o vetor gravado em vez de chamar o modelo de embeddings.
+        """
+        if len(ids) != len(documents) or not all(ids):
+            raise ValueError("upsert exige um id por documento.")
+        metadata = metadata or [{} for _ in documents]
+        store = self._store(collection or self._default, create=True)
+        assert store is not None
+        grouped: dict[str, list[int]] = {}
+        for position, doc_id in enumerate(ids):
+            grouped.setdefault(doc_id, []).append(position)
+        current = store.fingerprints(grouped)
+        changed = [
+            position
+            for doc_id, positions in grouped.items()
+            if current.get(doc_id)
+            != [(content_hash(documents[p]), dict(metadata[p] or {})) for p in positions]
+            for position in positions
+        ]
+        unchanged = len(grouped) - len({ids[position] for position in changed})
+        if changed:
+            texts = [documents[position] for position in changed]
+            store.add(
+                documents=texts,
+                embeddings=self._embed_chunks(store, texts),
+                metadata=[metadata[position] for position in changed],
+                ids=[ids[position] for position in changed],
+                replace=True,
+            )
+            self._version += 1
+        return unchanged
+
+    def delete_documents(self, ids: list[str], collection: str | None = None) -> int:
+        """Remove todos os chunks dos ids; retorna quantos chunks saíram."""
+        store = self._store(collection or self._default, create=False)
+        if store is None:
+            return 0
+        removed = store.delete(ids)
+        if removed:
+            self._version += 1
+        return removed
+
+    def compact(self, min_ratio: float = 0.0) -> int:
+        """Compacta as coleções com fração de linhas removidas >= ``min_ratio``."""
+        with self._lock:
+            stores = list(self._stores.values())
+        removed = 0
+        for store in stores:
+            tombstones = store.tombstones()
+            if tombstones and tombstones / (tombstones + store.count()) >= min_ratio:
+                removed += store.compact()
+        if removed:
+            # As posições das linhas mudam: invalida o que foi guardado por id de hit.
+            self._version += 1
+        return removed
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        collection: str | None = None,
+        where: MetadataFilter | None = None,
+    ) -> list[str]:
+        hits = self.search_many([query], k=k, collection=collection, where=where)[0]
+        return [hit.document for hit in hits]
+
+    def search_many(
+        self,
+        queries: list[str],
+        k: int = 3,
+        collection: str | None = None,
+        where: MetadataFilter | None = None,
+    ) -> list[list[SearchHit]]:
+        scoped_collection, scoped_where = self._scope.get()
+        collection = collection or scoped_collection or self._default
+        where = where if where is not None else scoped_where
+        store = self._store(collection, create=False)
+        if store is None or store.count() == 0 or not queries:
+            return [[] for _ in queries]
+        if self._retrieval == "dense":
+            vectors = embedding_memo.embed(self._embeddings, queries)
+            return store.search_many(vectors, k=k, where=where)
+        return self._hybrid_search(store, queries, k, where)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stores = dict(self._stores)
+        stats: dict[str, Any] = {
+            "documents": sum(store.count() for store in stores.values()),
+            "collections": {name: store.count() for name, store in sorted(stores.items())},
+            "tombstones": sum(store.tombstones() for store in stores.values()),
+            "vector_bytes": sum(store.vector_bytes() for store in stores.values()),
+            "embeddings_reused": self._embeddings_reused,
+            "lexical_only": self._lexical_only,
+        }
+        embedding_stats = getattr(self._embeddings, "stats", None)
+        if embedding_stats is not None:
+            stats["embedding_cache"] = embedding_stats()
+        return stats
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            store.close()
+        close_embeddings = getattr(self._embeddings, "close", None)
+        if close_embeddings is not None:
+            close_embeddings()
+
+    def _hybrid_search(
+        self,
+        store: VectorStore,
+        queries: list[str],
+        k: int,
+        where: MetadataFilter | None,
+    ) -> list[list[SearchHit]]:
+        candidates = max(k, self._fusion_candidates)
+        lexical = [store.lexical_search(query, candidates, where=where) for query in queries]
+        results: list[list[SearchHit] | None] = [None] * len(queries)
+        dense_positions: list[int] = []
+        for position, query in enumerate(queries):
+            if self._lexical_fast_path and lexical[position] and looks_like_identifier(query):
+                results[position] = lexical[position][:k]
+                self._lexical_only += 1
+            else:
+                dense_positions.append(position)
+        if dense_positions:
+            vectors = embedding_memo.embed(
+                self._embeddings, [queries[position] for position in dense_positions]
+            )
+            dense = store.search_many(vectors, k=candidates, where=where)
+            for position, hits in zip(dense_positions, dense):
+                results[position] = reciprocal_rank_fusion(
+                    [hits, lexical[position]], k=k, rrf_k=self._rrf_k
+                )
+        return [hits or [] for hits in results]
+
+    def _embed_chunks(self, store: VectorStore, texts: list[str]) -> list[list[float]]:
+        """Embeda só os textos que o store ainda não tem gravados."""
+        hashes = [content_hash(text) for text in texts]
+        known: dict[str, Any] = store.vectors_for(set(hashes))
+        missing = list(dict.fromkeys(text for text, h in zip(texts, hashes) if h not in known))
+        if missing:
+            vectors = self._embeddings.embed(missing)
+            known.update((content_hash(text), vector) for text, vector in zip(missing, vectors))
+        self._embeddings_reused += len(texts) - len(missing)
+        return [known[h] for h in hashes]
+
+    def _compact_periodically(self, interval: float) -> None:
+        while not self._stopping.wait(interval):
+            try:
+                self.compact(min_ratio=self._compaction_ratio)
+            except Exception:
+                self._logger.exception("Falha na compactação do RAG.")
+
+    def _store(self, collection: str, create: bool) -> VectorStore | None:
+        validate_collection(collection)
+        with self._lock:
+            store = self._stores.get(collection)
+            if store is None and self._store_factory is not None:
+                # Coleções já persistidas abrem na primeira busca; as novas só na escrita.
+                store = self._store_factory(collection, create)
+                if store is not None:
+                    self._stores[collection] = store
+            if store is None and create:
+                raise ValueError(f"Coleção indisponível: {collection}")
+            return store
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[SearchHit]], k: int, rrf_k: int = 60
+) -> list[SearchHit]:
+    """Funde rankings pela soma de ``1 / (rrf_k + posição)``; o score vira o valor fundido."""
+    scores: dict[int, float] = {}
+    hits: dict[int, SearchHit] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit.id] = scores.get(hit.id, 0.0) + 1.0 / (rrf_k + rank)
+            hits.setdefault(hit.id, hit)
+    best = sorted(scores, key=lambda row: scores[row], reverse=True)[:k]
+    return [replace(hits[row], score=scores[row]) for row in best]
+
+
+def validate_collection(name: str) -> str:
+    if not _COLLECTION_NAME.match(name):
+        raise ValueError(f"Nome de coleção inválido: {name}")
+    return name
@@ -1,84 +1,921 @@
 from __future__ import annotations
 
-import math
-from typing import Iterable, Protocol
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Protocol
 
 import faiss
 import numpy as np
 
+from app.core.logging import get_logger
+from app.rag.faiss_index import (
+    STORAGE_TYPES,
+    IndexConfig,
+    MappedFlatIndex,
+    build_index,
+    code_bytes,
+    initial_index,
+    is_flat_checkpoint,
+    search_parameters,
+)
+from app.rag.lexical import BM25Index
+from app.rag.metadata import MetadataFilter, MetadataIndex
+from app.rag.persistence import DocTable, TombstoneLog, VectorLog, read_meta, write_meta
+
+# (hash do conteúdo, metadados) de cada chunk vivo de um documento, na ordem de gravação.
+Fingerprint = list[tuple[str, dict[str, Any]]]
+
+
+@dataclass
+class SearchHit:
+    id: int
+    document: str
+    score: float
+    doc_id: str = ""
+    metadata: dict[str, Any] = field(default_factory=dict)
+
 
 class VectorStore(Protocol):
-    def add(self, documents: list[str], embeddings: list[list[float]]) -> None:
+    def add(
+        self,
+        documents: list[str],
+        embeddings: list[list[float]],
+        metadata: list[dict[str, Any]] | None = None,
+        ids: list[str] | None = None,
+        replace: bool = False,
+    ) -> None:
+        ...
+
+    def delete(self, ids: Iterable[str]) -> int:
+        ...
+
+    def fingerprints(self, ids: Iterable[str]) -> dict[str, Fingerprint]:
+        ...
+
+    def vectors_for(self, hashes: Iterable[str]) -> dict[str, np.ndarray]:
         ...
 
     def similarity_search(self, embedding: list[float], k: int) -> list[str]:
         ...
 
+    def search_many(
+        self,
+        embeddings: list[list[float]],
+        k: int,
+        where: MetadataFilter | None = None,
+    ) -> list[list[SearchHit]]:
+        ...
+
+    def lexical_search(
+        self, query: str, k: int, where: MetadataFilter | None = None
+    ) -> list[SearchHit]:
+        ...
+
     def count(self) -> int:
         ...
 
+    def tombstones(self) -> int:
+        ...
+
+    def compact(self) -> int:
+        ...
+
+    def vector_bytes(self) -> int:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def prepare_vectors(embeddings: list[list[float]], dims: int | None = None) -> np.ndarray:
+    """Matriz float32 normalizada, truncada nas primeiras ``dims`` dimensões (Matryoshka).
+
+    Cada linha é truncada antes do empilhamento: vetores reaproveitados do store já
+    vêm com ``dims`` dimensões e podem se misturar a embeddings novos completos.
+    """
+    if dims is not None and not isinstance(embeddings, np.ndarray):
+        embeddings = [embedding[:dims] for embedding in embeddings]
+    vectors = np.array(embeddings, dtype="float32")
+    if dims is not None:
+        vectors = vectors[:, :dims]
+    return normalize_rows(vectors)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RowCatalog:
+    """Ids estáveis, hashes de conteúdo, metadados e tombstones das linhas de um store.
+
+    A posição de uma linha é o id dela no índice e não muda até a próxima
+    compactação: remover um documento só marca suas linhas, que deixam de ser
+    visitadas na busca.
+    """
 
-class FaissVectorStore:
     def __init__(self) -> None:
-        self._docs: list[str] = []
-        self._index: faiss.Index | None = None
+        self.metadata = MetadataIndex()
+        self.deleted = 0
+        self._doc_rows: dict[str, list[int]] = {}
+        self._hash_rows: dict[str, int] = {}
+        self._tombstones = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    @property
+    def live(self) -> int:
+        return len(self) - self.deleted
+
+    def extend(self, rows: Iterable[dict[str, Any]]) -> None:
+        rows = list(rows)
+        start = len(self)
+        self._reserve(start + len(rows))
+        self.metadata.extend(row["metadata"] for row in rows)
+        for position, row in enumerate(rows, start):
+            self._doc_rows.setdefault(row["doc_id"], []).append(position)
+            self._hash_rows[row["hash"]] = position
+
+    def rows_of(self, doc_ids: Iterable[str]) -> dict[str, list[int]]:
+        found: dict[str, list[int]] = {}
+        for doc_id in doc_ids:
+            rows = [row for row in self._doc_rows.get(doc_id, ()) if not self._tombstones[row]]
+            if rows:
+                found[doc_id] = rows
+        return found
+
+    def delete(self, doc_ids: Iterable[str]) -> list[int]:
+        positions = [row for doc_id in doc_ids for row in self._doc_rows.pop(doc_id, ())]
+        return self.mark_deleted(positions)
+
+    def mark_deleted(self, positions: Iterable[int]) -> list[int]:
+        marked: list[int] = []
+        for position in positions:
+            if 0 <= position < len(self) and not self._tombstones[position]:
+                self._tombstones[position] = True
+                marked.append(position)
+        self.deleted += len(marked)
+        return marked
+
+    def position_of(self, content: str) -> int | None:
+        """Linha com o hash de conteúdo, mesmo removida: o vetor segue gravado."""
+        return self._hash_rows.get(content)
+
+    def live_positions(self) -> np.ndarray:
+        return np.flatnonzero(~self._tombstones[: len(self)])
+
+    def mask(self, where: MetadataFilter | None, size: int) -> np.ndarray | None:
+        """Linhas visitáveis; ``None`` quando não há filtro nem remoções."""
+        if not where and not self.deleted:
+            return None
+        mask = self.metadata.mask(where, size) if where else np.ones(size, dtype=bool)
+        live = ~self._tombstones[:size]
+        mask[: live.shape[0]] &= live
+        return mask
 
-    def add(self, documents: list[str], embeddings: list[list[float]]) -> None:
+    def _reserve(self, size: int) -> None:
+        if size <= self._tombstones.shape[0]:
+            return
+        tombstones = np.zeros(max(size, 2 * self._tombstones.shape[0], 1024), dtype=bool)
+        tombstones[: len(self)] = self._tombstones[: len(self)]
+        self._tombstones = tombstones
+
+
+class FaissVectorStore:
+    INDEX_FILE = "index.faiss"
+    META_FILE = "meta.json"
+    VECTORS_FILE = "vectors.f32"
+    ROWS_TABLE = "rows"
+    TOMBSTONES_FILE = "deleted.i64"
+    COMPACT_DIR = ".compact"
+    COMPACT_READY = "ready.json"
+    _COMPACT_CHUNK = 10_000
+    _LEXICAL_CHUNK = 10_000
+
+    def __init__(
+        self,
+        persist_dir: str | None = None,
+        read_only: bool = False,
+        checkpoint_every: int = 10_000,
+        index_config: IndexConfig | None = None,
+        lexical: bool = True,
+    ) -> None:
+        self._docs: list[str] | DocTable = []
+        self._rows: list[str] | DocTable = []
+        self._catalog = RowCatalog()
+        self._lexical_enabled = lexical
+        self._lexical: BM25Index | None = None
+        # Incrementado a cada reabertura; uma montagem do BM25 de geração antiga é descartada.
+        self._lexical_generation = 0
+        self._config = index_config or IndexConfig()
+        self._index: faiss.Index | MappedFlatIndex | None = None
+        self._dir = Path(persist_dir) if persist_dir else None
+        self._read_only = read_only
+        self._checkpoint_every = checkpoint_every
+        self._vector_log: VectorLog | None = None
+        self._tombstone_log: TombstoneLog | None = None
+        self._pending = 0
+        self._lock = threading.RLock()
+        self._logger = get_logger(self.__class__.__name__)
+        if self._dir is not None:
+            self._open()
+        else:
+            self._build_lexical()
+
+    def add(
+        self,
+        documents: list[str],
+        embeddings: list[list[float]],
+        metadata: list[dict[str, Any]] | None = None,
+        ids: list[str] | None = None,
+        replace: bool = False,
+    ) -> None:
+        """Acrescenta chunks; com ``replace``, os chunks anteriores dos mesmos ids saem antes."""
         if not documents:
             return
-        vectors = np.array(embeddings, dtype="float32")
-        vectors = self._normalize(vectors)
-        if self._index is None:
-            self._index = faiss.IndexFlatIP(vectors.shape[1])
-        self._index.add(vectors)
-        self._docs.extend(documents)
+        if self._read_only:
+            raise RuntimeError("Vector store aberto em modo somente leitura.")
+        vectors = prepare_vectors(embeddings, self._config.dims)
+        rows = _row_entries(documents, metadata, ids)
+        with self._lock:
+            if self._index is not None and vectors.shape[1] != self._index.d:
+                raise ValueError(
+                    f"Dimensão {vectors.shape[1]} difere da do store ({self._index.d})."
+                )
+            if replace:
+                self._delete({row["doc_id"] for row in rows})
+            if self._index is None:
+                if self._dir is not None:
+                    self._init_files(vectors.shape[1])
+                self._index = self._empty_index(vectors.shape[1])
+            if self._vector_log is not None:
+                self._vector_log.append(vectors)
+            self._docs.extend(documents)
+            self._rows.extend(json.dumps(row, ensure_ascii=False) for row in rows)
+            self._catalog.extend(rows)
+            if self._lexical is not None:
+                self._lexical.add(documents)
+            self._index.add(vectors)
+            if self._dir is not None:
+                self._pending += len(documents)
+            if not self._maybe_migrate() and self._pending >= self._checkpoint_every:
+                self.save()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Marca como removidos todos os chunks dos ids; retorna quantos saíram."""
+        if self._read_only:
+            raise RuntimeError("Vector store aberto em modo somente leitura.")
+        with self._lock:
+            return self._delete(ids)
+
+    def fingerprints(self, ids: Iterable[str]) -> dict[str, Fingerprint]:
+        with self._lock:
+            return {
+                doc_id: [(row["hash"], row["metadata"]) for row in map(self._row, positions)]
+                for doc_id, positions in self._catalog.rows_of(ids).items()
+            }
+
+    def vectors_for(self, hashes: Iterable[str]) -> dict[str, np.ndarray]:
+        """Vetores já gravados para os hashes de conteúdo, sem chamar o modelo de embeddings."""
+        with self._lock:
+            if self._index is None:
+                return {}
+            positions = {
+                content: position
+                for content in hashes
+                if (position := self._catalog.position_of(content)) is not None
+            }
+            if not positions:
+                return {}
+            vectors = self._vectors(np.fromiter(positions.values(), dtype="int64"))
+            return dict(zip(positions, vectors))
 
     def similarity_search(self, embedding: list[float], k: int) -> list[str]:
-        if self._index is None:
-            return []
-        query = self._normalize(np.array([embedding], dtype="float32"))
-        scores, indices = self._index.search(query, k)
-        results = []
-        for idx in indices[0]:
-            if 0 <= idx < len(self._docs):
-                results.append(self._docs[idx])
-        return results
+        return [hit.document for hit in self.search_many([embedding], k)[0]]
+
+    def search_many(
+        self,
+        embeddings: list[list[float]],
+        k: int,
+        where: MetadataFilter | None = None,
+    ) -> list[list[SearchHit]]:
+        if self._index is None or not embeddings:
+            return [[] for _ in embeddings]
+        queries = prepare_vectors(embeddings, self._config.dims)
+        with self._lock:
+            selector = None
+            # Pré-filtro (metadados e remoções): o FAISS só visita as linhas do bitmap.
+            mask = self._catalog.mask(where, self._index.ntotal)
+            if mask is not None:
+                k = min(k, int(mask.sum()))
+                if k == 0:
+                    return [[] for _ in embeddings]
+            if isinstance(self._index, MappedFlatIndex):
+                scores, indices = self._index.search(queries, k, mask)
+            else:
+                if mask is not None:
+                    bitmap = np.packbits(mask, bitorder="little")
+                    selector = faiss.IDSelectorBitmap(mask.shape[0], faiss.swig_ptr(bitmap))
+                params = search_parameters(self._config, self._index, selector)
+                scores, indices = self._index.search(queries, k, params=params)
+            return [
+                [
+                    self._hit(int(idx), float(score))
+                    for score, idx in zip(row_scores, row_indices)
+                    if 0 <= idx < len(self._docs)
+                ]
+                for row_scores, row_indices in zip(scores, indices)
+            ]
+
+    def lexical_search(
+        self, query: str, k: int, where: MetadataFilter | None = None
+    ) -> list[SearchHit]:
+        """Busca BM25; vazia enquanto o índice invertido é montado após a abertura."""
+        if not self._lexical_enabled:
+            raise RuntimeError("Índice léxico desativado neste vector store.")
+        with self._lock:
+            if self._lexical is None:
+                return []
+            mask = self._catalog.mask(where, len(self._docs))
+            positions, scores = self._lexical.search(query, k, mask)
+            return [self._hit(int(idx), float(score)) for idx, score in zip(positions, scores)]
+
+    def lexical_ready(self) -> bool:
+        with self._lock:
+            return self._lexical is not None
 
     def count(self) -> int:
-        return len(self._docs)
+        return self._catalog.live
+
+    def tombstones(self) -> int:
+        return self._catalog.deleted
 
-    @staticmethod
-    def _normalize(vectors: np.ndarray) -> np.ndarray:
-        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
-        norms[norms == 0] = 1.0
-        return vectors / norms
+    def vector_bytes(self) -> int:
+        """Memória dos vetores no índice, no formato de ``IndexConfig.storage``."""
+        with self._lock:
+            return code_bytes(self._index) if self._index is not None else 0
+
+    def compact(self) -> int:
+        """Reescreve o store sem as linhas removidas, reaproveitando os vetores gravados.
+
+        Buscas e escritas esperam a compactação terminar. Retorna as linhas descartadas.
+        """
+        if self._read_only:
+            raise RuntimeError("Vector store aberto em modo somente leitura.")
+        with self._lock:
+            removed = self._catalog.deleted
+            if removed == 0 or self._index is None:
+                return 0
+            live = self._catalog.live_positions()
+            if self._dir is None:
+                vectors = self._vectors(live)
+                self._docs = [self._docs[int(idx)] for idx in live]
+                self._rows = [self._rows[int(idx)] for idx in live]
+                self._catalog = RowCatalog()
+                self._catalog.extend(json.loads(row) for row in self._rows)
+                self._index = self._new_index(vectors, self._index.d)
+                self._build_lexical()
+            else:
+                self._rewrite(live)
+            self._logger.info(
+                "Compactação: %s linhas removidas, %s restantes", removed, live.shape[0]
+            )
+            return removed
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        if self._dir is None or self._index is None or self._read_only:
+            return
+        for table in (self._docs, self._rows):
+            if isinstance(table, DocTable):
+                table.sync()
+        if self._vector_log is not None:
+            self._vector_log.sync()
+        if self._tombstone_log is not None:
+            self._tombstone_log.sync()
+        self._pending = 0
+        if isinstance(self._index, MappedFlatIndex):
+            return
+        index_path = self._dir / self.INDEX_FILE
+        tmp_path = self._dir / f"{self.INDEX_FILE}.tmp"
+        faiss.write_index(self._index, str(tmp_path))
+        os.replace(tmp_path, index_path)
+        self._logger.info("Checkpoint do índice salvo: %s vetores", self._index.ntotal)
+
+    def close(self) -> None:
+        with self._lock:
+            self._lexical_generation += 1
+            self.save()
+            self._close_tables()
+
+    def _build_lexical(self) -> None:
+        """Monta o BM25 das linhas atuais numa thread, sem segurar o lock durante a tokenização.
+
+        A thread copia os textos em blocos sob o lock e tokeniza fora dele; linhas
+        gravadas no meio do caminho entram nos blocos seguintes. O índice só é
+        publicado quando alcança o fim da tabela.
+        """
+        self._lexical = None
+        self._lexical_generation += 1
+        if not self._lexical_enabled:
+            return
+        if len(self._docs) == 0:
+            self._lexical = BM25Index()
+            return
+        threading.Thread(
+            target=self._fill_lexical,
+            args=(self._lexical_generation,),
+            name="bm25-build",
+            daemon=True,
+        ).start()
+
+    def _fill_lexical(self, generation: int) -> None:
+        index = BM25Index()
+        started = time.perf_counter()
+        while True:
+            with self._lock:
+                if generation != self._lexical_generation:
+                    return
+                position = len(index)
+                end = min(len(self._docs), position + self._LEXICAL_CHUNK)
+                if position == end:
+                    self._lexical = index
+                    self._logger.info(
+                        "Índice BM25 montado: %s linhas em %.1fs",
+                        end,
+                        time.perf_counter() - started,
+                    )
+                    return
+                texts = [self._docs[idx] for idx in range(position, end)]
+            index.add(texts)
+
+    def _delete(self, ids: Iterable[str]) -> int:
+        positions = self._catalog.delete(ids)
+        if self._tombstone_log is not None:
+            self._tombstone_log.append(positions)
+        return len(positions)
+
+    def _row(self, idx: int) -> dict[str, Any]:
+        if idx < len(self._rows):
+            return json.loads(self._rows[idx])
+        return {"doc_id": str(idx), "metadata": {}, "hash": content_hash(self._docs[idx])}
+
+    def _hit(self, idx: int, score: float) -> SearchHit:
+        row = self._row(idx)
+        return SearchHit(
+            id=idx,
+            document=self._docs[idx],
+            score=score,
+            doc_id=row["doc_id"],
+            metadata=row["metadata"],
+        )
+
+    def _vectors(self, positions: np.ndarray) -> np.ndarray:
+        if self._vector_log is not None:
+            return self._vector_log.take(positions)
+        assert self._index is not None
+        if isinstance(self._index, faiss.IndexIVF):
+            self._index.make_direct_map()
+        return self._index.reconstruct_batch(positions)
+
+    def _maps_log(self, total: int) -> bool:
+        """Se o índice para ``total`` vetores é busca exata em float32, servida pelo log."""
+        if self._config.needs_training and total < self._config.train_threshold:
+            return True
+        return self._config.is_flat and self._config.storage == "float32"
+
+    def _empty_index(self, dim: int) -> faiss.Index | MappedFlatIndex:
+        if self._vector_log is not None and self._maps_log(0):
+            return MappedFlatIndex(self._vector_log, 0)
+        return initial_index(self._config, dim)
+
+    def _new_index(self, vectors: np.ndarray, dim: int) -> faiss.Index:
+        if vectors.shape[0] >= self._config.train_threshold:
+            index = build_index(self._config, vectors)
+        else:
+            index = initial_index(self._config, dim)
+        index.add(vectors)
+        return index
+
+    def _rewrite(self, live: np.ndarray) -> None:
+        """Grava o store compactado em ``.compact`` e troca os arquivos ao final.
+
+        O marcador ``ready.json`` só é escrito com tudo gravado; se o processo cair
+        durante a troca, ``_open`` a conclui.
+        """
+        assert self._dir is not None and self._index is not None
+        staging = self._dir / self.COMPACT_DIR
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir()
+        dim = self._index.d
+        docs = DocTable(staging)
+        rows = DocTable(staging, name=self.ROWS_TABLE)
+        vector_log = VectorLog(staging / self.VECTORS_FILE, dim=dim)
+        for start in range(0, live.shape[0], self._COMPACT_CHUNK):
+            part = live[start : start + self._COMPACT_CHUNK]
+            docs.extend(self._docs[int(idx)] for idx in part)
+            rows.extend(json.dumps(self._row(int(idx)), ensure_ascii=False) for idx in part)
+            vector_log.append(self._vectors(part))
+        if not self._maps_log(live.shape[0]):
+            index = self._new_index(vector_log.read(), dim)
+            faiss.write_index(index, str(staging / self.INDEX_FILE))
+        write_meta(staging / self.META_FILE, {"dim": dim, "metric": "ip"})
+        for table in (docs, rows):
+            table.sync()
+            table.close()
+        vector_log.sync()
+        write_meta(staging / self.COMPACT_READY, {"rows": int(live.shape[0])})
+        self._close_tables()
+        self._finish_compaction()
+        self._open()
+
+    def _finish_compaction(self) -> None:
+        assert self._dir is not None
+        staging = self._dir / self.COMPACT_DIR
+        if not (staging / self.COMPACT_READY).exists():
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        if not (staging / self.INDEX_FILE).exists():
+            (self._dir / self.INDEX_FILE).unlink(missing_ok=True)
+        for path in staging.iterdir():
+            if path.name != self.COMPACT_READY:
+                os.replace(path, self._dir / path.name)
+        (self._dir / self.TOMBSTONES_FILE).unlink(missing_ok=True)
+        shutil.rmtree(staging)
+
+    def _close_tables(self) -> None:
+        for table in (self._docs, self._rows):
+            if isinstance(table, DocTable):
+                table.close()
+
+    def _open(self) -> None:
+        assert self._dir is not None
+        if not self._read_only:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            self._finish_compaction()
+        meta = read_meta(self._dir / self.META_FILE)
+        if not meta:
+            self._build_lexical()
+            return
+        dim = int(meta["dim"])
+        self._docs = DocTable(self._dir, read_only=self._read_only)
+        self._vector_log = VectorLog(
+            self._dir / self.VECTORS_FILE, dim=dim, read_only=self._read_only
+        )
+        self._tombstone_log = TombstoneLog(
+            self._dir / self.TOMBSTONES_FILE, read_only=self._read_only
+        )
+        legacy = not (self._dir / f"{self.ROWS_TABLE}.offsets").exists()
+        self._rows = []
+        if not (legacy and self._read_only):
+            self._rows = DocTable(self._dir, read_only=self._read_only, name=self.ROWS_TABLE)
+        total = min(len(self._docs), len(self._vector_log))
+        if not legacy:
+            total = min(total, len(self._rows))
+        if not self._read_only:
+            self._docs.truncate(total)
+            self._vector_log.truncate(total)
+            self._rows.truncate(total)
+            if len(self._rows) < total:
+                # Stores anteriores aos metadados: cada linha vira um documento sem metadados.
+                self._rows.extend(
+                    json.dumps(self._row(idx)) for idx in range(len(self._rows), total)
+                )
+        self._catalog = RowCatalog()
+        self._catalog.extend(
+            {**row, "hash": row.get("hash") or content_hash(self._docs[idx])}
+            for idx, row in ((idx, self._row(idx)) for idx in range(total))
+        )
+        self._catalog.mark_deleted(int(position) for position in self._tombstone_log.read())
+        self._index = self._load_index(dim, total)
+        if self._index.ntotal > total:
+            self._logger.warning("Checkpoint à frente do log; reconstruindo índice.")
+            self._index = initial_index(self._config, dim)
+        if self._index.ntotal < total:
+            tail = self._vector_log.read(self._index.ntotal, total)
+            self._index.add(tail)
+            self._pending = tail.shape[0]
+        if not self._read_only:
+            self._maybe_migrate()
+        self._build_lexical()
+        self._logger.info(
+            "Vector store carregado de %s: %s documentos", self._dir, self._catalog.live
+        )
+
+    def _maybe_migrate(self) -> bool:
+        if not self._config.needs_training or self._index is None:
+            return False
+        if not isinstance(self._index, (faiss.IndexFlat, MappedFlatIndex)):
+            return False
+        if self._index.ntotal < self._config.train_threshold:
+            return False
+        vectors = self._all_vectors()
+        index = build_index(self._config, vectors)
+        index.add(vectors)
+        self._index = index
+        self._logger.info(
+            "Índice migrado para %s com %s vetores", self._config.index_type, index.ntotal
+        )
+        self.save()
+        return True
+
+    def _all_vectors(self) -> np.ndarray:
+        assert self._index is not None
+        if self._vector_log is not None:
+            return self._vector_log.read(0, self._index.ntotal)
+        return self._index.reconstruct_n(0, self._index.ntotal)
+
+    def _load_index(self, dim: int, total: int) -> faiss.Index | MappedFlatIndex:
+        """Lê o checkpoint; listas IVF só ficam mapeadas em stores somente leitura.
+
+        Com ``IO_FLAG_MMAP`` o FAISS abre as listas invertidas como somente
+        leitura, e nenhum ``add`` (replay do log, novos chunks) funcionaria.
+        Checkpoints ``IndexFlat`` de versões anteriores são ignorados: a busca
+        exata é servida pelo log e o índice em formato comprimido é remontado dele.
+        """
+        assert self._dir is not None and self._vector_log is not None
+        index_path = self._dir / self.INDEX_FILE
+        if index_path.exists() and is_flat_checkpoint(index_path):
+            if not self._read_only:
+                index_path.unlink()
+        elif index_path.exists():
+            return self._read_checkpoint(index_path, total)
+        if self._maps_log(total):
+            return MappedFlatIndex(self._vector_log, total)
+        return initial_index(self._config, dim)
+
+    def _read_checkpoint(self, index_path: Path, total: int) -> faiss.Index:
+        if self._read_only:
+            try:
+                index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP)
+            except RuntimeError as exc:
+                self._logger.warning("Leitura via mmap falhou (%s); carregando em memória.", exc)
+            else:
+                if index.ntotal == total or not isinstance(index, faiss.IndexIVF):
+                    return index
+        return faiss.read_index(str(index_path))
+
+    def _init_files(self, dim: int) -> None:
+        assert self._dir is not None
+        write_meta(self._dir / self.META_FILE, {"dim": dim, "metric": "ip"})
+        self._docs = DocTable(self._dir)
+        self._rows = DocTable(self._dir, name=self.ROWS_TABLE)
+        self._vector_log = VectorLog(self._dir / self.VECTORS_FILE, dim=dim)
+        self._tombstone_log = TombstoneLog(self._dir / self.TOMBSTONES_FILE)
 
 
 class InMemoryVectorStore:
-    def __init__(self) -> None:
+    """Busca exata numa matriz contígua, em ``float32``, ``float16`` ou ``sq8``.
+
+    Em ``sq8`` cada linha vira int8 com uma escala própria (``max|x| / 127``);
+    os scores são calculados em blocos para não materializar a matriz em float32.
+    """
+
+    _SCORE_BLOCK = 65_536
+    _DTYPES = {"float32": "float32", "float16": "float16", "sq8": "int8"}
+
+    def __init__(
+        self, initial_capacity: int = 1024, storage: str = "float32", dims: int | None = None
+    ) -> None:
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Formato de armazenamento inválido: {storage}")
         self._docs: list[str] = []
-        self._embeddings: list[list[float]] = []
+        self._rows: list[dict[str, Any]] = []
+        self._catalog = RowCatalog()
+        self._lexical = BM25Index()
+        self._matrix: np.ndarray | None = None
+        self._scales = np.zeros(0, dtype="float32")
+        self._storage = storage
+        self._dims = dims
+        self._initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        documents: list[str],
+        embeddings: list[list[float]],
+        metadata: list[dict[str, Any]] | None = None,
+        ids: list[str] | None = None,
+        replace: bool = False,
+    ) -> None:
+        if not documents:
+            return
+        vectors = prepare_vectors(embeddings, self._dims)
+        rows = _row_entries(documents, metadata, ids)
+        with self._lock:
+            if self._matrix is not None and vectors.shape[1] != self._matrix.shape[1]:
+                raise ValueError(
+                    f"Dimensão {vectors.shape[1]} difere da do store ({self._matrix.shape[1]})."
+                )
+            if replace:
+                self._catalog.delete({row["doc_id"] for row in rows})
+            self._reserve(len(self._docs) + len(documents), vectors.shape[1])
+            assert self._matrix is not None
+            start = len(self._docs)
+            end = start + len(documents)
+            if self._storage == "sq8":
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1.0
+                self._scales[start:end] = scales
+                vectors = np.rint(vectors / scales[:, None])
+            self._matrix[start:end] = vectors
+            self._docs.extend(documents)
+            self._rows.extend(rows)
+            self._catalog.extend(rows)
+            self._lexical.add(documents)
 
-    def add(self, documents: list[str], embeddings: list[list[float]]) -> None:
-        self._docs.extend(documents)
-        self._embeddings.extend(embeddings)
+    def delete(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            return len(self._catalog.delete(ids))
+
+    def fingerprints(self, ids: Iterable[str]) -> dict[str, Fingerprint]:
+        with self._lock:
+            return {
+                doc_id: [(self._rows[row]["hash"], self._rows[row]["metadata"]) for row in rows]
+                for doc_id, rows in self._catalog.rows_of(ids).items()
+            }
+
+    def vectors_for(self, hashes: Iterable[str]) -> dict[str, np.ndarray]:
+        with self._lock:
+            if self._matrix is None:
+                return {}
+            positions = {
+                content: position
+                for content in hashes
+                if (position := self._catalog.position_of(content)) is not None
+            }
+            if not positions:
+                return {}
+            vectors = self._decode(np.fromiter(positions.values(), dtype="int64"))
+            return dict(zip(positions, vectors))
 
     def similarity_search(self, embedding: list[float], k: int) -> list[str]:
-        scored = [
-            (self._cosine(embedding, emb), doc)
-            for emb, doc in zip(self._embeddings, self._docs)
-        ]
-        scored.sort(key=lambda item: item[0], reverse=True)
-        return [doc for _, doc in scored[:k]]
+        return [hit.document for hit in self.search_many([embedding], k)[0]]
+
+    def search_many(
+        self,
+        embeddings: list[list[float]],
+        k: int,
+        where: MetadataFilter | None = None,
+    ) -> list[list[SearchHit]]:
+        if not embeddings:
+            return []
+        with self._lock:
+            mask = self._catalog.mask(where, len(self._docs))
+            scores, indices = self._top_k(embeddings, k, mask)
+            return [
+                [self._hit(int(idx), float(score)) for score, idx in zip(row_scores, row_indices)]
+                for row_scores, row_indices in zip(scores, indices)
+            ]
+
+    def lexical_search(
+        self, query: str, k: int, where: MetadataFilter | None = None
+    ) -> list[SearchHit]:
+        with self._lock:
+            mask = self._catalog.mask(where, len(self._docs))
+            positions, scores = self._lexical.search(query, k, mask)
+            return [self._hit(int(idx), float(score)) for idx, score in zip(positions, scores)]
 
     def count(self) -> int:
-        return len(self._docs)
-
-    @staticmethod
-    def _cosine(a: Iterable[float], b: Iterable[float]) -> float:
-        a_list = list(a)
-        b_list = list(b)
-        dot = sum(x * y for x, y in zip(a_list, b_list))
-        norm_a = math.sqrt(sum(x * x for x in a_list)) or 1.0
-        norm_b = math.sqrt(sum(y * y for y in b_list)) or 1.0
-        return dot / (norm_a * norm_b)
+        return self._catalog.live
+
+    def tombstones(self) -> int:
+        return self._catalog.deleted
+
+    def vector_bytes(self) -> int:
+        with self._lock:
+            if self._matrix is None:
+                return 0
+            per_vector = self._matrix.shape[1] * self._matrix.itemsize
+            if self._storage == "sq8":
+                per_vector += self._scales.itemsize
+            return per_vector * len(self._docs)
+
+    def compact(self) -> int:
+        with self._lock:
+            removed = self._catalog.deleted
+            if removed == 0 or self._matrix is None:
+                return 0
+            live = self._catalog.live_positions()
+            self._matrix = self._matrix[live]
+            self._scales = self._scales[live] if self._storage == "sq8" else self._scales
+            self._docs = [self._docs[int(idx)] for idx in live]
+            self._rows = [self._rows[int(idx)] for idx in live]
+            self._catalog = RowCatalog()
+            self._catalog.extend(self._rows)
+            self._lexical = BM25Index()
+            self._lexical.add(self._docs)
+            return removed
+
+    def close(self) -> None:
+        return None
+
+    def _hit(self, idx: int, score: float) -> SearchHit:
+        return SearchHit(
+            id=idx,
+            document=self._docs[idx],
+            score=score,
+            doc_id=self._rows[idx]["doc_id"],
+            metadata=self._rows[idx]["metadata"],
+        )
+
+    def _top_k(
+        self,
+        embeddings: list[list[float]],
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        total = len(self._docs)
+        rows = np.flatnonzero(mask) if mask is not None else None
+        k = min(k, total if rows is None else rows.shape[0])
+        if self._matrix is None or k <= 0:
+            empty = np.zeros((len(embeddings), 0))
+            return empty.astype("float32"), empty.astype("int64")
+        queries = prepare_vectors(embeddings, self._dims)
+        if rows is not None:
+            scores, positions = self._rank(self._scores(queries, rows), k)
+            return scores, rows[positions]
+        return self._rank(self._scores(queries), k)
+
+    def _scores(self, queries: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        assert self._matrix is not None
+        total = len(self._docs) if rows is None else rows.shape[0]
+        if self._storage == "float32" and rows is None:
+            return queries @ self._matrix[:total].T
+        scores = np.empty((queries.shape[0], total), dtype="float32")
+        for start in range(0, total, self._SCORE_BLOCK):
+            end = min(start + self._SCORE_BLOCK, total)
+            part = slice(start, end) if rows is None else rows[start:end]
+            scores[:, start:end] = queries @ self._decode(part).T
+        return scores
+
+    def _decode(self, positions: np.ndarray | slice) -> np.ndarray:
+        assert self._matrix is not None
+        vectors = self._matrix[positions].astype("float32")
+        if self._storage == "sq8":
+            vectors *= self._scales[positions, None]
+        return vectors
+
+    def _rank(self, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        total = scores.shape[1]
+        if k < total:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(total), scores.shape)
+        top_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return (
+            np.take_along_axis(top_scores, order, axis=1),
+            np.take_along_axis(candidates, order, axis=1),
+        )
+
+    def _reserve(self, size: int, dim: int) -> None:
+        dtype = self._DTYPES[self._storage]
+        if self._matrix is None:
+            capacity = max(self._initial_capacity, size)
+            self._matrix = np.zeros((capacity, dim), dtype=dtype)
+        elif size > self._matrix.shape[0]:
+            capacity = max(size, self._matrix.shape[0] * 2)
+            matrix = np.zeros((capacity, dim), dtype=dtype)
+            matrix[: len(self._docs)] = self._matrix[: len(self._docs)]
+            self._matrix = matrix
+        if self._storage == "sq8" and self._scales.shape[0] < self._matrix.shape[0]:
+            scales = np.ones(self._matrix.shape[0], dtype="float32")
+            scales[: len(self._docs)] = self._scales[: len(self._docs)]
+            self._scales = scales
+
+
+def _row_entries(
+    documents: list[str],
+    metadata: list[dict[str, Any]] | None,
+    ids: list[str] | None,
+) -> list[dict[str, Any]]:
+    count = len(documents)
+    if metadata is not None and len(metadata) != count:
+        raise ValueError("metadata deve ter um item por documento.")
+    if ids is not None and len(ids) != count:
+        raise ValueError("ids deve ter um item por documento.")
+    return [
+        {
+            "doc_id": (ids[position] if ids is not None else None) or uuid.uuid4().hex,
+            "metadata": dict(metadata[position] or {}) if metadata is not None else {},
+            "hash": content_hash(documents[position]),
+        }
+        for position in range(count)
+    ]
@@ -1,18 +1,40 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 from app.agent.agent import Agent
+from app.agent.prompt_builder import PromptBuilder
+from app.agent.response_cache import ResponseCache
+from app.agent.router import RetrievalRouter
 from app.core.config import settings
-from app.core.llm import FakeLLMClient, OllamaChatClient, OpenAIChatClient
+from app.core.llm import (
+    AsyncFakeLLMClient,
+    AsyncLLMClient,
+    AsyncOllamaChatClient,
+    AsyncOpenAIChatClient,
+    FakeLLMClient,
+    LLMClient,
+    OllamaChatClient,
+    OpenAIChatClient,
+)
+from app.core.tokens import get_tokenizer
 from app.memory.long_term import SQLiteMemoryStore
+from app.memory.semantic import SemanticMemoryIndex
 from app.memory.service import MemoryService
-from app.memory.short_term import ShortTermMemory
+from app.memory.short_term import ShortTermBackend, ShortTermMemory, SQLiteShortTermMemory
+from app.memory.write_behind import WriteBehindQueue
+from app.rag.embedding_cache import CachedEmbeddingClient
+from app.rag.faiss_index import IndexConfig
 from app.rag.service import (
+    EmbeddingClient,
     FakeEmbeddingClient,
     OllamaEmbeddingClient,
     OpenAIEmbeddingClient,
     RagService,
 )
 from app.rag.vector_store import FaissVectorStore, InMemoryVectorStore
+from app.services.document_service import DocumentService
+from app.services.ingestion_jobs import IngestionJobQueue
 from app.tools.implementations import (
     ExternalApiMockTool,
     RetrieveMemoryTool,
@@ -22,38 +44,165 @@ from app.tools.implementations import (
 from app.tools.registry import ToolRegistry
 
 
+_embedding_client: EmbeddingClient | None = None
 _memory_service: MemoryService | None = None
 _rag_service: RagService | None = None
 _agent: Agent | None = None
+_tool_registry: ToolRegistry | None = None
+_ingestion_jobs: IngestionJobQueue | None = None
+_response_cache: ResponseCache | None = None
 
 
-def build_memory_service() -> MemoryService:
-    short_term = ShortTermMemory(max_messages=settings.short_term_max_messages)
+def build_short_term_memory() -> ShortTermBackend:
+    ttl = settings.short_term_ttl_seconds or None
+    if settings.short_term_backend == "sqlite":
+        return SQLiteShortTermMemory(
+            settings.short_term_db_url,
+            max_messages=settings.short_term_max_messages,
+            ttl_seconds=ttl,
+        )
+    return ShortTermMemory(
+        max_messages=settings.short_term_max_messages,
+        ttl_seconds=ttl,
+        max_bytes=settings.short_term_max_bytes or None,
+    )
+
+
+def build_memory_service(embedding_client: EmbeddingClient | None = None) -> MemoryService:
+    short_term = build_short_term_memory()
     long_term = SQLiteMemoryStore(settings.memory_db_url)
-    return MemoryService(short_term=short_term, long_term=long_term)
+    semantic = None
+    if settings.memory_semantic_enabled and embedding_client is not None:
+        semantic = SemanticMemoryIndex(
+            long_term,
+            embedding_client,
+            recency_weight=settings.memory_recency_weight,
+        )
+    write_behind = None
+    if settings.memory_write_behind:
+        write_behind = WriteBehindQueue(
+            long_term,
+            max_batch=settings.memory_write_batch_size,
+            flush_interval=settings.memory_write_flush_ms / 1000,
+            max_pending=settings.memory_write_max_pending,
+            put_timeout=settings.memory_write_put_timeout_ms / 1000,
+            overflow=settings.memory_write_overflow,
+            max_retries=settings.memory_write_max_retries,
+            on_written=semantic.index if semantic is not None else None,
+        )
+    return MemoryService(
+        short_term=short_term,
+        long_term=long_term,
+        write_behind=write_behind,
+        semantic=semantic,
+        recent_k=settings.memory_recent_k,
+    )
 
 
-def build_rag_service(use_fake: bool = False) -> RagService:
+def build_vector_store(persist_dir: str | None = None) -> FaissVectorStore:
+    return FaissVectorStore(
+        persist_dir=persist_dir or settings.rag_persist_dir,
+        read_only=settings.rag_read_only,
+        checkpoint_every=settings.rag_checkpoint_every,
+        index_config=IndexConfig(
+            index_type=settings.rag_index_type,
+            nlist=settings.rag_ivf_nlist,
+            pq_m=settings.rag_pq_m,
+            hnsw_m=settings.rag_hnsw_m,
+            nprobe=settings.rag_nprobe,
+            ef_search=settings.rag_ef_search,
+            train_threshold=settings.rag_train_threshold,
+            storage=settings.rag_storage,
+            dims=settings.rag_embedding_dims or None,
+        ),
+        lexical=settings.rag_retrieval == "hybrid",
+    )
+
+
+def build_embedding_client(use_fake: bool = False) -> EmbeddingClient:
+    embeddings: EmbeddingClient
     if use_fake:
-        store = InMemoryVectorStore()
-        embeddings = FakeEmbeddingClient()
-    elif settings.use_ollama:
-        store = FaissVectorStore()
+        return FakeEmbeddingClient()
+    if settings.use_ollama:
+        model = settings.ollama_embed_model
         embeddings = OllamaEmbeddingClient(
             host=settings.ollama_host,
-            model=settings.ollama_embed_model,
+            model=model,
+            batch_size=settings.ollama_embed_batch_size,
+            concurrency=settings.ollama_embed_concurrency,
+            max_retries=settings.ollama_embed_max_retries,
         )
     else:
-        store = FaissVectorStore()
-        embeddings = OpenAIEmbeddingClient(
-            api_key=settings.openai_api_key,
-            model=settings.openai_embedding_model,
+        model = settings.openai_embedding_model
+        embeddings = OpenAIEmbeddingClient(api_key=settings.openai_api_key, model=model)
+    if settings.embedding_cache_enabled:
+        embeddings = CachedEmbeddingClient(
+            embeddings,
+            model=model,
+            max_bytes=settings.embedding_cache_max_bytes,
+            db_path=settings.embedding_cache_path or None,
         )
-    return RagService(vector_store=store, embedding_client=embeddings)
+    return embeddings
+
+
+def build_rag_service(
+    use_fake: bool = False,
+    embedding_client: EmbeddingClient | None = None,
+) -> RagService:
+    embeddings = embedding_client or build_embedding_client(use_fake=use_fake)
+    if use_fake:
+
+        def memory_store() -> InMemoryVectorStore:
+            return InMemoryVectorStore(
+                storage=settings.rag_storage, dims=settings.rag_embedding_dims or None
+            )
+
+        return RagService(
+            vector_store=memory_store(),
+            embedding_client=embeddings,
+            store_factory=lambda name, create: memory_store() if create else None,
+            default_collection=settings.rag_collection,
+            retrieval=settings.rag_retrieval,
+            lexical_fast_path=settings.rag_lexical_fast_path,
+            rrf_k=settings.rag_rrf_k,
+            fusion_candidates=settings.rag_fusion_candidates,
+        )
+    return RagService(
+        vector_store=build_vector_store(_collection_dir(settings.rag_collection)),
+        embedding_client=embeddings,
+        store_factory=_open_collection,
+        default_collection=settings.rag_collection,
+        compaction_interval=(
+            None if settings.rag_read_only else settings.rag_compaction_interval_seconds
+        ),
+        compaction_ratio=settings.rag_compaction_ratio,
+        retrieval=settings.rag_retrieval,
+        lexical_fast_path=settings.rag_lexical_fast_path,
+        rrf_k=settings.rag_rrf_k,
+        fusion_candidates=settings.rag_fusion_candidates,
+    )
+
+
+def _collection_dir(name: str) -> str:
+    root = Path(settings.rag_persist_dir)
+    # Bases anteriores às coleções ficam na raiz e continuam servindo a coleção padrão.
+    if name == settings.rag_collection and (root / FaissVectorStore.META_FILE).exists():
+        return str(root)
+    return str(root / name)
+
+
+def _open_collection(name: str, create: bool) -> FaissVectorStore | None:
+    directory = _collection_dir(name)
+    if not create and not (Path(directory) / FaissVectorStore.META_FILE).exists():
+        return None
+    return build_vector_store(directory)
 
 
 def build_tool_registry(memory_service: MemoryService, rag_service: RagService) -> ToolRegistry:
-    registry = ToolRegistry()
+    registry = ToolRegistry(
+        max_workers=settings.tool_max_workers,
+        default_timeout=settings.tool_timeout_seconds,
+    )
     registry.register(VectorSearchTool(rag_service))
     registry.register(SaveMemoryTool(memory_service))
     registry.register(RetrieveMemoryTool(memory_service))
@@ -61,60 +210,162 @@ def build_tool_registry(memory_service: MemoryService, rag_service: RagService)
     return registry
 
 
+def _chat_model() -> str:
+    return settings.ollama_chat_model if settings.use_ollama else settings.openai_model
+
+
+def build_response_cache(embedding_client: EmbeddingClient | None = None) -> ResponseCache | None:
+    if not settings.response_cache_enabled:
+        return None
+    return ResponseCache(
+        model=_chat_model(),
+        embedding_client=embedding_client,
+        max_entries=settings.response_cache_max_entries,
+        ttl_seconds=settings.response_cache_ttl_seconds,
+        similarity_threshold=settings.response_cache_similarity,
+        bypass_users=[
+            user_id.strip()
+            for user_id in settings.response_cache_bypass_users.split(",")
+            if user_id.strip()
+        ],
+    )
+
+
+def build_prompt_builder() -> PromptBuilder:
+    return PromptBuilder(
+        max_tokens=settings.prompt_max_tokens,
+        history_share=settings.prompt_history_share,
+        memory_share=settings.prompt_memory_share,
+        rag_share=settings.prompt_rag_share,
+        summarize_history=settings.prompt_summarize_history,
+        summary_max_tokens=settings.prompt_summary_max_tokens,
+        tokenizer=get_tokenizer(_chat_model()),
+        layout=settings.prompt_layout,
+    )
+
+
 def build_agent(use_fake_llm: bool = False, use_fake_rag: bool = False) -> Agent:
-    memory_service = build_memory_service()
-    rag_service = build_rag_service(use_fake=use_fake_rag)
+    embedding_client = build_embedding_client(use_fake=use_fake_rag)
+    memory_service = build_memory_service(embedding_client)
+    rag_service = build_rag_service(use_fake=use_fake_rag, embedding_client=embedding_client)
     tool_registry = build_tool_registry(memory_service, rag_service)
-    llm = FakeLLMClient() if use_fake_llm else OpenAIChatClient(
-        api_key=settings.openai_api_key,
-        model=settings.openai_model,
-    )
+    llm: LLMClient
+    async_llm: AsyncLLMClient
+    if use_fake_llm:
+        llm, async_llm = FakeLLMClient(), AsyncFakeLLMClient()
+    else:
+        llm = OpenAIChatClient(api_key=settings.openai_api_key, model=settings.openai_model)
+        async_llm = AsyncOpenAIChatClient(
+            api_key=settings.openai_api_key, model=settings.openai_model
+        )
     return Agent(
         llm=llm,
         tool_registry=tool_registry,
         memory_service=memory_service,
         rag_service=rag_service,
         max_steps=settings.agent_max_steps,
+        async_llm=async_llm,
+        prompt_builder=build_prompt_builder(),
+        response_cache=build_response_cache(embedding_client),
+        rag_timeout=settings.context_rag_timeout_seconds,
+        memory_timeout=settings.context_memory_timeout_seconds,
+        router=RetrievalRouter(settings.rag_prefetch),
+        context_workers=settings.context_max_workers,
     )
 
 
+def get_embedding_client() -> EmbeddingClient:
+    global _embedding_client
+    if _embedding_client is None:
+        _embedding_client = build_embedding_client(use_fake=settings.use_fake_rag)
+    return _embedding_client
+
+
 def get_memory_service() -> MemoryService:
     global _memory_service
     if _memory_service is None:
-        _memory_service = build_memory_service()
+        _memory_service = build_memory_service(get_embedding_client())
     return _memory_service
 
 
 def get_rag_service() -> RagService:
     global _rag_service
     if _rag_service is None:
-        _rag_service = build_rag_service(use_fake=settings.use_fake_rag)
+        _rag_service = build_rag_service(
+            use_fake=settings.use_fake_rag,
+            embedding_client=get_embedding_client(),
+        )
     return _rag_service
 
 
 def get_agent() -> Agent:
     global _agent
     if _agent is None:
-        memory_service = get_memory_service()
-        rag_service = get_rag_service()
-        tool_registry = build_tool_registry(memory_service, rag_service)
-        if settings.use_fake_llm:
-            llm = FakeLLMClient()
-        elif settings.use_ollama:
-            llm = OllamaChatClient(
-                host=settings.ollama_host,
-                model=settings.ollama_chat_model,
-            )
-        else:
-            llm = OpenAIChatClient(
-                api_key=settings.openai_api_key,
-                model=settings.openai_model,
-            )
+        llm, async_llm = build_llm_clients()
         _agent = Agent(
             llm=llm,
-            tool_registry=tool_registry,
-            memory_service=memory_service,
-            rag_service=rag_service,
+            tool_registry=get_tool_registry(),
+            memory_service=get_memory_service(),
+            rag_service=get_rag_service(),
             max_steps=settings.agent_max_steps,
+            async_llm=async_llm,
+            prompt_builder=build_prompt_builder(),
+            response_cache=get_response_cache(),
+            rag_timeout=settings.context_rag_timeout_seconds,
+            memory_timeout=settings.context_memory_timeout_seconds,
+            router=RetrievalRouter(settings.rag_prefetch),
+            context_workers=settings.context_max_workers,
         )
     return _agent
+
+
+def get_tool_registry() -> ToolRegistry:
+    global _tool_registry
+    if _tool_registry is None:
+        _tool_registry = build_tool_registry(get_memory_service(), get_rag_service())
+    return _tool_registry
+
+
+def get_response_cache() -> ResponseCache | None:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = build_response_cache(get_embedding_client())
+    return _response_cache
+
+
+def build_llm_clients() -> tuple[LLMClient, AsyncLLMClient]:
+    if settings.use_fake_llm:
+        return FakeLLMClient(), AsyncFakeLLMClient()
+    if settings.use_ollama:
+        return (
+            OllamaChatClient(host=settings.ollama_host, model=settings.ollama_chat_model),
+            AsyncOllamaChatClient(host=settings.ollama_host, model=settings.ollama_chat_model),
+        )
+    return (
+        OpenAIChatClient(api_key=settings.openai_api_key, model=settings.openai_model),
+        AsyncOpenAIChatClient(api_key=settings.openai_api_key, model=settings.openai_model),
+    )
+
+
+def get_ingestion_jobs() -> IngestionJobQueue:
+    global _ingestion_jobs
+    if _ingestion_jobs is None:
+        _ingestion_jobs = IngestionJobQueue(
+            DocumentService(get_rag_service()),
+            workers=settings.ingest_workers,
+            max_pending=settings.ingest_queue_size,
+        )
+    return _ingestion_jobs
+
+
+def shutdown_services() -> None:
+    if _agent is not None:
+        _agent.close()
+    if _tool_registry is not None:
+        _tool_registry.shutdown()
+    if _ingestion_jobs is not None:
+        _ingestion_jobs.shutdown()
+    if _memory_service is not None:
+        _memory_service.close()
+    if _rag_service is not None:
+        _rag_service.close()
@@ -1,11 +1,56 @@
 from __future__ import annotations
 
+from typing import Iterable
+
+from app.core.config import settings
+from app.rag.chunking import TextChunker
+from app.rag.ingestion import Document, IngestionPipeline, IngestionProgress, ProgressCallback
 from app.rag.service import RagService
 
 
 class DocumentService:
-    def __init__(self, rag_service: RagService) -> None:
+    def __init__(self, rag_service: RagService, pipeline: IngestionPipeline | None = None) -> None:
         self._rag = rag_service
+        self._pipeline = pipeline or IngestionPipeline(
+            rag_service,
+            chunker=TextChunker(
+                chunk_size=settings.rag_chunk_size,
+                chunk_overlap=settings.rag_chunk_overlap,
+            ),
+            batch_size=settings.rag_ingest_batch_size,
+        )
+
+    def add_documents(
+        self,
+        documents: Iterable[str | Document],
+        on_progress: ProgressCallback | None = None,
+        progress: IngestionProgress | None = None,
+        collection: str | None = None,
+        replace: bool = False,
+    ) -> IngestionProgress:
+        return self._pipeline.ingest(
+            documents,
+            on_progress=on_progress,
+            progress=progress,
+            collection=collection,
+            replace=replace,
+        )
+
+    def delete_documents(self, ids: list[str], collection: str | None = None) -> int:
+        return self._rag.delete_documents(ids, collection=collection)
 
-    def add_documents(self, documents: list[str]) -> None:
-        self._rag.add_documents(documents)
+    def add_stream(
+        self,
+        pieces: Iterable[str],
+        on_progress: ProgressCallback | None = None,
+        progress: IngestionProgress | None = None,
+        collection: str | None = None,
+        document: Document | None = None,
+    ) -> IngestionProgress:
+        return self._pipeline.ingest_stream(
+            pieces,
+            on_progress=on_progress,
+            progress=progress,
+            collection=collection,
+            document=document,
+        )
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from app.core.logging import get_logger
+from app.rag.ingestion import Document, IngestionProgress, iter_ndjson
+from app.services.document_service import DocumentService
+
+_FILE_READ_SIZE = 64 * 1024
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+@dataclass
+class IngestionJob:
+    id: str
+    documents: list[str | Document]
+    # Arquivos temporários (caminho, documento) ingeridos em streaming e apagados ao final.
+    files: list[tuple[str, Document]] = field(default_factory=list)
+    # Corpo NDJSON temporário, validado linha a linha pelo worker e apagado ao final.
+    ndjson: str | None = None
+    collection: str | None = None
+    replace: bool = False
+    submitted: int = 0
+    status: str = "queued"
+    progress: IngestionProgress = field(default_factory=IngestionProgress)
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def throughput(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.progress.chunks / elapsed if elapsed > 0 else 0.0
+
+
+class IngestionJobQueue:
+    """Fila limitada de ingestão processada por threads dedicadas."""
+
+    def __init__(
+        self,
+        document_service: DocumentService,
+        workers: int = 1,
+        max_pending: int = 32,
+        max_retained: int = 1000,
+    ) -> None:
+        self._service = document_service
+        self._queue: queue.Queue[IngestionJob | None] = queue.Queue(maxsize=max_pending)
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._max_retained = max_retained
+        self._lock = threading.Lock()
+        self._logger = get_logger(self.__class__.__name__)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"ingestion-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        documents: list[str | Document],
+        collection: str | None = None,
+        replace: bool = False,
+    ) -> IngestionJob:
+        documents = list(documents)
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            documents=documents,
+            collection=collection,
+            replace=replace,
+            submitted=len(documents),
+        )
+        return self._enqueue(job)
+
+    def submit_files(
+        self,
+        files: list[tuple[str, Document]],
+        collection: str | None = None,
+    ) -> IngestionJob:
+        """Enfileira arquivos de texto já gravados em disco; o job passa a ser dono deles.
+
+        Cada arquivo é lido em pedaços pelo worker e apagado ao final do job, ou
+        imediatamente se a fila estiver cheia.
+        """
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            documents=[],
+            files=list(files),
+            collection=collection,
+            submitted=len(files),
+        )
+        try:
+            return self._enqueue(job)
+        except IngestionQueueFull:
+            _remove_files([path for path, _ in job.files])
+            raise
+
+    def submit_ndjson(self, path: str, collection: str | None = None) -> IngestionJob:
+        """Enfileira um arquivo NDJSON já gravado em disco; o job passa a ser dono dele.
+
+        As linhas são lidas e validadas pelo worker; uma linha malformada marca o job
+        como ``failed``, mantendo o que foi ingerido até ela. ``submitted`` cresce
+        conforme os documentos são lidos.
+        """
+        job = IngestionJob(id=uuid.uuid4().hex, documents=[], ndjson=path, collection=collection)
+        try:
+            return self._enqueue(job)
+        except IngestionQueueFull:
+            _remove_files([path])
+            raise
+
+    def _enqueue(self, job: IngestionJob) -> IngestionJob:
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full as exc:
+            raise IngestionQueueFull("Fila de ingestão cheia.") from exc
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._max_retained:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def join(self) -> None:
+        self._queue.join()
+
+    def shutdown(self, wait: bool = True) -> None:
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job: IngestionJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            if job.documents:
+                self._service.add_documents(
+                    job.documents,
+                    progress=job.progress,
+                    collection=job.collection,
+                    replace=job.replace,
+                )
+            if job.ndjson is not None:
+                with open(job.ndjson, encoding="utf-8") as lines:
+                    self._service.add_documents(
+                        _counted(job, iter_ndjson(lines)),
+                        progress=job.progress,
+                        collection=job.collection,
+                    )
+            for path, document in job.files:
+                with open(path, encoding="utf-8", errors="replace") as text:
+                    self._service.add_stream(
+                        iter(lambda: text.read(_FILE_READ_SIZE), ""),
+                        progress=job.progress,
+                        collection=job.collection,
+                        document=document,
+                    )
+        except Exception as exc:
+            self._logger.exception("Falha no job de ingestão %s", job.id)
+            job.status = "failed"
+            job.error = str(exc)
+        else:
+            job.status = "completed"
+        finally:
+            job.finished_at = time.time()
+            job.documents = []
+            _remove_files([path for path, _ in job.files])
+            _remove_files([job.ndjson] if job.ndjson is not None else [])
+            job.files, job.ndjson = [], None
+
+
+def _counted(job: IngestionJob, documents: Iterator[Document]) -> Iterator[Document]:
+    for document in documents:
+        job.submitted += 1
+        yield document
+
+
+def _remove_files(paths: list[str]) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
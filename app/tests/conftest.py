@@ -3,7 +3,7 @@ from __future__ import annotations
 import pytest
 
 from app.agent.agent import Agent
-from app.core.llm import FakeLLMClient
+from app.core.llm import AsyncFakeLLMClient, FakeLLMClient
 from app.memory.long_term import SQLiteMemoryStore
 from app.memory.service import MemoryService
 from app.memory.short_term import ShortTermMemory
@@ -51,4 +51,5 @@ def agent(memory_service: MemoryService, rag_service: RagService, tool_registry:
         memory_service=memory_service,
         rag_service=rag_service,
         max_steps=3,
+        async_llm=AsyncFakeLLMClient(),
     )
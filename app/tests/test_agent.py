@@ -1,7 +1,288 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.agent.agent import Agent
+from app.agent.prompt_builder import PromptBuilder
+from app.agent.response_cache import ResponseCache
+from app.agent.router import RetrievalRouter
+from app.core import tokens
+from app.core.config import Settings
+from app.core.llm import FakeLLMClient, LLMResponse
+from app.memory.long_term import SQLiteMemoryStore
+from app.memory.semantic import SemanticMemoryIndex
+from app.memory.service import MemoryService
+from app.memory.short_term import ShortTermMemory
+from app.rag.service import FakeEmbeddingClient, RagService
+from app.rag.vector_store import InMemoryVectorStore
+
 
 def test_agent_initialization(agent) -> None:
     result = agent.chat(user_id="u1", message="Oi agente")
     assert result.reply
     assert result.steps >= 1
+
+
+def test_agent_async_chat_runs_tools(agent, memory_service) -> None:
+    memory_service.add_long_term("u2", "memoria assincrona")
+    message = 'USE_TOOL:retrieve_memory {"user_id":"u2","limit":1}'
+
+    result = asyncio.run(agent.achat(user_id="u2", message=message))
+
+    assert "Tool executada" in result.reply
+    assert result.steps == 2
+
+
+def test_agent_stream_emits_tokens_and_persists(agent, memory_service) -> None:
+    async def collect() -> list[dict]:
+        return [event async for event in agent.astream(user_id="u3", message="Oi agente")]
+
+    events = asyncio.run(collect())
+
+    tokens = "".join(event["content"] for event in events if event["type"] == "token")
+    assert events[0] == {"type": "step", "step": 1}
+    assert events[-1]["type"] == "done" and events[-1]["reply"] == tokens
+    assert len([event for event in events if event["type"] == "token"]) > 1
+    assert tokens in memory_service.get_long_term("u3", limit=1)
+
+
+def test_prompt_builder_fits_budget_and_summarizes_old_turns() -> None:
+    builder = PromptBuilder(max_tokens=700, summary_max_tokens=80, layout="classic")
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turno {i} " + "palavra " * 40}
+        for i in range(10)
+    ]
+    documents = ["documento " * 400, "curto"]
+
+    prompt = builder.build("u1", "pergunta atual", history, ["prefere respostas curtas"], documents)
+    usage = prompt.usage
+
+    assert usage.total <= 700
+    assert usage.dropped_turns > 0 and usage.summary > 0
+    assert prompt.messages[-1] == {"role": "user", "content": "pergunta atual"}
+    assert prompt.messages[-2] == history[-1]
+    assert prompt.messages[4]["content"].startswith("Resumo da conversa anterior:")
+    assert len(prompt.messages[3]["content"]) < len(documents[0])
+    again = builder.build("u1", "pergunta atual", history, [], documents)
+    assert again.messages[4] == prompt.messages[4]
+
+
+def test_agent_reports_prompt_tokens(agent) -> None:
+    result = agent.chat(user_id="u4", message="Oi agente")
+
+    assert result.prompt_tokens is not None
+    assert result.prompt_tokens["total"] >= result.prompt_tokens["message"] > 0
+
+
+def test_default_layout_keeps_context_before_history() -> None:
+    history = [
+        {"role": "user", "content": "primeira"},
+        {"role": "assistant", "content": "resposta"},
+    ]
+
+    prompt = PromptBuilder().build("u1", "segunda", history, ["memória a"], ["doc a"])
+
+    assert Settings.model_fields["prompt_layout"].default == "classic"
+    assert prompt.messages[-3:-1] == history
+    assert prompt.messages[-1] == {"role": "user", "content": "segunda"}
+    assert prompt.messages[-4]["content"].startswith("Contexto de memória longa:")
+
+
+def test_cache_friendly_layout_keeps_a_stable_prefix() -> None:
+    builder = PromptBuilder(layout="cache_friendly")
+    first = builder.build("u1", "primeira", [], ["memória a"], ["doc a"])
+    history = [
+        {"role": "user", "content": "primeira"},
+        {"role": "assistant", "content": "resposta"},
+    ]
+    second = builder.build("u1", "segunda", history, ["memória b"], ["doc b"])
+
+    prefix = first.messages[:-1]
+    assert second.messages[: len(prefix)] == prefix
+    assert second.messages[-1]["content"].startswith("Contexto de memória longa:")
+    assert "doc b" in second.messages[-1]["content"]
+
+
+class UsageLLMClient:
+    def chat(self, messages, tools) -> LLMResponse:
+        usage = {"prompt_tokens": 1000, "completion_tokens": 10, "cached_tokens": 768}
+        return LLMResponse(content="ok", tool_calls=[], usage=usage)
+
+
+def test_agent_reports_cached_tokens(memory_service, rag_service, tool_registry) -> None:
+    agent = Agent(UsageLLMClient(), tool_registry, memory_service, rag_service)
+
+    result = agent.chat(user_id="u5", message="Oi")
+
+    assert result.llm_usage == {
+        "prompt_tokens": 1000,
+        "completion_tokens": 10,
+        "cached_tokens": 768,
+    }
+    assert agent.usage_stats()["cached_ratio"] == 0.768
+    assert tool_registry.as_openai_tools() is tool_registry.as_openai_tools()
+
+
+class CountingLLMClient:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def chat(self, messages, tools) -> LLMResponse:
+        self.calls += 1
+        return LLMResponse(content=f"resposta {self.calls}", tool_calls=[])
+
+
+class TopicEmbeddingClient:
+    def embed(self, texts):
+        lowered = [text.lower() for text in texts]
+        return [[float("horário" in text), float("preço" in text), 0.1] for text in lowered]
+
+
+def test_response_cache_exact_semantic_bypass_and_invalidation(
+    memory_service, rag_service, tool_registry
+) -> None:
+    llm = CountingLLMClient()
+    cache = ResponseCache("fake", TopicEmbeddingClient(), bypass_users=["vip"])
+    agent = Agent(llm, tool_registry, memory_service, rag_service, response_cache=cache)
+
+    assert agent.chat("u1", "Qual o horário?").cached is False
+    exact = agent.chat("u2", "  qual o HORÁRIO ")
+    semantic = agent.chat("u3", "me diz o horário de funcionamento")
+    assert exact.cached and semantic.cached and exact.reply == semantic.reply == "resposta 1"
+    assert agent.chat("vip", "Qual o horário?").reply == "resposta 2"
+    assert memory_service.get_short_term("u2")[-1] == {"role": "assistant", "content": "resposta 1"}
+
+    rag_service.add_documents(["novo documento"])
+    assert agent.chat("u1", "Qual o horário?").cached is False
+    assert llm.calls == 3
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["bypassed"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+
+def test_response_cache_is_not_shared_across_user_context(
+    memory_service, rag_service, tool_registry
+) -> None:
+    llm = CountingLLMClient()
+    cache = ResponseCache("fake", TopicEmbeddingClient())
+    agent = Agent(llm, tool_registry, memory_service, rag_service, response_cache=cache)
+    memory_service.add_long_term("ana", "meu nome é Ana")
+
+    assert agent.chat("ana", "qual é o meu nome?").reply == "resposta 1"
+    assert agent.chat("bruno", "qual é o meu nome?").cached is False
+    # Sem histórico nem memórias, o contexto é igual e a resposta pode ser reaproveitada.
+    assert agent.chat("carla", "qual é o meu nome?").cached is True
+
+    agent.chat("davi", "qual o horário?")
+    agent.chat("eva", "qual o preço?")
+    assert agent.chat("davi", "e o segundo?").cached is False
+    assert agent.chat("eva", "e o segundo?").cached is False
+    assert llm.calls == 6
+
+class SlowEmbeddingClient(FakeEmbeddingClient):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def embed(self, texts):
+        time.sleep(self.delay)
+        return super().embed(texts)
+
+
+class SlowShortTermMemory(ShortTermMemory):
+    def get(self, user_id: str) -> list[dict[str, str]]:
+        time.sleep(0.2)
+        return super().get(user_id)
+
+
+def test_context_sources_overlap_and_time_out(tmp_path, tool_registry) -> None:
+    embeddings = SlowEmbeddingClient(delay=0.0)
+    rag_service = RagService(InMemoryVectorStore(), embeddings)
+    rag_service.add_documents(["horário de funcionamento: 9h às 18h"])
+    memory_service = MemoryService(
+        SlowShortTermMemory(), SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    )
+    agent = Agent(FakeLLMClient(), tool_registry, memory_service, rag_service)
+
+    embeddings.delay = 0.2
+    timings = agent.chat("u1", "qual o horário?").timings_ms
+    assert timings["rag"] >= 190 and timings["history"] >= 190
+    assert timings["context"] < timings["rag"] + timings["history"] - 100
+    assert {"llm", "total"} <= timings.keys()
+
+    embeddings.delay = 0.5
+    impatient = Agent(FakeLLMClient(), tool_registry, memory_service, rag_service, rag_timeout=0.3)
+    result = impatient.chat("u1", "qual o horário?")
+    assert result.reply and result.timings_ms["rag"] == 300.0
+
+
+def test_context_timeouts_exclude_time_queued_for_a_worker(tmp_path, tool_registry) -> None:
+    rag_service = RagService(InMemoryVectorStore(), FakeEmbeddingClient())
+    memory_service = MemoryService(
+        SlowShortTermMemory(), SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    )
+    agent = Agent(
+        FakeLLMClient(),
+        tool_registry,
+        memory_service,
+        rag_service,
+        memory_timeout=0.5,
+        context_workers=1,
+    )
+
+    # Três turnos disputam um único worker: o último histórico só começa após ~0.4s.
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda user: agent.chat(user, "qual o horário?"), "abc"))
+    agent.close()
+
+    assert all(190 <= result.timings_ms["history"] < 500 for result in results)
+
+
+class RecordingEmbeddingClient(FakeEmbeddingClient):
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+
+    def embed(self, texts):
+        texts = list(texts)
+        self.texts.extend(texts)
+        return super().embed(texts)
+
+
+def test_router_skips_small_talk_and_turn_memo_dedupes_embeddings(
+    tmp_path, tool_registry
+) -> None:
+    assert not RetrievalRouter().should_prefetch("Oi, tudo bem?")
+    assert RetrievalRouter().should_prefetch("Qual o horário de funcionamento?")
+    assert not RetrievalRouter("never").should_prefetch("Qual o horário?")
+
+    embeddings = RecordingEmbeddingClient()
+    rag_service = RagService(InMemoryVectorStore(), embeddings)
+    rag_service.add_documents(["horário de funcionamento: 9h às 18h"])
+    store = SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    semantic = SemanticMemoryIndex(store, embeddings)
+    memory_service = MemoryService(ShortTermMemory(), store, semantic=semantic)
+    agent = Agent(FakeLLMClient(), tool_registry, memory_service, rag_service)
+    before = agent.retrieval_stats()
+    embeddings.texts.clear()
+
+    agent.chat("u1", "Olá!")
+    agent.chat("u1", "Qual o horário de funcionamento?")
+
+    assert embeddings.texts.count("Qual o horário de funcionamento?") == 1
+    after = agent.retrieval_stats()
+    assert after["skipped"] - before["skipped"] == 1
+    assert after["memo_hits"] - before["memo_hits"] >= 2
+
+
+def test_tokenizer_fallback_warns_once(monkeypatch, caplog) -> None:
+    monkeypatch.setattr(tokens, "tiktoken", None)
+    monkeypatch.setattr(tokens, "_fallback_warned", False)
+
+    with caplog.at_level("WARNING"):
+        first = tokens.Tokenizer("gpt-4o-mini")
+        tokens.Tokenizer("outro-modelo")
+
+    assert first.count("um, dois") == 3
+    assert [record.levelname for record in caplog.records] == ["WARNING"]
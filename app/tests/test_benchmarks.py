@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import json
+
+from app.benchmarks.rag_suite import DEFAULT_THRESHOLDS, check_thresholds, run_suite
+
+
+def test_rag_suite_reports_metrics_and_flags_regressions() -> None:
+    results = run_suite(["memory", "faiss"], [200], [16], num_queries=5, batch_size=64)
+
+    assert [row["case"] for row in results] == ["memory/200/16", "faiss/200/16"]
+    assert all(row["bytes_per_dim"] == 4.0 for row in results)
+    assert all(row["search_p99_ms"] >= row["search_p50_ms"] > 0 for row in results)
+    assert check_thresholds(results, json.loads(DEFAULT_THRESHOLDS.read_text())) == []
+
+    rules = [{"store": "faiss", "max_search_p99_ms": 0.0}, {"n": 999, "min_add_docs_per_s": 1e12}]
+    assert [violation.split(":")[0] for violation in check_thresholds(results, rules)] == [
+        "faiss/200/16"
+    ]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from app.rag.embedding_cache import CachedEmbeddingClient
+from app.rag.service import FakeEmbeddingClient
+
+
+class RecordingEmbeddingClient(FakeEmbeddingClient):
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def embed(self, texts: Iterable[str]) -> list[list[float]]:
+        batch = list(texts)
+        self.batches.append(batch)
+        return super().embed(batch)
+
+
+def test_cache_forwards_only_misses_in_one_batch(tmp_path) -> None:
+    inner = RecordingEmbeddingClient()
+    db_path = str(tmp_path / "embeddings.db")
+    cache = CachedEmbeddingClient(inner, model="fake", db_path=db_path)
+
+    first = cache.embed(["a", "b"])
+    second = cache.embed(["b", "c", "a", "c"])
+
+    assert inner.batches == [["a", "b"], ["c"]]
+    assert second[0] == first[1] and second[2] == first[0]
+    assert cache.stats()["memory_hits"] == 2
+
+    restarted = CachedEmbeddingClient(RecordingEmbeddingClient(), model="fake", db_path=db_path)
+    restarted.embed(["a", "b", "c"])
+    assert restarted.stats()["disk_hits"] == 3
+    assert restarted.stats()["misses"] == 0
+
+
+class ClosableEmbeddingClient(FakeEmbeddingClient):
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_cache_close_closes_the_wrapped_client(tmp_path) -> None:
+    inner = ClosableEmbeddingClient()
+    cache = CachedEmbeddingClient(inner, model="fake", db_path=str(tmp_path / "embeddings.db"))
+
+    cache.close()
+    CachedEmbeddingClient(FakeEmbeddingClient(), model="fake").close()
+
+    assert inner.closed
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import documents as documents_api
+from app.rag.chunking import TextChunker
+from app.rag.ingestion import Document, IngestionPipeline, iter_ndjson, parse_ndjson_line
+from app.services.document_service import DocumentService
+from app.services.ingestion_jobs import IngestionJobQueue
+
+
+def test_chunker_overlap_and_streaming_match() -> None:
+    text = " ".join(f"palavra{i}" for i in range(25))
+    chunker = TextChunker(chunk_size=10, chunk_overlap=3)
+
+    chunks = chunker.chunk(text)
+    streamed = list(chunker.chunk_stream(text[i : i + 7] for i in range(0, len(text), 7)))
+
+    assert chunks[0] == " ".join(f"palavra{i}" for i in range(10))
+    assert chunks[1].startswith("palavra7 ")
+    assert chunks[-1].endswith("palavra24")
+    assert streamed == chunks
+
+
+def test_pipeline_adds_chunks_in_batches(rag_service) -> None:
+    pipeline = IngestionPipeline(rag_service, TextChunker(chunk_size=4, chunk_overlap=1), batch_size=2)
+    updates: list[int] = []
+
+    progress = pipeline.ingest(
+        ["um dois tres quatro cinco seis sete", "curto"],
+        on_progress=lambda item: updates.append(item.chunks),
+    )
+
+    assert progress.documents == 2
+    assert progress.chunks == rag_service.stats()["documents"] == 3
+    assert updates == [2, 3]
+
+
+def test_pipeline_chunks_inherit_document_id_and_metadata(rag_service) -> None:
+    pipeline = IngestionPipeline(rag_service, TextChunker(chunk_size=4, chunk_overlap=1))
+    document = Document(
+        text="um dois tres quatro cinco seis sete", metadata={"source": "faq"}, id="faq-1"
+    )
+
+    pipeline.ingest([document, "sem metadados"])
+
+    hits = rag_service.search_many(["um dois"], k=5, where={"source": "faq"})[0]
+    assert len(hits) == 2
+    assert {hit.doc_id for hit in hits} == {"faq-1"}
+
+
+def test_pipeline_upsert_keeps_each_document_in_one_batch(rag_service) -> None:
+    chunker = TextChunker(chunk_size=4, chunk_overlap=1)
+    pipeline = IngestionPipeline(rag_service, chunker, batch_size=2)
+    text = "um dois tres quatro cinco seis sete oito nove"
+
+    first = pipeline.ingest([Document(text=text, id="doc")], replace=True)
+    again = pipeline.ingest([Document(text=text, id="doc")], replace=True)
+
+    assert first.chunks == 3 and first.batches == 1
+    assert again.unchanged == 1
+    assert rag_service.stats()["documents"] == 3
+
+
+def test_ingestion_job_queue_runs_in_background(rag_service) -> None:
+    pipeline = IngestionPipeline(rag_service, TextChunker(chunk_size=8, chunk_overlap=2))
+    jobs = IngestionJobQueue(DocumentService(rag_service, pipeline), workers=1, max_pending=4)
+
+    job = jobs.submit(["Documento sobre IA", "Documento sobre finanças"])
+    jobs.join()
+
+    status = jobs.get(job.id)
+    assert status is not None and status.status == "completed"
+    assert status.submitted == 2 and status.progress.chunks == 2
+    assert rag_service.search("IA", k=1)
+    jobs.shutdown()
+
+
+def test_ingestion_job_queue_streams_files_and_removes_them(rag_service, tmp_path) -> None:
+    pipeline = IngestionPipeline(rag_service, TextChunker(chunk_size=8, chunk_overlap=2))
+    jobs = IngestionJobQueue(DocumentService(rag_service, pipeline), workers=1, max_pending=4)
+    upload = tmp_path / "upload.txt"
+    upload.write_text("Arquivo enviado sobre investimentos", encoding="utf-8")
+
+    job = jobs.submit_files([(str(upload), Document(text="", metadata={"source": "a.txt"}))])
+    jobs.join()
+
+    status = jobs.get(job.id)
+    assert status is not None and status.status == "completed"
+    assert status.submitted == 1 and status.progress.documents == 1
+    assert not upload.exists()
+    assert rag_service.search_many(["investimentos"], k=1, where={"source": "a.txt"})[0]
+    jobs.shutdown()
+
+
+def test_parse_ndjson_line_accepts_strings_and_objects() -> None:
+    assert parse_ndjson_line("  ", 1) is None
+    assert parse_ndjson_line('""', 2) is None
+    assert parse_ndjson_line('"texto"', 3) == Document(text="texto")
+    line = '{"text": "corpo", "id": 7, "metadata": {"source": "faq"}}'
+    assert parse_ndjson_line(line, 4) == Document(
+        text="corpo", metadata={"source": "faq"}, id="7"
+    )
+    for bad in ("{quebrado", "[1, 2]", '{"text": "x", "metadata": "y"}', '{"text": "x", "id": []}'):
+        with pytest.raises(ValueError, match="Linha NDJSON inválida: 5"):
+            parse_ndjson_line(bad, 5)
+
+
+def test_iter_ndjson_is_lazy_and_stops_at_the_first_bad_line() -> None:
+    documents = iter_ndjson(['"um"', "", "{quebrado", '"dois"'])
+
+    assert next(documents).text == "um"
+    with pytest.raises(ValueError, match="Linha NDJSON inválida: 3"):
+        next(documents)
+
+
+def test_ndjson_route_ingests_in_a_job_and_fails_on_bad_lines(rag_service, monkeypatch) -> None:
+    pipeline = IngestionPipeline(rag_service, TextChunker(chunk_size=8, chunk_overlap=2))
+    jobs = IngestionJobQueue(DocumentService(rag_service, pipeline), workers=1, max_pending=4)
+    monkeypatch.setattr(documents_api, "get_ingestion_jobs", lambda: jobs)
+    app = FastAPI()
+    app.include_router(documents_api.router)
+    client = TestClient(app)
+
+    accepted = client.post(
+        "/documents/ndjson",
+        content=b'{"text": "documento sobre IA", "id": "ia"}\n\n"documento sobre vinhos"\n',
+    )
+    rejected = client.post("/documents/ndjson", content=b'"valido"\n{quebrado\n')
+    jobs.join()
+
+    assert accepted.status_code == rejected.status_code == 202
+    done = jobs.get(accepted.json()["job_id"])
+    assert done is not None and done.status == "completed"
+    assert done.submitted == 2 and done.progress.documents == 2
+    failed = jobs.get(rejected.json()["job_id"])
+    assert failed is not None and failed.status == "failed"
+    assert failed.error == "Linha NDJSON inválida: 2"
+    assert not list(Path(tempfile.gettempdir()).glob("ndjson-*"))
+    jobs.shutdown()
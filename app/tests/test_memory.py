@@ -1,6 +1,23 @@
 from __future__ import annotations
 
+import sqlite3
+import threading
+from typing import Iterable
+
+import pytest
+
 from app.memory.long_term import SQLiteMemoryStore
+from app.memory.semantic import SemanticMemoryIndex
+from app.memory.service import MemoryService
+from app.memory.short_term import ShortTermMemory, SQLiteShortTermMemory
+from app.memory.write_behind import WriteBehindQueue, WriteQueueFull
+
+KEYWORDS = ("python", "recife", "gato", "chuv")
+
+
+class KeywordEmbeddingClient:
+    def embed(self, texts: Iterable[str]) -> list[list[float]]:
+        return [[float(word in text) for word in KEYWORDS] + [0.1] for text in texts]
 
 
 def test_memory_persistence(tmp_path) -> None:
@@ -9,3 +26,159 @@ def test_memory_persistence(tmp_path) -> None:
     store.add("u1", "lembrar disso")
     memories = store.get("u1", limit=1)
     assert memories == ["lembrar disso"]
+
+
+def test_memory_add_many_is_ordered_and_indexed(tmp_path) -> None:
+    store = SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    store.add_many([("u1", "pergunta"), ("u2", "outra"), ("u1", "resposta")])
+
+    assert store.get("u1", limit=5) == ["resposta", "pergunta"]
+    conn = sqlite3.connect(tmp_path / "memory.db")
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT content FROM memories WHERE user_id = ? ORDER BY id DESC LIMIT 5",
+        ("u1",),
+    ).fetchall()
+    assert "idx_memories_user_id_id" in str(plan)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    store.close()
+
+
+def test_write_behind_reads_pending_and_flushes(tmp_path) -> None:
+    store = SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    queue = WriteBehindQueue(store, max_batch=100, flush_interval=10.0)
+    service = MemoryService(ShortTermMemory(), store, write_behind=queue)
+
+    service.add_long_term("u1", "antiga")
+    service.flush()
+    service.add_long_term_many("u1", ["pergunta", "resposta"])
+
+    assert service.get_long_term("u1", limit=2) == ["resposta", "pergunta"]
+    assert service.get_long_term("u1", limit=5) == ["resposta", "pergunta", "antiga"]
+    assert store.get("u1", limit=5) == ["antiga"]
+
+    service.close()
+    assert SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db").get("u1", limit=5) == [
+        "resposta",
+        "pergunta",
+        "antiga",
+    ]
+
+
+class GatedMemoryStore(SQLiteMemoryStore):
+    """Store cujo commit espera um sinal, ou falha enquanto ``failing`` estiver ligado."""
+
+    def __init__(self, db_url: str) -> None:
+        super().__init__(db_url)
+        self.gate = threading.Event()
+        self.writing = threading.Event()
+        self.failing = False
+        self.attempts = 0
+
+    def add_many(self, entries: Iterable[tuple[str, str]]) -> list[int]:
+        self.attempts += 1
+        self.writing.set()
+        if self.failing:
+            raise sqlite3.OperationalError("database is locked")
+        self.gate.wait(timeout=5)
+        return super().add_many(entries)
+
+
+def test_write_behind_commit_does_not_block_puts_or_reads(tmp_path) -> None:
+    store = GatedMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    queue = WriteBehindQueue(store, max_batch=1, flush_interval=0.001)
+    queue.put([("u1", "em voo")])
+    assert store.writing.wait(timeout=5)
+
+    queue.put([("u1", "na fila")])
+    assert queue.get("u1", limit=5) == ["na fila", "em voo"]
+    assert queue.pending() == 2
+
+    store.gate.set()
+    queue.flush()
+    assert queue.get("u1", limit=5) == ["na fila", "em voo"]
+    with queue._cond:
+        # Lote já gravado no SQLite, mas ainda sem o commit confirmado para a fila.
+        queue._inflight, queue._last_id = [("u1", "em voo")], 0
+    assert queue.get("u1", limit=5) == ["em voo", "na fila"]
+    with queue._cond:
+        queue._inflight = []
+    queue.close()
+
+
+def test_write_behind_drops_failing_batches_and_full_buffer(tmp_path) -> None:
+    store = GatedMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    store.failing = True
+    queue = WriteBehindQueue(
+        store, max_batch=10, flush_interval=0.001, max_pending=1, put_timeout=0.01, max_retries=2
+    )
+    queue.put([("u1", "perdida")])
+    queue.flush()
+    assert store.attempts == 3 and queue.dropped() == 1 and queue.pending() == 0
+
+    store.failing = False
+    store.writing.clear()
+    queue.put([("u1", "em voo")])
+    assert store.writing.wait(timeout=5)
+    queue.put([("u1", "na fila")])
+    queue.put([("u1", "excedente")])
+    assert queue.dropped() == 2
+
+    strict = WriteBehindQueue(
+        store, max_batch=10, flush_interval=10.0, max_pending=1, put_timeout=0.01, overflow="raise"
+    )
+    strict.put([("u2", "na fila")])
+    with pytest.raises(WriteQueueFull):
+        strict.put([("u2", "excedente")])
+    store.gate.set()
+    queue.close()
+    strict.close()
+    assert store.get("u1", limit=5) == ["na fila", "em voo"]
+
+
+def test_semantic_recall_mixes_relevance_and_recency(tmp_path) -> None:
+    store = SQLiteMemoryStore(f"sqlite:///{tmp_path}/memory.db")
+    semantic = SemanticMemoryIndex(store, KeywordEmbeddingClient(), recency_weight=0.1)
+    service = MemoryService(ShortTermMemory(), store, semantic=semantic, recent_k=1)
+    service.add_long_term_many("u1", ["gosto de python", "moro em recife", "tenho um gato"])
+    service.add_long_term("u1", "ontem choveu")
+
+    recalled = service.recall("u1", "qual linguagem python eu uso?", limit=2)
+
+    assert recalled == ["ontem choveu", "gosto de python"]
+    reloaded = SemanticMemoryIndex(store, KeywordEmbeddingClient())
+    assert reloaded.search("u1", "onde fica recife", k=1) == ["moro em recife"]
+
+
+def test_short_term_evicts_idle_users_and_respects_byte_budget(monkeypatch) -> None:
+    clock = [0.0]
+    monkeypatch.setattr("app.memory.short_term.time.monotonic", lambda: clock[0])
+    memory = ShortTermMemory(max_messages=2, ttl_seconds=60, max_bytes=400)
+
+    memory.add("u1", "user", "a" * 100)
+    memory.add("u2", "user", "b" * 100)
+    memory.add("u2", "user", "c" * 100)
+    assert memory.get("u1") == []
+    assert [m["content"][0] for m in memory.get("u2")] == ["b", "c"]
+
+    clock[0] = 120.0
+    memory.add("u3", "user", "oi")
+    assert memory.get("u2") == []
+    assert memory.stats()["resident_users"] == 1
+
+
+def test_sqlite_short_term_is_shared_between_instances(tmp_path) -> None:
+    db_url = f"sqlite:///{tmp_path}/short_term.db"
+    first = SQLiteShortTermMemory(db_url, max_messages=2, ttl_seconds=60)
+    second = SQLiteShortTermMemory(db_url, max_messages=2, ttl_seconds=60)
+
+    first.add("u1", "user", "oi")
+    second.add("u1", "assistant", "olá")
+    first.add("u1", "user", "tudo bem?")
+
+    assert second.get("u1") == [
+        {"role": "assistant", "content": "olá"},
+        {"role": "user", "content": "tudo bem?"},
+    ]
+    assert first.stats()["resident_users"] == 1
+    first.close()
+    second.close()
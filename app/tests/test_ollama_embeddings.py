@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+from app.rag.service import OllamaEmbeddingClient
+
+
+def _vector(text: str) -> list[float]:
+    return [float(len(text)), float(ord(text[0]))]
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    batch_endpoint = True
+    requests: list[str] = []
+    failures_left = 0
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append(self.path)
+        if type(self).failures_left > 0:
+            type(self).failures_left -= 1
+            return self._reply(503, {"error": "busy"})
+        if self.path == "/api/embed" and self.batch_endpoint:
+            return self._reply(200, {"embeddings": [_vector(text) for text in body["input"]]})
+        if self.path == "/api/embeddings":
+            return self._reply(200, {"embedding": _vector(body["prompt"])})
+        return self._reply(404, {"error": "not found"})
+
+    def _reply(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: object) -> None:
+        return None
+
+
+@pytest.fixture()
+def stub_server() -> Iterator[tuple[str, type[StubOllamaHandler]]]:
+    handler = type("Handler", (StubOllamaHandler,), {"requests": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", handler
+    server.shutdown()
+    server.server_close()
+
+
+def test_ollama_batches_and_retries(stub_server) -> None:
+    host, handler = stub_server
+    handler.failures_left = 1
+    client = OllamaEmbeddingClient(host, "nomic", batch_size=4, concurrency=3, retry_backoff=0)
+    texts = [f"{'x' * i}doc" for i in range(10)]
+
+    assert client.embed(texts) == [_vector(text) for text in texts]
+    assert handler.requests == ["/api/embed"] * 4
+    client.close()
+
+
+def test_ollama_falls_back_to_single_endpoint(stub_server) -> None:
+    host, handler = stub_server
+    handler.batch_endpoint = False
+    client = OllamaEmbeddingClient(host, "nomic", batch_size=4, concurrency=3)
+    texts = [f"{'y' * i}doc" for i in range(6)]
+
+    assert client.embed(texts) == [_vector(text) for text in texts]
+    assert handler.requests.count("/api/embed") == 1
+    assert handler.requests.count("/api/embeddings") == 6
+    client.close()
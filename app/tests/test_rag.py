@@ -1,7 +1,121 @@
 from __future__ import annotations
 
+from typing import Iterable
+
+import pytest
+
+from app.rag.lexical import looks_like_identifier, tokenize
+from app.rag.service import FakeEmbeddingClient, RagService, reciprocal_rank_fusion
+from app.rag.vector_store import FaissVectorStore, InMemoryVectorStore, SearchHit
+
 
 def test_rag_retrieval(rag_service) -> None:
     rag_service.add_documents(["Documento A sobre IA", "Documento B sobre finanças"])
     results = rag_service.search("IA", k=1)
     assert results
+
+
+class CountingEmbeddingClient(FakeEmbeddingClient):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def embed(self, texts: Iterable[str]) -> list[list[float]]:
+        self.calls += 1
+        return super().embed(texts)
+
+
+def test_rag_search_many_uses_single_embedding_call() -> None:
+    embeddings = CountingEmbeddingClient()
+    service = RagService(vector_store=FaissVectorStore(), embedding_client=embeddings)
+    service.add_documents(["Documento A sobre IA", "Documento B sobre finanças"])
+
+    results = service.search_many(["Documento A sobre IA", "Documento B sobre finanças"], k=1)
+
+    assert embeddings.calls == 2
+    assert [hits[0].document for hits in results] == [
+        "Documento A sobre IA",
+        "Documento B sobre finanças",
+    ]
+    assert all(hits[0].score > 0.99 for hits in results)
+
+
+def test_rag_collections_are_isolated() -> None:
+    service = RagService(
+        vector_store=InMemoryVectorStore(),
+        embedding_client=FakeEmbeddingClient(),
+        store_factory=lambda name, create: InMemoryVectorStore() if create else None,
+        default_collection="geral",
+    )
+    service.add_documents(["Manual do cliente A"], metadata=[{"lang": "pt"}], ids=["a-1"])
+    service.add_documents(["Manual do cliente B"], collection="cliente-b")
+
+    assert service.search("Manual do cliente B", k=5) == ["Manual do cliente A"]
+    assert service.search("Manual", k=5, collection="cliente-b") == ["Manual do cliente B"]
+    assert service.search("Manual", k=5, collection="inexistente") == []
+    assert service.search("Manual", k=5, where={"lang": "en"}) == []
+
+    service.set_scope("cliente-b")
+    assert service.search("Manual", k=5) == ["Manual do cliente B"]
+    assert service.stats()["collections"] == {"cliente-b": 1, "geral": 1}
+    with pytest.raises(ValueError):
+        service.search("Manual", collection="../fora")
+
+
+def test_rag_upsert_reuses_vectors_and_skips_unchanged_documents() -> None:
+    embeddings = CountingEmbeddingClient()
+    service = RagService(vector_store=InMemoryVectorStore(), embedding_client=embeddings)
+    service.upsert_documents(["faq um", "faq dois", "manual"], None, ["faq", "faq", "manual"])
+    version = service.version
+
+    assert service.upsert_documents(["manual"], None, ["manual"]) == 1
+    assert service.version == version and embeddings.calls == 1
+
+    service.upsert_documents(["faq um", "faq tres"], None, ["faq", "faq"])
+    assert embeddings.calls == 2
+    assert service.stats()["embeddings_reused"] == 1
+    assert sorted(service.search("faq", k=5)) == ["faq tres", "faq um", "manual"]
+
+    assert service.delete_documents(["faq"]) == 2
+    assert service.compact() == 4
+    assert service.search("faq", k=5) == ["manual"]
+
+
+def test_hybrid_search_finds_identifiers_without_embedding() -> None:
+    embeddings = CountingEmbeddingClient()
+    service = RagService(
+        vector_store=InMemoryVectorStore(), embedding_client=embeddings, retrieval="hybrid"
+    )
+    service.add_documents(
+        [
+            "O erro ERR-4021 indica token expirado no login.",
+            "Reinicie o serviço quando o login falhar.",
+            "O produto SKU-88 está fora de estoque.",
+        ]
+    )
+    calls = embeddings.calls
+
+    assert service.search("ERR-4021", k=1) == ["O erro ERR-4021 indica token expirado no login."]
+    assert embeddings.calls == calls and service.lexical_only == 1
+
+    hits = service.search_many(["por que o login falha com token expirado?"], k=3)[0]
+    assert embeddings.calls == calls + 1
+    assert len(hits) == 3 and hits[0].score >= hits[1].score >= hits[2].score
+
+
+def test_reciprocal_rank_fusion_favors_agreement() -> None:
+    dense = [SearchHit(id=1, document="b", score=0.9), SearchHit(id=0, document="a", score=0.8)]
+    lexical = [SearchHit(id=0, document="a", score=7.0), SearchHit(id=2, document="c", score=1.0)]
+
+    fused = reciprocal_rank_fusion([dense, lexical], k=2, rrf_k=60)
+
+    assert [hit.document for hit in fused] == ["a", "b"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_lexical_tokenizer_and_identifier_detection() -> None:
+    assert tokenize("Falha ERR-4021 em user_id") == [
+        "falha", "err-4021", "err", "4021", "em", "user_id", "user", "id",
+    ]
+    assert looks_like_identifier("ERR-4021")
+    assert looks_like_identifier("NullPointerException")
+    assert not looks_like_identifier("como faço login")
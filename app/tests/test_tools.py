@@ -1,8 +1,62 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from typing import Any
+
+from app.tools.base import Tool, ToolSpec
+from app.tools.registry import ToolRegistry
+
 
 def test_tool_usage(agent, memory_service) -> None:
     memory_service.add_long_term("u1", "memoria importante")
     message = 'USE_TOOL:retrieve_memory {"user_id":"u1","limit":1}'
     result = agent.chat(user_id="u1", message=message)
     assert "Tool executada" in result.reply
+
+
+class SleepTool(Tool):
+    def __init__(self, name: str, delay: float, parallel_safe: bool = True) -> None:
+        self.spec = ToolSpec(name=name, description="Dorme.", parameters={"type": "object"})
+        self.parallel_safe = parallel_safe
+        self._delay = delay
+
+    def run(self, arguments: dict[str, Any]) -> str:
+        time.sleep(self._delay)
+        return self.spec.name
+
+
+def test_registry_runs_tools_in_parallel_and_keeps_order() -> None:
+    registry = ToolRegistry(max_workers=4, default_timeout=0.5)
+    registry.register(SleepTool("lenta", 0.3))
+    registry.register(SleepTool("rapida", 0.05))
+    registry.register(SleepTool("serial", 0.05, parallel_safe=False))
+    registry.register(SleepTool("travada", 2.0))
+    calls = [("lenta", {}), ("rapida", {}), ("serial", {}), ("lenta", {}), ("travada", {})]
+
+    started = time.perf_counter()
+    results = registry.run_many(calls)
+    elapsed = time.perf_counter() - started
+    async_results = asyncio.run(registry.arun_many(calls[:4]))
+
+    assert results[:4] == ["lenta", "rapida", "serial", "lenta"]
+    assert "excedeu o tempo limite" in results[4]
+    assert elapsed < 1.0
+    assert async_results == results[:4]
+    registry.shutdown()
+
+
+def test_registry_bounds_run_many_by_one_shared_deadline() -> None:
+    registry = ToolRegistry(max_workers=4, default_timeout=0.3)
+    registry.register(SleepTool("travada", 2.0))
+    registry.register(SleepTool("serial_travada", 2.0, parallel_safe=False))
+    registry.register(SleepTool("serial", 0.05, parallel_safe=False))
+    calls = [("travada", {}), ("travada", {}), ("serial_travada", {}), ("serial", {})]
+
+    started = time.perf_counter()
+    results = registry.run_many(calls)
+    elapsed = time.perf_counter() - started
+
+    assert all("excedeu o tempo limite" in result for result in results)
+    assert elapsed < 0.6
+    registry.shutdown()
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+
+from app.benchmarks.ann_recall import synthetic_vectors
+from app.rag.faiss_index import IndexConfig
+from app.rag.service import FakeEmbeddingClient, RagService
+from app.rag.vector_store import FaissVectorStore, InMemoryVectorStore
+
+
+def test_faiss_store_persists_and_reopens(tmp_path) -> None:
+    store = FaissVectorStore(persist_dir=str(tmp_path), checkpoint_every=2)
+    store.add(["alpha", "beta"], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    store.add(["gama"], [[0.0, 0.0, 1.0]])
+
+    reopened = FaissVectorStore(persist_dir=str(tmp_path), read_only=True)
+    assert reopened.count() == 3
+    assert reopened.similarity_search([0.0, 0.1, 1.0], k=1) == ["gama"]
+    assert reopened.similarity_search([1.0, 0.0, 0.0], k=1) == ["alpha"]
+
+
+_OPEN_RSS_SCRIPT = """
+import sys
+from pathlib import Path
+
+from app.rag.vector_store import FaissVectorStore
+
+
+def anon_bytes():
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith("RssAnon:"):
+            return int(line.split()[1]) * 1024
+
+
+before = anon_bytes()
+store = FaissVectorStore(persist_dir=sys.argv[1], read_only=True)
+hits = store.similarity_search([1.0] + [0.0] * 4095, k=3)
+print(anon_bytes() - before, len(hits))
+"""
+
+
+@pytest.mark.skipif(not Path("/proc/self/status").exists(), reason="requer /proc (Linux)")
+def test_flat_store_open_does_not_copy_vectors_into_private_memory(tmp_path) -> None:
+    vectors = np.random.default_rng(0).standard_normal((5_000, 4096)).astype("float32")
+    store = FaissVectorStore(persist_dir=str(tmp_path))
+    store.add([f"doc-{i}" for i in range(5_000)], vectors)
+    store.close()
+    assert not (tmp_path / FaissVectorStore.INDEX_FILE).exists()
+
+    result = subprocess.run(
+        [sys.executable, "-c", _OPEN_RSS_SCRIPT, str(tmp_path)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).resolve().parents[2],
+    )
+    private_bytes, hits = map(int, result.stdout.split())
+    assert hits == 3
+    assert private_bytes < vectors.nbytes // 4
+
+
+def test_faiss_store_migrates_to_ann_index(tmp_path) -> None:
+    vectors = synthetic_vectors(400, 16, seed=3)
+    config = IndexConfig(index_type="ivf_flat", nlist=4, nprobe=4, train_threshold=200)
+    store = FaissVectorStore(persist_dir=str(tmp_path), index_config=config)
+    store.add([f"doc-{i}" for i in range(400)], vectors.tolist())
+
+    assert isinstance(store._index, faiss.IndexIVFFlat)
+    assert store.similarity_search(vectors[42].tolist(), k=1) == ["doc-42"]
+
+    reopened = FaissVectorStore(persist_dir=str(tmp_path), index_config=config)
+    assert reopened.count() == 400
+    assert reopened.similarity_search(vectors[7].tolist(), k=1) == ["doc-7"]
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq"])
+def test_reopened_ivf_store_accepts_upserts_and_compaction(tmp_path, index_type) -> None:
+    vectors = synthetic_vectors(400, 16, seed=4)
+    config = IndexConfig(index_type=index_type, nlist=4, nprobe=4, pq_m=4, train_threshold=200)
+    ids = [f"id-{i}" for i in range(400)]
+    store = FaissVectorStore(persist_dir=str(tmp_path), index_config=config)
+    store.add([f"doc-{i}" for i in range(400)], vectors.tolist(), ids=ids)
+    store.close()
+
+    reopened = FaissVectorStore(persist_dir=str(tmp_path), index_config=config)
+    assert isinstance(reopened._index, faiss.IndexIVF)
+    reopened.add(["novo"], [vectors[3].tolist()], ids=["id-3"], replace=True)
+    assert reopened.count() == 400 and reopened.compact() == 1
+    assert "novo" in reopened.similarity_search(vectors[3].tolist(), k=5)
+    reopened.add(["extra"], [vectors[5].tolist()], ids=["id-extra"])
+
+    reader = FaissVectorStore(persist_dir=str(tmp_path), read_only=True, index_config=config)
+    assert reader.count() == 401
+    assert "extra" in reader.similarity_search(vectors[5].tolist(), k=5)
+
+
+def test_in_memory_store_batched_top_k() -> None:
+    vectors = synthetic_vectors(3000, 8, seed=5)
+    store = InMemoryVectorStore(initial_capacity=16)
+    for start in range(0, 3000, 500):
+        batch = vectors[start : start + 500]
+        store.add([f"doc-{start + i}" for i in range(len(batch))], batch.tolist())
+
+    results = store.search_many([vectors[10].tolist(), vectors[2999].tolist()], k=3)
+    assert store.count() == 3000
+    assert [row[0].id for row in results] == [10, 2999]
+    assert [row[0].document for row in results] == ["doc-10", "doc-2999"]
+    assert all(len(row) == 3 and row[0].score >= row[2].score for row in results)
+
+
+def test_filtered_search_only_visits_matching_rows(tmp_path) -> None:
+    vectors = synthetic_vectors(300, 8, seed=11)
+    documents = [f"doc-{i}" for i in range(300)]
+    metadata = [
+        {"source": "faq" if i % 3 == 0 else "manual", "year": 2020 + i % 5} for i in range(300)
+    ]
+    config = IndexConfig(index_type="hnsw", hnsw_m=8, train_threshold=100)
+    stores = [
+        InMemoryVectorStore(),
+        FaissVectorStore(),
+        FaissVectorStore(persist_dir=str(tmp_path), index_config=config),
+    ]
+    where = {"source": "faq", "year": {"gte": 2023}}
+    for store in stores:
+        store.add(documents, vectors.tolist(), metadata=metadata)
+        hits = store.search_many([vectors[1].tolist()], k=5, where=where)[0]
+        assert len(hits) == 5
+        assert all(hit.metadata["source"] == "faq" and hit.metadata["year"] >= 2023 for hit in hits)
+        assert store.search_many([vectors[1].tolist()], k=5, where={"source": "blog"}) == [[]]
+
+    exact = stores[0].search_many([vectors[3].tolist()], k=1, where={"source": ["faq"]})[0]
+    assert exact[0].document == "doc-3"
+
+    reopened = FaissVectorStore(persist_dir=str(tmp_path), read_only=True, index_config=config)
+    hits = reopened.search_many([vectors[1].tolist()], k=3, where=where)[0]
+    assert hits and all(hit.metadata["source"] == "faq" for hit in hits)
+    assert all(hit.doc_id for hit in hits)
+
+
+def test_faiss_store_deletes_and_compacts_without_reembedding(tmp_path) -> None:
+    vectors = synthetic_vectors(6, 4, seed=13)
+    store = FaissVectorStore(persist_dir=str(tmp_path))
+    store.add([f"doc-{i}" for i in range(6)], vectors.tolist(), ids=["a", "a", "b", "b", "c", "c"])
+
+    assert store.delete(["b"]) == 2
+    assert store.delete(["b"]) == 0
+    assert store.count() == 4 and store.tombstones() == 2
+    assert "doc-2" not in store.similarity_search(vectors[2].tolist(), k=6)
+    store.close()
+
+    reopened = FaissVectorStore(persist_dir=str(tmp_path))
+    assert reopened.count() == 4 and reopened.tombstones() == 2
+    assert reopened.compact() == 2
+    assert reopened.tombstones() == 0
+    assert reopened.similarity_search(vectors[5].tolist(), k=1) == ["doc-5"]
+    assert set(reopened.fingerprints(["a", "b", "c"])) == {"a", "c"}
+    assert not (tmp_path / FaissVectorStore.COMPACT_DIR).exists()
+    reopened.close()
+
+    compacted = FaissVectorStore(persist_dir=str(tmp_path), read_only=True)
+    assert compacted.count() == 4
+    assert compacted.similarity_search(vectors[0].tolist(), k=1) == ["doc-0"]
+
+
+def test_faiss_lexical_search_tracks_adds_and_deletes() -> None:
+    vectors = synthetic_vectors(3, 4, seed=17)
+    store = FaissVectorStore()
+    documents = ["pedido PED-100 enviado", "pedido PED-200 pago"]
+    store.add(documents, vectors[:2].tolist(), ids=["a", "b"])
+
+    assert [hit.doc_id for hit in store.lexical_search("PED-200", k=2)] == ["b", "a"]
+    store.add(["pedido PED-300 cancelado"], vectors[2:].tolist(), ids=["c"])
+    store.delete(["a"])
+
+    assert [hit.document for hit in store.lexical_search("pedido", k=5)] == [
+        "pedido PED-200 pago",
+        "pedido PED-300 cancelado",
+    ]
+
+
+def test_reopened_store_builds_bm25_in_the_background(tmp_path, monkeypatch) -> None:
+    vectors = synthetic_vectors(26, 4, seed=19)
+    store = FaissVectorStore(persist_dir=str(tmp_path))
+    store.add([f"pedido PED-{i}" for i in range(25)], vectors[:25].tolist())
+    store.close()
+    monkeypatch.setattr(FaissVectorStore, "_LEXICAL_CHUNK", 4)
+
+    reopened = FaissVectorStore(persist_dir=str(tmp_path))
+    reopened.add(["pedido PED-99"], vectors[25:].tolist())
+    deadline = time.monotonic() + 5
+    while not reopened.lexical_ready() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [hit.document for hit in reopened.lexical_search("PED-99", k=1)] == ["pedido PED-99"]
+    assert [hit.document for hit in reopened.lexical_search("PED-7", k=1)] == ["pedido PED-7"]
+    dense_only = FaissVectorStore(persist_dir=str(tmp_path), read_only=True, lexical=False)
+    assert not dense_only.lexical_ready()
+    with pytest.raises(RuntimeError):
+        dense_only.lexical_search("PED-7", k=1)
+
+
+def test_compressed_storage_shrinks_vectors_and_keeps_neighbours(tmp_path) -> None:
+    vectors = synthetic_vectors(600, 32, seed=11)
+    docs = [f"doc-{i}" for i in range(600)]
+    for storage, per_vector in (("float16", 64), ("sq8", 32)):
+        config = IndexConfig(storage=storage, train_threshold=300)
+        store = FaissVectorStore(persist_dir=str(tmp_path / storage), index_config=config)
+        store.add(docs, vectors.tolist())
+        assert store.vector_bytes() == 600 * per_vector
+        assert store.similarity_search(vectors[42].tolist(), k=1) == ["doc-42"]
+
+        memory = InMemoryVectorStore(initial_capacity=16, storage=storage)
+        memory.add(docs, vectors.tolist())
+        assert memory.vector_bytes() == 600 * (per_vector + (4 if storage == "sq8" else 0))
+        assert memory.similarity_search(vectors[7].tolist(), k=1) == ["doc-7"]
+
+    reopened = FaissVectorStore(
+        persist_dir=str(tmp_path / "sq8"), index_config=IndexConfig(storage="sq8")
+    )
+    assert reopened.similarity_search(vectors[99].tolist(), k=1) == ["doc-99"]
+
+
+def test_dimension_truncation_applies_to_documents_and_queries() -> None:
+    store = InMemoryVectorStore(dims=2)
+    store.add(["a", "b"], [[1.0, 0.0, 9.0], [0.0, 1.0, -9.0]])
+    assert store.vector_bytes() == 2 * 2 * 4
+    assert store.similarity_search([0.1, 1.0, 9.0], k=1) == ["b"]
+
+
+@pytest.mark.parametrize(
+    "make_store",
+    [
+        lambda: InMemoryVectorStore(dims=2),
+        lambda: FaissVectorStore(index_config=IndexConfig(dims=2)),
+    ],
+    ids=["memory", "faiss"],
+)
+def test_truncated_store_mixes_reused_and_fresh_vectors(make_store) -> None:
+    service = RagService(vector_store=make_store(), embedding_client=FakeEmbeddingClient())
+    service.upsert_documents(["a", "b"], None, ["d1", "d1"])
+
+    service.upsert_documents(["a", "c"], None, ["d2", "d2"])
+
+    assert service.stats()["documents"] == 4
+    assert service.search("c", k=4)
@@ -14,6 +14,8 @@ class ToolSpec:
 
 class Tool(ABC):
     spec: ToolSpec
+    parallel_safe: bool = True
+    timeout: float | None = None
 
     @abstractmethod
     def run(self, arguments: dict[str, Any]) -> str:
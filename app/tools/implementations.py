@@ -18,20 +18,30 @@ class VectorSearchTool(Tool):
                 "type": "object",
                 "properties": {
                     "query": {"type": "string"},
+                    "queries": {"type": "array", "items": {"type": "string"}},
                     "k": {"type": "integer", "default": 3},
                 },
-                "required": ["query"],
             },
         )
 
     def run(self, arguments: dict[str, Any]) -> str:
-        query = arguments.get("query", "")
+        queries = [str(item) for item in arguments.get("queries") or [] if item]
+        if arguments.get("query"):
+            queries.insert(0, str(arguments["query"]))
+        if not queries:
+            return "Parâmetros inválidos."
         k = int(arguments.get("k", 3))
-        results = self._rag.search(query, k=k)
+        results: list[str] = []
+        for hits in self._rag.search_many(queries, k=k):
+            for hit in hits:
+                if hit.document not in results:
+                    results.append(hit.document)
         return "\n".join(results) or "Nenhum resultado."
 
 
 class SaveMemoryTool(Tool):
+    parallel_safe = False
+
     def __init__(self, memory_service: MemoryService) -> None:
         self._memory = memory_service
         self.spec = ToolSpec(
@@ -1,16 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Any
 
+from app.core.logging import get_logger
 from app.tools.base import Tool
 
+ToolInvocation = tuple[str, dict[str, Any]]
+
 
 class ToolRegistry:
-    def __init__(self) -> None:
+    def __init__(self, max_workers: int = 8, default_timeout: float = 30.0) -> None:
         self._tools: dict[str, Tool] = {}
+        self._openai_tools: list[dict[str, Any]] | None = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._default_timeout = default_timeout
+        self._logger = get_logger(self.__class__.__name__)
 
     def register(self, tool: Tool) -> None:
         self._tools[tool.spec.name] = tool
+        self._openai_tools = None
 
     def run(self, name: str, arguments: dict[str, Any]) -> str:
         tool = self._tools.get(name)
@@ -18,5 +30,110 @@ class ToolRegistry:
             return f"Tool '{name}' não encontrada."
         return tool.run(arguments)
 
+    def run_many(self, calls: list[ToolInvocation]) -> list[str]:
+        """Executa tools paralelizáveis em paralelo, preservando a ordem dos resultados.
+
+        Tools com ``parallel_safe = False`` rodam em sequência numa única tarefa do
+        pool. Todos os prazos contam do início da chamada, então a espera total não
+        passa do maior timeout; uma tool serial que estoura o prazo antes de começar
+        é cancelada e não roda.
+        """
+        started = time.monotonic()
+        futures: list[Future[str]] = []
+        serial: list[tuple[Future[str], str, dict[str, Any]]] = []
+        for name, arguments in calls:
+            if self._is_parallel(name):
+                future = self._executor.submit(
+                    contextvars.copy_context().run, self._safe_run, name, arguments
+                )
+            else:
+                future = Future()
+                serial.append((future, name, arguments))
+            futures.append(future)
+        if serial:
+            self._executor.submit(contextvars.copy_context().run, self._run_serial, serial)
+
+        deadlines = {
+            future: started + self._timeout(name) for future, (name, _) in zip(futures, calls)
+        }
+        pending = set(futures)
+        while pending:
+            remaining = min(deadlines[future] for future in pending) - time.monotonic()
+            _, pending = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            expired = {future for future in pending if deadlines[future] <= now}
+            for future in expired:
+                future.cancel()
+            pending -= expired
+        results: list[str] = []
+        for future, (name, _) in zip(futures, calls):
+            finished = future.done() and not future.cancelled()
+            results.append(future.result() if finished else self._timeout_message(name))
+        return results
+
+    async def arun_many(self, calls: list[ToolInvocation]) -> list[str]:
+        loop = asyncio.get_running_loop()
+
+        async def invoke(name: str, arguments: dict[str, Any]) -> str:
+            context = contextvars.copy_context()
+            task = loop.run_in_executor(
+                self._executor, context.run, self._safe_run, name, arguments
+            )
+            try:
+                return await asyncio.wait_for(task, timeout=self._timeout(name))
+            except asyncio.TimeoutError:
+                return self._timeout_message(name)
+
+        pending = {
+            position: asyncio.ensure_future(invoke(name, arguments))
+            for position, (name, arguments) in enumerate(calls)
+            if self._is_parallel(name)
+        }
+        results: list[str] = []
+        try:
+            for position, (name, arguments) in enumerate(calls):
+                if position in pending:
+                    continue
+                pending[position] = asyncio.ensure_future(invoke(name, arguments))
+                await pending[position]
+            for position in range(len(calls)):
+                results.append(await pending[position])
+        finally:
+            for task in pending.values():
+                task.cancel()
+        return results
+
     def as_openai_tools(self) -> list[dict[str, Any]]:
-        return [tool.openai_schema() for tool in self._tools.values()]
+        """Schemas das tools, montados uma vez para manter o prefixo do prompt estável."""
+        if self._openai_tools is None:
+            self._openai_tools = [tool.openai_schema() for tool in self._tools.values()]
+        return self._openai_tools
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _is_parallel(self, name: str) -> bool:
+        tool = self._tools.get(name)
+        return tool is None or tool.parallel_safe
+
+    def _timeout(self, name: str) -> float:
+        tool = self._tools.get(name)
+        if tool is not None and tool.timeout is not None:
+            return tool.timeout
+        return self._default_timeout
+
+    def _run_serial(self, calls: list[tuple[Future[str], str, dict[str, Any]]]) -> None:
+        for future, name, arguments in calls:
+            if future.set_running_or_notify_cancel():
+                future.set_result(self._safe_run(name, arguments))
+
+    def _safe_run(self, name: str, arguments: dict[str, Any]) -> str:
+        try:
+            return self.run(name, arguments)
+        except Exception as exc:
+            self._logger.exception("Falha na tool %s", name)
+            return f"Erro ao executar tool '{name}': {exc}"
+
+    @staticmethod
+    def _timeout_message(name: str) -> str:
+        return f"Tool '{name}' excedeu o tempo limite."
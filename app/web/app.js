@@ -150,6 +150,20 @@ function appendMessage(text, role, meta = "") {
 
   const bubble = document.createElement("div");
   bubble.className = "message-bubble message " + role;
+  renderBubble(bubble, text, role, meta);
+
+  content.appendChild(bubble);
+  row.appendChild(avatar);
+  row.appendChild(content);
+  messages.appendChild(row);
+
+  if (autoScroll.checked) {
+    messages.scrollTop = messages.scrollHeight;
+  }
+  return bubble;
+}
+
+function renderBubble(bubble, text, role, meta = "") {
   if (role === "agent" && typeof marked !== "undefined") {
     const html = marked.parse(escapeHtml(text), { breaks: true, gfm: true });
     bubble.innerHTML = html;
@@ -162,12 +176,6 @@ function appendMessage(text, role, meta = "") {
     metaEl.textContent = meta;
     bubble.appendChild(metaEl);
   }
-
-  content.appendChild(bubble);
-  row.appendChild(avatar);
-  row.appendChild(content);
-  messages.appendChild(row);
-
   if (autoScroll.checked) {
     messages.scrollTop = messages.scrollHeight;
   }
@@ -190,17 +198,34 @@ function loadChat(userId) {
   });
 }
 
-async function sendMessage(message, userId) {
-  const response = await fetch("/chat", {
+async function streamMessage(message, userId, onEvent) {
+  const response = await fetch("/chat/stream", {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
     body: JSON.stringify({ user_id: userId, message }),
   });
-  if (!response.ok) {
+  if (!response.ok || !response.body) {
     const error = await response.text();
     throw new Error(error || "Falha na requisição");
   }
-  return response.json();
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const blocks = buffer.split("\n\n");
+    buffer = blocks.pop();
+    blocks.forEach((block) => {
+      const data = block
+        .split("\n")
+        .filter((line) => line.startsWith("data:"))
+        .map((line) => line.slice(5).trim())
+        .join("\n");
+      if (data) onEvent(JSON.parse(data));
+    });
+  }
 }
 
 async function fetchMemory(userId) {
@@ -225,6 +250,26 @@ async function addDocumentsToRag(documents) {
   return response.json();
 }
 
+async function fetchIngestionJob(jobId) {
+  const response = await fetch(`/documents/jobs/${encodeURIComponent(jobId)}`);
+  if (!response.ok) {
+    const error = await response.text();
+    throw new Error(error || "Falha ao consultar ingestão");
+  }
+  return response.json();
+}
+
+async function waitForIngestionJob(jobId, onProgress) {
+  while (true) {
+    const job = await fetchIngestionJob(jobId);
+    onProgress(job);
+    if (job.status === "completed" || job.status === "failed") {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+}
+
 form.addEventListener("submit", async (event) => {
   event.preventDefault();
   const message = input.value.trim();
@@ -238,9 +283,26 @@ form.addEventListener("submit", async (event) => {
   if (sendBtn) sendBtn.disabled = true;
 
   try {
-    const data = await sendMessage(message, userId);
+    const bubble = appendMessage("…", "agent");
+    let text = "";
+    let data = null;
+    await streamMessage(message, userId, (event) => {
+      if (event.type === "token") {
+        text += event.content;
+        renderBubble(bubble, text, "agent");
+      } else if (event.type === "tool_call") {
+        renderBubble(bubble, text || `Executando ${event.name}…`, "agent");
+      } else if (event.type === "error") {
+        throw new Error(event.detail || "Falha no streaming");
+      } else if (event.type === "done") {
+        data = event;
+      }
+    });
+    if (!data) {
+      throw new Error("Resposta incompleta do servidor");
+    }
     const meta = showSteps.checked ? `Passos: ${data.steps}` : "";
-    appendMessage(data.reply, "agent", meta);
+    renderBubble(bubble, data.reply, "agent", meta);
     persistChat(userId, "agent", data.reply, meta);
     const chats = loadChatList();
     const current = chats.find((chat) => chat.id === userId);
@@ -340,8 +402,14 @@ addDocuments.addEventListener("click", async () => {
   clearError();
   try {
     const data = await addDocumentsToRag(documents);
-    documentsStatus.textContent = `Indexados: ${data.count}`;
     documentsInput.value = "";
+    const job = await waitForIngestionJob(data.job_id, (current) => {
+      documentsStatus.textContent = `Indexando: ${current.documents}/${current.submitted}`;
+    });
+    if (job.status === "failed") {
+      throw new Error(job.error || "Falha na ingestão");
+    }
+    documentsStatus.textContent = `Indexados: ${job.documents} (${job.chunks} chunks)`;
   } catch (err) {
     documentsStatus.textContent = "Erro ao indexar documentos.";
     showError(err.message);